@@ -0,0 +1,148 @@
+"""
+Request auth context
+Resolves who is calling once per request instead of once per helper.
+
+AuthContextMiddleware attaches an AuthContext to request.state.auth. The JWT (Bearer
+header or auth_token cookie) is decoded on first use and the users row plus active
+roles are loaded on first use, from a short-TTL principal cache shared across
+requests. Writes to the users table through the db client drop the cached entry.
+
+    auth = get_auth_context(request)
+    auth.user_id                    # decoded claims, no I/O
+    user = await auth.user()        # users row (cached)
+    roles = await auth.roles()      # active, verified roles (cached)
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+
+from .cache import SimpleCache
+from .crypto import verify_user_token
+from ..db.supabase_client import db
+
+# Seconds a resolved user + roles pair is reused across requests
+PRINCIPAL_TTL = 30
+
+principal_cache = SimpleCache(default_ttl=PRINCIPAL_TTL)
+
+_UNSET = object()
+
+
+def invalidate_principal(user_id: Optional[str] = None) -> None:
+    """Drop the cached user + roles of one user (or of everyone when user_id is None)"""
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.delete(f"principal:{user_id}")
+
+
+def _on_users_write(match: Dict[str, Any]) -> None:
+    user_id = match.get("id")
+    # Writes by email, status etc. can touch anyone; drop everything then
+    invalidate_principal(str(user_id) if isinstance(user_id, str) else None)
+
+
+db.on_write("users", _on_users_write)
+db.on_write("user_roles", lambda match: invalidate_principal(match.get("user_id")))
+
+
+def _extract_token(request: Request) -> Optional[str]:
+    auth = request.headers.get("Authorization")
+    if auth and auth.lower().startswith("bearer "):
+        return auth.split(None, 1)[1].strip() or None
+    return request.cookies.get("auth_token")
+
+
+class AuthContext:
+    """Lazily decoded claims and lazily loaded principal for one request"""
+
+    def __init__(self, token: Optional[str]):
+        self.token = token
+        self._claims: Any = _UNSET
+        self._principal: Any = _UNSET
+        self._loading: Optional[asyncio.Task] = None
+
+    @property
+    def claims(self) -> Optional[Dict[str, Any]]:
+        """Verified JWT claims, or None without a (valid) token"""
+        if self._claims is _UNSET:
+            self._claims = verify_user_token(self.token) if self.token else None
+        return self._claims
+
+    @property
+    def user_id(self) -> Optional[str]:
+        claims = self.claims
+        return claims.get("sub") if claims else None
+
+    async def _load_principal(self, user_id: str) -> Optional[Dict[str, Any]]:
+        cache_key = f"principal:{user_id}"
+        cached = principal_cache.get(cache_key)
+        if cached is not None:
+            # Copies, so a handler editing its user dict cannot change the cached one
+            return {"user": dict(cached["user"]), "roles": list(cached["roles"])}
+        from ..services.user_role_service import UserRoleService
+        # User row and active roles are independent lookups - run them together
+        users, roles = await asyncio.gather(
+            db.select("users", filters={"id": user_id}, limit=1),
+            UserRoleService.get_active_user_roles(user_id, raise_errors=True),
+            return_exceptions=True
+        )
+        if isinstance(users, Exception) or not users:
+            return None
+        if isinstance(roles, Exception):
+            # Not cached, so the next request retries the lookup instead of seeing no roles
+            print(f"[AUTH] Failed to get user roles: {roles}")
+            return {"user": users[0], "roles": [], "roles_failed": True}
+        principal_cache.set(cache_key, {"user": dict(users[0]), "roles": list(roles)})
+        return {"user": users[0], "roles": roles}
+
+    async def principal(self) -> Optional[Dict[str, Any]]:
+        """{"user": users row, "roles": active roles} for the caller, or None"""
+        if self._principal is _UNSET:
+            user_id = self.user_id
+            if not user_id:
+                self._principal = None
+            else:
+                # Helpers running concurrently in one request share a single load
+                if self._loading is None:
+                    self._loading = asyncio.ensure_future(self._load_principal(user_id))
+                principal = await asyncio.shield(self._loading)
+                self._principal = principal
+        return self._principal
+
+    async def user(self) -> Optional[Dict[str, Any]]:
+        principal = await self.principal()
+        return principal["user"] if principal else None
+
+    async def user_type(self) -> Optional[str]:
+        user = await self.user()
+        return (user.get("user_type") or "").lower() if user else None
+
+    async def roles(self) -> List[str]:
+        """Active, verified roles of the caller"""
+        principal = await self.principal()
+        return principal["roles"] if principal else []
+
+
+def get_auth_context(request: Request) -> AuthContext:
+    """The request's AuthContext (created here when the middleware did not run)"""
+    auth = getattr(request.state, "auth", None)
+    if auth is None:
+        auth = AuthContext(_extract_token(request))
+        request.state.auth = auth
+    return auth
+
+
+class AuthContextMiddleware:
+    """Attach a fresh AuthContext to every HTTP request (pure ASGI, no body buffering)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            request = Request(scope)
+            request.state.auth = AuthContext(_extract_token(request))
+        await self.app(scope, receive, send)
@@ -36,6 +36,8 @@ class Settings:
     TWILIO_ACCOUNT_SID: str = os.getenv("TWILIO_ACCOUNT_SID", "")
     TWILIO_AUTH_TOKEN: str = os.getenv("TWILIO_AUTH_TOKEN", "")
     TWILIO_FROM_NUMBER: str = os.getenv("TWILIO_FROM_NUMBER", "")
+    # Public URL of /api/auth/sms-status for delivery reports (optional)
+    TWILIO_STATUS_CALLBACK_URL: str = os.getenv("TWILIO_STATUS_CALLBACK_URL", "")
     
     # OTP Configuration
     OTP_EXP_MIN: int = int(os.getenv("OTP_EXP_MIN", "5"))
@@ -0,0 +1,138 @@
+"""
+CPU Pool
+Process pool for CPU-bound work (bcrypt hashing and verification) so it never runs
+on the event loop. One bcrypt call costs ~250ms of CPU; run inline it stalls every
+other request on the same worker for that long.
+
+- Pool size defaults to the number of cores (CPU_POOL_WORKERS overrides it).
+- At most `workers` jobs are submitted at once; further callers wait for a slot.
+- At most CPU_POOL_MAX_PENDING callers may wait. Beyond that the request is rejected
+  with 503 + Retry-After instead of queueing unbounded work behind a login burst.
+
+The pool is created lazily in each process (gunicorn preloads the app and then forks),
+and workers are spawned rather than forked from the running event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.getenv(name, "") or default)
+        return value if value > 0 else default
+    except ValueError:
+        return default
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+class CpuExecutor:
+    """Bounded, lazily created process pool for blocking CPU work"""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or _env_int("CPU_POOL_WORKERS", os.cpu_count() or 1)
+        self.max_pending = max_pending or _env_int("CPU_POOL_MAX_PENDING", self.workers * 16)
+        self._executor: Optional[Executor] = None
+        self._pid: Optional[int] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+        self._running = 0
+        self.stats_counters = {"completed": 0, "rejected": 0, "failed": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None or self._pid != os.getpid():
+            # A pool inherited through fork belongs to the parent; start a fresh one
+            try:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            except (OSError, NotImplementedError) as e:
+                # Some hosts (e.g. Passenger without /dev/shm) cannot start processes;
+                # bcrypt releases the GIL, so threads still keep it off the event loop
+                print(f"[CPU_POOL] Process pool unavailable ({e}), using threads")
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu-pool")
+            self._pid = os.getpid()
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a picklable top-level function in the pool; 503 if too many callers are waiting"""
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self._waiting >= self.max_pending:
+            self.stats_counters["rejected"] += 1
+            print(f"[CPU_POOL] Rejecting {func.__name__}: {self._waiting} jobs already waiting")
+            raise HTTPException(status_code=503, detail="Server is busy, please try again shortly",
+                                headers={"Retry-After": "1"})
+        start_time = time.monotonic()
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            waited_ms = (time.monotonic() - start_time) * 1000
+            self.stats_counters["wait_ms_total"] += waited_ms
+            self.stats_counters["wait_ms_max"] = max(self.stats_counters["wait_ms_max"], waited_ms)
+            self._running += 1
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._get_executor(), func, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM kill etc.); replace the pool and retry once
+                print("[CPU_POOL] Process pool broken, restarting")
+                self._executor = None
+                result = await loop.run_in_executor(self._get_executor(), func, *args)
+            self.stats_counters["completed"] += 1
+            return result
+        except Exception:
+            self.stats_counters["failed"] += 1
+            raise
+        finally:
+            self._running -= 1
+            semaphore.release()
+
+    async def warm_up(self) -> None:
+        """Start every worker process now instead of on the first login"""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _noop) for _ in range(self.workers)))
+        print(f"[CPU_POOL] {type(executor).__name__} ready with {self.workers} workers")
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self.stats_counters["completed"]
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "running": self._running,
+            "waiting": self._waiting,
+            "wait_ms_avg": round(self.stats_counters["wait_ms_total"] / completed, 1) if completed else None,
+            **{metric: round(value, 1) for metric, value in self.stats_counters.items()}
+        }
+
+
+# Global pool for password/refresh-token hashing
+cpu_executor = CpuExecutor()
@@ -1,49 +1,238 @@
 from __future__ import annotations
+import hashlib
+import hmac
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from passlib.context import CryptContext
 import os, datetime as dt
 import jwt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .token_revocation import revocation_list
+
+# Password hashing policy, read from the environment:
+#   PASSWORD_HASH_SCHEME  bcrypt (default) or argon2 (argon2id, needs argon2-cffi)
+#   BCRYPT_ROUNDS         bcrypt cost factor, default 12 (each step doubles the cost)
+#   ARGON2_MEMORY_KB / ARGON2_TIME_COST / ARGON2_PARALLELISM   default 65536 / 3 / 1
+# Hashes made with another scheme or other parameters keep verifying and are replaced
+# on the user's next login (verify_and_rehash). Measure candidate settings on the
+# production machine with scripts/benchmark_password_hash.py before changing them.
+DEFAULT_BCRYPT_ROUNDS = 12
+DEFAULT_ARGON2_MEMORY_KB = 65536
+DEFAULT_ARGON2_TIME_COST = 3
+DEFAULT_ARGON2_PARALLELISM = 1
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        print(f"[CRYPTO] Invalid {name}, using {default}")
+        return default
+
+
+def password_policy() -> dict:
+    """Hashing scheme and parameters configured in the environment"""
+    return {
+        "scheme": (os.getenv("PASSWORD_HASH_SCHEME") or "bcrypt").lower(),
+        "bcrypt_rounds": _env_int("BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS),
+        "argon2_memory_kb": _env_int("ARGON2_MEMORY_KB", DEFAULT_ARGON2_MEMORY_KB),
+        "argon2_time_cost": _env_int("ARGON2_TIME_COST", DEFAULT_ARGON2_TIME_COST),
+        "argon2_parallelism": _env_int("ARGON2_PARALLELISM", DEFAULT_ARGON2_PARALLELISM),
+    }
+
+
+def build_password_context(policy: dict | None = None) -> CryptContext:
+    """
+    CryptContext that hashes with the policy's scheme and parameters and flags every
+    other scheme or parameter set as needing an update.
+    """
+    policy = {**password_policy(), **(policy or {})}
+    scheme = policy["scheme"]
+    if scheme == "argon2":
+        from passlib.hash import argon2
+        if not argon2.has_backend():
+            print("[CRYPTO] PASSWORD_HASH_SCHEME=argon2 but argon2-cffi is not installed, using bcrypt")
+            scheme = "bcrypt"
+    elif scheme != "bcrypt":
+        print(f"[CRYPTO] Unknown PASSWORD_HASH_SCHEME {scheme}, using bcrypt")
+        scheme = "bcrypt"
+
+    rounds = policy["bcrypt_rounds"]
+    options = {
+        # min == max == default: hashes with more or fewer rounds are both upgraded
+        "bcrypt__default_rounds": rounds,
+        "bcrypt__min_rounds": rounds,
+        "bcrypt__max_rounds": rounds,
+    }
+    if scheme == "argon2":
+        time_cost = policy["argon2_time_cost"]
+        options.update({
+            "argon2__type": "ID",
+            "argon2__memory_cost": policy["argon2_memory_kb"],
+            "argon2__parallelism": policy["argon2_parallelism"],
+            "argon2__default_rounds": time_cost,
+            "argon2__min_rounds": time_cost,
+            "argon2__max_rounds": time_cost,
+        })
+        schemes = ["argon2", "bcrypt"]
+    else:
+        schemes = ["bcrypt"]
+    return CryptContext(schemes=schemes, default=scheme, deprecated="auto", **options)
+
+
+pwd_context = build_password_context()
 
 def get_password_hash(password: str) -> str:
-    """Hash password using bcrypt"""
+    """Hash password with the configured policy"""
     return pwd_context.hash(password)
 
 def verify_password(password: str, password_hash: str) -> bool:
     """Verify password against hash"""
     return pwd_context.verify(password, password_hash)
 
+def verify_and_rehash(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """
+    Verify password; when it matches a hash made with an outdated scheme or
+    parameters, also return a replacement hash (else None)
+    """
+    return pwd_context.verify_and_update(password, password_hash)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash password in the CPU pool (use this from request handlers)"""
+    from .cpu_pool import cpu_executor
+    return await cpu_executor.run(get_password_hash, password)
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """Verify password in the CPU pool (use this from request handlers)"""
+    from .cpu_pool import cpu_executor
+    return await cpu_executor.run(verify_password, password, password_hash)
+
+async def verify_and_rehash_async(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """verify_and_rehash in the CPU pool (use this from request handlers)"""
+    from .cpu_pool import cpu_executor
+    return await cpu_executor.run(verify_and_rehash, password, password_hash)
+
 def generate_token() -> str:
     """Generate secure random token"""
     return secrets.token_urlsafe(32)
 
 ALGO = "HS256"
+# Verified tokens remembered (by SHA-256 of the token) so repeat requests skip the HMAC
+TOKEN_CACHE_SIZE = 10000
+
+
+class JwtKeyring:
+    """
+    Signing/verification keys and token lifetime, read from the environment once.
+
+    JWT_KEYS="kid1:secret1,kid2:secret2" lists every accepted key; new tokens are signed
+    with JWT_ACTIVE_KID (default: the first one) and carry its kid in the header, so a
+    key can be rotated by adding the new one, switching JWT_ACTIVE_KID, and removing the
+    old one after JWT_EXPIRATION_HOURS. Tokens without a kid are checked against
+    JWT_SECRET, which is also the signing key when JWT_KEYS is not set.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.keys: dict[str, str] = {}
+        self.legacy_secret = ""
+        self.active_kid: str | None = None
+        self.exp_hours = 24
+        # token digest -> (claims, exp); insertion order doubles as LRU order
+        self._verified: "OrderedDict[bytes, tuple[dict, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        keys: dict[str, str] = {}
+        for item in (os.getenv("JWT_KEYS") or "").split(","):
+            kid, _, secret = item.strip().partition(":")
+            if kid and secret:
+                keys[kid] = secret
+        active_kid = os.getenv("JWT_ACTIVE_KID") or (next(iter(keys)) if keys else None)
+        if active_kid is not None and active_kid not in keys:
+            print(f"[JWT] JWT_ACTIVE_KID {active_kid} is not in JWT_KEYS, signing with JWT_SECRET")
+            active_kid = None
+        # Read expiration hours from env (fallback to 24)
+        exp_hours_env = os.getenv("JWT_EXPIRATION_HOURS")
+        try:
+            exp_hours = int(exp_hours_env) if exp_hours_env is not None else 24
+            if exp_hours <= 0:
+                raise ValueError("non-positive")
+        except Exception:
+            exp_hours = 24
+        with self._lock:
+            self.keys = keys
+            self.legacy_secret = os.getenv("JWT_SECRET", "devsecret")
+            self.active_kid = active_kid
+            self.exp_hours = exp_hours
+            # A removed key must not keep its tokens valid through the cache
+            self._verified.clear()
+            self.loaded = True
+        print(f"[JWT] Loaded {len(keys)} keyed secret(s), signing with {'kid ' + active_kid if active_kid else 'JWT_SECRET'}")
+
+    def ensure_loaded(self) -> None:
+        if not self.loaded:
+            self.load()
+
+    def signing_key(self) -> tuple[str | None, str]:
+        self.ensure_loaded()
+        if self.active_kid:
+            return self.active_kid, self.keys[self.active_kid]
+        return None, self.legacy_secret
+
+    def verification_key(self, token: str) -> str | None:
+        self.ensure_loaded()
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return self.legacy_secret
+        return self.keys.get(kid)
+
+    def cached_claims(self, digest: bytes) -> tuple[bool, dict | None]:
+        """(hit, claims); a hit with None claims means the cached token has expired"""
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry is None:
+                return False, None
+            claims, exp = entry
+            if exp <= time.time():
+                del self._verified[digest]
+                return True, None
+            self._verified.move_to_end(digest)
+            return True, dict(claims)
+
+    def remember(self, digest: bytes, claims: dict) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._verified[digest] = (dict(claims), int(exp))
+            while len(self._verified) > TOKEN_CACHE_SIZE:
+                self._verified.popitem(last=False)
+
+
+jwt_keyring = JwtKeyring()
+
 
 def issue_user_token(user_id: str, user_type: str) -> str:
     """Issue JWT token for user"""
-    secret = os.getenv("JWT_SECRET", "devsecret")
-    # Read expiration hours from env (fallback to 24)
-    exp_hours_env = os.getenv("JWT_EXPIRATION_HOURS")
-    try:
-        exp_hours = int(exp_hours_env) if exp_hours_env is not None else 24
-        if exp_hours <= 0:
-            raise ValueError("non-positive")
-    except Exception:
-        exp_hours = 24
+    kid, secret = jwt_keyring.signing_key()
 
     now = dt.datetime.utcnow()
     # Use integer UNIX timestamps for exp and iat to be compatible with all PyJWT versions
-    exp_ts = int((now + dt.timedelta(hours=exp_hours)).timestamp())
+    exp_ts = int((now + dt.timedelta(hours=jwt_keyring.exp_hours)).timestamp())
     iat_ts = int(now.timestamp())
     payload = {
         "sub": str(user_id),
         "role": user_type,
         "exp": exp_ts,
         "iat": iat_ts,
+        # Token id, so a single token can be revoked (logout) before it expires
+        "jti": secrets.token_urlsafe(12),
     }
     try:
-        token = jwt.encode(payload, secret, algorithm=ALGO)
+        token = jwt.encode(payload, secret, algorithm=ALGO, headers={"kid": kid} if kid else None)
     except Exception as e:
         # Log detailed debug info to make production issues diagnosable
         try:
@@ -59,11 +248,29 @@ def issue_user_token(user_id: str, user_type: str) -> str:
         return token.decode('utf-8')
     return token
 
-def verify_user_token(token: str) -> dict | None:
-    """Verify JWT token and return claims"""
-    secret = os.getenv("JWT_SECRET", "devsecret")
+def verify_user_token(token: str, verify_exp: bool = True) -> dict | None:
+    """Verify JWT token and return claims (verify_exp=False still checks the signature)"""
+    digest = hashlib.sha256(token.encode("utf-8")).digest() if verify_exp and isinstance(token, str) else None
+    if digest is not None:
+        hit, claims = jwt_keyring.cached_claims(digest)
+        if hit:
+            if claims is None:
+                print("[JWT] Token expired")
+            elif revocation_list.is_revoked(claims.get("jti")):
+                print("[JWT] Token revoked")
+                return None
+            return claims
     try:
-        data = jwt.decode(token, secret, algorithms=[ALGO])
+        secret = jwt_keyring.verification_key(token)
+        if not secret:
+            print("[JWT] Invalid token: unknown key id")
+            return None
+        data = jwt.decode(token, secret, algorithms=[ALGO], options={"verify_exp": verify_exp})
+        if revocation_list.is_revoked(data.get("jti")):
+            print("[JWT] Token revoked")
+            return None
+        if digest is not None:
+            jwt_keyring.remember(digest, data)
         return data
     except jwt.ExpiredSignatureError:
         print("[JWT] Token expired")
@@ -76,19 +283,47 @@ def verify_user_token(token: str) -> dict | None:
         return None
 
 
-def generate_refresh_token(length: int = 48) -> str:
-    """Generate a secure refresh token string"""
-    return secrets.token_urlsafe(length)
+# Refresh tokens are "<selector>.<verifier>": the selector is stored as-is and indexed,
+# the verifier only as a SHA-256 digest. Both halves are high-entropy random values, so a
+# fast hash is enough and a refresh is one indexed lookup plus a constant-time compare.
+REFRESH_SELECTOR_BYTES = 12
+REFRESH_VERIFIER_BYTES = 32
+
+
+def hash_refresh_verifier(verifier: str) -> str:
+    """SHA-256 digest of a refresh token verifier (hex)"""
+    return hashlib.sha256(verifier.encode("utf-8")).hexdigest()
+
+
+def generate_refresh_token() -> tuple[str, str, str]:
+    """New refresh token: (token for the cookie, selector, verifier hash for storage)"""
+    selector = secrets.token_urlsafe(REFRESH_SELECTOR_BYTES)
+    verifier = secrets.token_urlsafe(REFRESH_VERIFIER_BYTES)
+    return f"{selector}.{verifier}", selector, hash_refresh_verifier(verifier)
 
 
-def hash_refresh_token(token: str) -> str:
-    """Hash a refresh token for storage using bcrypt (passlib)"""
-    return pwd_context.hash(token)
+def split_refresh_token(token: str) -> tuple[str, str] | None:
+    """(selector, verifier) of a presented token, or None for malformed/legacy tokens"""
+    selector, _, verifier = (token or "").partition(".")
+    if not selector or not verifier:
+        return None
+    return selector, verifier
+
+
+def verify_refresh_verifier(verifier: str, verifier_hash: str) -> bool:
+    """Constant-time check of a presented verifier against its stored digest"""
+    return hmac.compare_digest(hash_refresh_verifier(verifier), verifier_hash or "")
 
 
 def verify_refresh_token_hash(token: str, token_hash: str) -> bool:
-    """Verify a refresh token against its stored hash"""
+    """Verify a legacy (pre selector/verifier) refresh token against its bcrypt hash"""
     try:
         return pwd_context.verify(token, token_hash)
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+
+async def verify_refresh_token_hash_async(token: str, token_hash: str) -> bool:
+    """Verify a legacy refresh token hash in the CPU pool"""
+    from .cpu_pool import cpu_executor
+    return await cpu_executor.run(verify_refresh_token_hash, token, token_hash)
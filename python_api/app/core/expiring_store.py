@@ -0,0 +1,335 @@
+"""
+Expiring Store
+Small key -> JSON-dict store with a per-entry TTL, used for OTP codes, pending
+signups and rate-limit buckets. Two backends share one interface:
+
+- MemoryExpiringStore: process-local dict. Expiry runs on a hashed timer wheel that
+  is advanced on every call, so expired entries are dropped without a full scan.
+  Meant for tests and single-process development servers.
+- SqliteExpiringStore: one SQLite file (WAL mode) shared by every gunicorn worker on
+  the host, so an OTP sent through one worker verifies on any other. Expired rows are
+  purged through the expires_at index at most once per PURGE_INTERVAL.
+
+Both keep about max_entries entries (the entries closest to expiry are dropped
+first; SQLite checks its row count every BOUND_CHECK_EVERY writes) and offer update(),
+an atomic read-modify-write used for verify-and-consume:
+
+    def check(record):
+        ...
+        return new_record_or_None, result   # None deletes the entry
+
+    result = store.update(key, check)
+
+Each store has a name: <NAME>_STORE_BACKEND=memory|sqlite picks the backend (default
+sqlite) and <NAME>_STORE_PATH the SQLite file (default: <name>.sqlite3 in a per-user
+homeandown-<uid> directory under the system temp directory), e.g. OTP_STORE_BACKEND /
+OTP_STORE_PATH for the OTP store. SQLite files are created 0600 in a directory other
+local users cannot enter (SQLite gives its -wal/-shm files the same mode). Stores
+created with require_path=True refuse the temp default when ENVIRONMENT=production.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+DEFAULT_MAX_ENTRIES = 100000
+# Seconds per timer wheel slot, and slots per revolution (one hour)
+WHEEL_TICK = 1.0
+WHEEL_SLOTS = 3600
+PURGE_INTERVAL = 1.0
+# Counting rows is a table scan, so the SQLite size bound is only enforced every N writes
+BOUND_CHECK_EVERY = 64
+
+Updater = Callable[[Optional[Dict[str, Any]]], Tuple[Optional[Dict[str, Any]], Any]]
+
+
+class ExpiringStore:
+    """Interface shared by the backends"""
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def update(self, key: str, func: Updater, ttl: Optional[float] = None) -> Any:
+        """
+        Atomically apply func to the live value (None if missing or expired).
+        func returns (new_value, result): new_value None deletes the entry, otherwise it
+        is stored with the entry's remaining TTL (or ttl when given). Returns result.
+        """
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryExpiringStore(ExpiringStore):
+    """Process-local store; a hashed timer wheel drops entries as they expire"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, tick: float = WHEEL_TICK, slots: int = WHEEL_SLOTS):
+        self.max_entries = max_entries
+        self.tick = tick
+        # key -> (value, expires_at), oldest insert first
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # Slot i holds the keys whose expiry tick is i modulo the wheel size; keys with
+        # TTLs longer than one revolution stay put until their own round comes up
+        self._wheel: List[Set[str]] = [set() for _ in range(slots)]
+        self._current_tick = self._tick_of(time.time())
+        self._lock = threading.Lock()
+
+    def _tick_of(self, timestamp: float) -> int:
+        return int(math.floor(timestamp / self.tick))
+
+    def _advance(self, now: float) -> None:
+        """Expire every entry whose slot the wheel has passed since the last call"""
+        target = self._tick_of(now)
+        if target <= self._current_tick:
+            return
+        # Past a full revolution every slot is visited once
+        steps = min(target - self._current_tick, len(self._wheel))
+        for step in range(1, steps + 1):
+            slot = self._wheel[(target - steps + step) % len(self._wheel)]
+            for key in [k for k in slot if k not in self._entries or self._entries[k][1] <= now]:
+                slot.discard(key)
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+        self._current_tick = target
+
+    def _unschedule(self, key: str) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._wheel[self._tick_of(entry[1]) % len(self._wheel)].discard(key)
+
+    def _put(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._unschedule(key)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        self._wheel[self._tick_of(expires_at) % len(self._wheel)].add(key)
+        while len(self._entries) > self.max_entries:
+            oldest, (_, oldest_expiry) = next(iter(self._entries.items()))
+            self._wheel[self._tick_of(oldest_expiry) % len(self._wheel)].discard(oldest)
+            del self._entries[oldest]
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._advance(now)
+            self._put(key, dict(value), now + ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._advance(now)
+            entry = self._live(key, now)
+            return dict(entry[0]) if entry else None
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._unschedule(key)
+            del self._entries[key]
+            return True
+
+    def update(self, key: str, func: Updater, ttl: Optional[float] = None) -> Any:
+        now = time.time()
+        with self._lock:
+            self._advance(now)
+            entry = self._live(key, now)
+            new_value, result = func(dict(entry[0]) if entry else None)
+            if new_value is None:
+                if key in self._entries:
+                    self._unschedule(key)
+                    del self._entries[key]
+            else:
+                expires_at = now + ttl if ttl is not None else (entry[1] if entry else now)
+                self._put(key, dict(new_value), expires_at)
+            return result
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            before = len(self._entries)
+            self._advance(now)
+            return before - len(self._entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._advance(time.time())
+            return len(self._entries)
+
+
+class SqliteExpiringStore(ExpiringStore):
+    """Store in a local SQLite file shared by all worker processes on the host"""
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not cross a fork (gunicorn preloads the app, then forks)
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS expiring_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS expiring_entries_expires_at ON expiring_entries (expires_at)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _transaction(self, func: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if now - self._last_purge >= PURGE_INTERVAL:
+                    conn.execute("DELETE FROM expiring_entries WHERE expires_at <= ?", (now,))
+                    self._last_purge = now
+                result = func(conn, now)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, conn: sqlite3.Connection, key: str, now: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        row = conn.execute(
+            "SELECT value, expires_at FROM expiring_entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO expiring_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, default=str), expires_at)
+        )
+        self._writes += 1
+        if self._writes % BOUND_CHECK_EVERY:
+            return
+        count = conn.execute("SELECT COUNT(*) FROM expiring_entries").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM expiring_entries WHERE key IN "
+                "(SELECT key FROM expiring_entries ORDER BY expires_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._transaction(lambda conn, now: self._write(conn, key, value, now + ttl))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._read(self._connect(), key, time.time())
+        return entry[0] if entry else None
+
+    def delete(self, key: str) -> bool:
+        return self._transaction(
+            lambda conn, now: conn.execute("DELETE FROM expiring_entries WHERE key = ?", (key,)).rowcount > 0
+        )
+
+    def update(self, key: str, func: Updater, ttl: Optional[float] = None) -> Any:
+        def _apply(conn: sqlite3.Connection, now: float) -> Any:
+            entry = self._read(conn, key, now)
+            new_value, result = func(entry[0] if entry else None)
+            if new_value is None:
+                conn.execute("DELETE FROM expiring_entries WHERE key = ?", (key,))
+            else:
+                self._write(conn, key, new_value, now + ttl if ttl is not None else (entry[1] if entry else now))
+            return result
+        return self._transaction(_apply)
+
+    def purge_expired(self) -> int:
+        self._last_purge = 0.0
+        return self._transaction(
+            lambda conn, now: conn.execute("DELETE FROM expiring_entries WHERE expires_at <= ?", (now,)).rowcount
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM expiring_entries WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+
+def _default_store_dir() -> str:
+    """Per-user directory in the system temp dir, owned by this user and closed to others"""
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    directory = os.path.join(tempfile.gettempdir(), "homeandown" if uid is None else f"homeandown-{uid}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    # Shared temp dirs let anyone create the name first
+    if stat.S_ISLNK(info.st_mode) or (uid is not None and info.st_uid != uid):
+        raise OSError(f"{directory} is not a directory owned by this user")
+    os.chmod(directory, 0o700)
+    return directory
+
+
+def _create_private_file(path: str) -> None:
+    """Create path (and its directory) readable by this user only, before SQLite opens it"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    try:
+        # An existing file keeps its old mode otherwise
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+def create_expiring_store(name: str = "otp", backend: Optional[str] = None, path: Optional[str] = None,
+                          max_entries: int = DEFAULT_MAX_ENTRIES, require_path: bool = False) -> ExpiringStore:
+    """
+    Backend from <NAME>_STORE_BACKEND (sqlite unless set to memory). With require_path a
+    production deployment (ENVIRONMENT=production) must set <NAME>_STORE_PATH.
+    """
+    env_prefix = name.upper()
+    backend = (backend or os.getenv(f"{env_prefix}_STORE_BACKEND", "sqlite")).lower()
+    if backend == "memory":
+        return MemoryExpiringStore(max_entries=max_entries)
+    path = path or os.getenv(f"{env_prefix}_STORE_PATH")
+    if not path and require_path and os.getenv("ENVIRONMENT", "").lower() == "production":
+        raise RuntimeError(f"{env_prefix}_STORE_PATH must be set in production")
+    try:
+        path = path or os.path.join(_default_store_dir(), f"{name}.sqlite3")
+        _create_private_file(path)
+        store = SqliteExpiringStore(path, max_entries=max_entries)
+        store._connect()
+        print(f"[EXPIRING_STORE] {name}: using shared SQLite store at {path}")
+        return store
+    except (sqlite3.Error, OSError) as e:
+        # Read-only or missing directory: still works, just not across workers
+        print(f"[EXPIRING_STORE] {name}: SQLite store unavailable ({e}), using in-process memory store")
+        return MemoryExpiringStore(max_entries=max_entries)
@@ -0,0 +1,156 @@
+"""
+Rate Limiting
+Token buckets in front of endpoints that trigger expensive work (bcrypt, SMS, email),
+checked before any database or hashing work is done.
+
+Every endpoint has up to three buckets: per client IP, per identifier (the email or
+phone the request is about) and one global bucket. A bucket holds `capacity` tokens
+and regains one every `per_seconds / capacity` seconds; a request takes one token
+from each bucket and is rejected with 429 + Retry-After when any of them is empty.
+
+Login uses a "failure" bucket instead of the identifier one: it is keyed by client IP
+and identifier together and only drained by record_failure() after a wrong password,
+so nobody can lock a user out from elsewhere and correct logins never count. Login
+has no global bucket: anyone could empty it and block every login, and hashing load
+is already bounded by the CPU pool (core/cpu_pool), which sheds excess with 503.
+
+Buckets live in an ExpiringStore (see core/expiring_store), so the same limits apply
+across all workers when the shared SQLite backend is used (the default); set
+RATE_LIMIT_STORE_BACKEND=memory for per-process buckets. Store calls run in a worker
+thread, since a SQLite write can wait on another process's lock. RATE_LIMIT_ENABLED=false
+turns limiting off.
+
+Clients are told apart by the socket address. Behind a reverse proxy (Render, nginx)
+that is the proxy's own address, so set RATE_LIMIT_PROXY_HOPS to the number of proxies
+appending to X-Forwarded-For (1 on Render). Without a proxy leave it at 0: otherwise
+any client can pick its own IP through the header.
+
+    await rate_limiter.check("login", request, payload.email)
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from .expiring_store import ExpiringStore, create_expiring_store
+
+# endpoint -> {scope: (capacity, per_seconds)}
+RATE_LIMITS: Dict[str, Dict[str, Tuple[int, float]]] = {
+    "login": {"ip": (20, 60), "failure": (10, 900)},
+    "signup": {"ip": (10, 3600), "identifier": (3, 3600), "global": (50, 60)},
+    "send_otp": {"ip": (10, 600), "identifier": (3, 600), "global": (100, 60)},
+    "forgot_password": {"ip": (10, 3600), "identifier": (3, 3600), "global": (50, 60)},
+}
+
+
+def client_ip(request: Request) -> str:
+    """
+    Caller's IP: the socket address, or with RATE_LIMIT_PROXY_HOPS=N the address the
+    N-th trusted proxy appended to X-Forwarded-For (the header is ignored by default).
+    """
+    hops = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0") or 0)
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if addresses:
+            return addresses[-min(hops, len(addresses))]
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimiter:
+    """Token buckets kept in an ExpiringStore"""
+
+    def __init__(self, store: ExpiringStore, limits: Dict[str, Dict[str, Tuple[int, float]]] = RATE_LIMITS,
+                 enabled: Optional[bool] = None):
+        self.store = store
+        self.limits = limits
+        self.enabled = enabled if enabled is not None else os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+        self.rejected: Dict[str, int] = {}
+
+    def take(self, key: str, capacity: int, per_seconds: float, cost: float = 1.0) -> float:
+        """
+        Take cost tokens from one bucket; 0 if allowed, else seconds until it would be.
+        cost=0 only checks that a token is available.
+        """
+        rate = capacity / per_seconds
+        needed = cost or 1.0
+
+        def _refill(bucket: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], float]:
+            now = time.time()
+            if bucket:
+                tokens = min(capacity, bucket["tokens"] + (now - bucket["ts"]) * rate)
+            else:
+                tokens = float(capacity)
+            if tokens >= needed:
+                return {"tokens": tokens - cost, "ts": now}, 0.0
+            return {"tokens": tokens, "ts": now}, (needed - tokens) / rate
+
+        # A bucket left alone for per_seconds is full again, same as a missing one
+        return self.store.update(f"rl:{key}", _refill, ttl=per_seconds)
+
+    @staticmethod
+    def _failure_key(endpoint: str, request: Optional[Request], identifier: str) -> str:
+        ip = client_ip(request) if request is not None else "unknown"
+        return f"{endpoint}:fail:{ip}:{identifier.strip().lower()}"
+
+    def _take_buckets(self, rules: Dict[str, Tuple[int, float]],
+                      buckets: List[Tuple[str, str, float]]) -> Optional[Tuple[str, str, float]]:
+        """Take from each bucket in order; (scope, key, retry_after) of the first empty one"""
+        for scope, key, cost in buckets:
+            if scope not in rules:
+                continue
+            capacity, per_seconds = rules[scope]
+            try:
+                retry_after = self.take(key, capacity, per_seconds, cost)
+            except Exception as e:
+                # A broken store must not lock everyone out
+                print(f"[RATE_LIMIT] Bucket check failed for {key}: {e}")
+                continue
+            if retry_after > 0:
+                return scope, key, retry_after
+        return None
+
+    async def check(self, endpoint: str, request: Optional[Request] = None, identifier: Optional[str] = None) -> None:
+        """Raise 429 if the IP, identifier, failure or global bucket of endpoint is empty"""
+        if not self.enabled:
+            return
+        rules = self.limits.get(endpoint, {})
+        buckets = []
+        if request is not None:
+            buckets.append(("ip", f"{endpoint}:ip:{client_ip(request)}", 1.0))
+        if identifier:
+            buckets.append(("identifier", f"{endpoint}:id:{identifier.strip().lower()}", 1.0))
+            # Only checked here; record_failure() drains it
+            buckets.append(("failure", self._failure_key(endpoint, request, identifier), 0.0))
+        buckets.append(("global", endpoint, 1.0))
+
+        limited = await asyncio.to_thread(self._take_buckets, rules, buckets)
+        if limited is None:
+            return
+        scope, key, retry_after = limited
+        self.rejected[f"{endpoint}:{scope}"] = self.rejected.get(f"{endpoint}:{scope}", 0) + 1
+        print(f"[RATE_LIMIT] {endpoint} limited by {scope} bucket ({key}), retry in {retry_after:.1f}s")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def record_failure(self, endpoint: str, request: Optional[Request], identifier: Optional[str]) -> None:
+        """Count a failed attempt (e.g. a wrong password) against the caller's failure bucket"""
+        rules = self.limits.get(endpoint, {})
+        if not self.enabled or not identifier or "failure" not in rules:
+            return
+        capacity, per_seconds = rules["failure"]
+        try:
+            await asyncio.to_thread(self.take, self._failure_key(endpoint, request, identifier), capacity, per_seconds)
+        except Exception as e:
+            print(f"[RATE_LIMIT] Failed to record {endpoint} failure: {e}")
+
+
+# Global limiter for the auth endpoints
+rate_limiter = RateLimiter(create_expiring_store("rate_limit"))
@@ -1,6 +1,5 @@
 from fastapi import Header, HTTPException, Request
 from .config import settings
-from .crypto import verify_user_token
 
 async def require_api_key(x_api_key: str | None = Header(default=None, alias="X-API-Key")):
     """Require API key for sensitive endpoints"""
@@ -44,22 +43,14 @@ async def require_admin_or_api_key(request: Request, x_api_key: str | None = Hea
         print(f"[AUTH] API key authenticated")
 
 def get_current_user_claims(request: Request):
-    """Extract JWT from Authorization Bearer header or cookie 'auth_token'."""
-    token = None
+    """Extract JWT from Authorization Bearer header or cookie 'auth_token' (decoded once per request)."""
+    from .auth_context import get_auth_context
+    auth = get_auth_context(request)
     
-    # Try Authorization header first
-    auth = request.headers.get("Authorization")
-    if auth and auth.lower().startswith("bearer "):
-        token = auth.split(None, 1)[1].strip()
-    
-    # Fallback to cookie
-    if not token:
-        token = request.cookies.get("auth_token")
-    
-    if not token:
+    if not auth.token:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    claims = verify_user_token(token)
+    claims = auth.claims
     if not claims:
         raise HTTPException(status_code=401, detail="Invalid or expired authentication token")
     
@@ -0,0 +1,213 @@
+"""
+Token Revocation
+Revoked access-token ids (JWT `jti`), checked on every authenticated request.
+
+Access tokens are stateless and otherwise stay valid until `exp`, so logout records
+the token's jti in the revoked_tokens table. Each worker keeps the unexpired revoked
+ids in memory:
+
+- a Bloom filter answers "definitely not revoked" for almost every token with a few
+  hash probes and no allocation,
+- an exact dict (jti -> exp) confirms the rare filter hits, so a false positive never
+  rejects a valid token.
+
+A revocation is applied to the revoking worker at once, and other workers (and other
+hosts) pick it up from the table within REVOCATION_SYNC_SECONDS. Expired ids are
+dropped and the filter is rebuilt when they no longer fit it.
+
+The sync cursor only moves after a read that succeeded: until the first full load of
+unexpired revocations completes, every sync retries it from scratch.
+"""
+
+import asyncio
+import datetime as dt
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Seconds between pulls of revocations made by other workers
+REVOCATION_SYNC_SECONDS = 5
+# Re-read this far behind the newest revocation seen, so rows committed late are not missed
+SYNC_OVERLAP_SECONDS = 30
+# Rows per page and per-page timeout for revocation reads
+SYNC_PAGE_SIZE = 1000
+SYNC_TIMEOUT_SECONDS = 10.0
+BLOOM_MIN_CAPACITY = 10000
+BLOOM_ERROR_RATE = 0.001
+
+
+class BloomFilter:
+    """Fixed-size, process-local Bloom filter over strings (k probes from one 64-bit hash)"""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        # Optimal bit count and probe count for capacity items at error_rate
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.probes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @staticmethod
+    def _hashes(item: str) -> Tuple[int, int]:
+        # Python's own 64-bit SipHash of the string (computed once per str object, and
+        # the filter never leaves this process, so the per-process seed is fine).
+        # Double hashing: probe i is h1 + i * h2, from the two 32-bit halves
+        value = hash(item) & 0xFFFFFFFFFFFFFFFF
+        return value & 0xFFFFFFFF, (value >> 32) | 1
+
+    def add(self, item: str) -> None:
+        h1, h2 = self._hashes(item)
+        for i in range(self.probes):
+            position = (h1 + i * h2) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        h1, h2 = self._hashes(item)
+        bits, size = self.bits, self.size
+        for i in range(self.probes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                # Most lookups stop at the first probe
+                return False
+        return True
+
+
+class TokenRevocationList:
+    """Bloom-prefiltered set of revoked jtis, synchronized through the revoked_tokens table"""
+
+    def __init__(self, table: str = "revoked_tokens", sync_seconds: float = REVOCATION_SYNC_SECONDS):
+        self.table = table
+        self.sync_seconds = sync_seconds
+        self._revoked: Dict[str, int] = {}
+        self._bloom = BloomFilter(BLOOM_MIN_CAPACITY)
+        self._cursor: Optional[dt.datetime] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Per-request check; tokens without a jti (issued before revocation existed) pass"""
+        if not jti or not self._revoked or jti not in self._bloom:
+            return False
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def add_local(self, jti: str, exp: int) -> None:
+        with self._lock:
+            if jti in self._revoked:
+                return
+            self._revoked[jti] = int(exp)
+            if len(self._revoked) > self._bloom.capacity:
+                self._rebuild()
+            else:
+                self._bloom.add(jti)
+
+    def _rebuild(self) -> None:
+        """Drop expired ids and rebuild the filter sized for what is left (holds the lock)"""
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, 2 * len(self._revoked)))
+        for jti in self._revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def prune(self) -> int:
+        """Forget expired ids; returns how many were dropped"""
+        with self._lock:
+            now = time.time()
+            expired = sum(1 for exp in self._revoked.values() if exp <= now)
+            # Rebuilding is O(n); only worth it once a good share of the filter is stale
+            if expired and expired * 4 >= len(self._revoked):
+                self._rebuild()
+                return expired
+            return 0
+
+    async def revoke(self, jti: Optional[str], exp: Optional[int], user_id: Optional[str] = None) -> bool:
+        """Revoke an access token by its jti until its exp (this worker at once, others on sync)"""
+        if not jti or not exp or exp <= time.time():
+            return False
+        self.add_local(jti, exp)
+        from ..db.supabase_client import db
+        try:
+            await db.insert(self.table, {
+                "jti": jti,
+                "user_id": user_id,
+                "expires_at": dt.datetime.fromtimestamp(exp, dt.timezone.utc).isoformat()
+            })
+        except Exception as e:
+            # Still revoked on this worker; the others accept it until exp
+            print(f"[REVOCATION] Failed to store revoked token {jti}: {e}")
+        return True
+
+    async def _fetch(self, filters: Dict) -> list:
+        """Every row matching filters, page by page; raises if any page fails"""
+        from ..db.supabase_client import db
+        rows, offset = [], 0
+        while True:
+            page = await db.select(self.table, columns="jti, expires_at, revoked_at", filters=filters,
+                                   order_by="revoked_at", limit=SYNC_PAGE_SIZE, offset=offset,
+                                   raise_errors=True, timeout=SYNC_TIMEOUT_SECONDS)
+            rows.extend(page or [])
+            if not page or len(page) < SYNC_PAGE_SIZE:
+                return rows
+            offset += SYNC_PAGE_SIZE
+
+    async def sync(self) -> int:
+        """
+        Pull revocations made since the last sync (all unexpired ones until a first load
+        succeeds). A failed read raises and leaves the cursor where it was.
+        """
+        started_at = dt.datetime.now(dt.timezone.utc)
+        if self._cursor is None:
+            filters = {"expires_at": {"gt": started_at.isoformat()}}
+        else:
+            since = self._cursor - dt.timedelta(seconds=SYNC_OVERLAP_SECONDS)
+            filters = {"revoked_at": {"gt": since.isoformat()}}
+        rows = await self._fetch(filters)
+        added = 0
+        for row in rows:
+            try:
+                expires_at = dt.datetime.fromisoformat(str(row["expires_at"]).replace("Z", "+00:00"))
+                revoked_at = dt.datetime.fromisoformat(str(row["revoked_at"]).replace("Z", "+00:00"))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if row.get("jti") and row["jti"] not in self._revoked:
+                self.add_local(row["jti"], int(expires_at.timestamp()))
+                added += 1
+            if self._cursor is None or revoked_at > self._cursor:
+                self._cursor = revoked_at
+        if self._cursor is None:
+            # Loaded successfully and nothing is revoked: continue from when this read began
+            self._cursor = started_at
+        self.prune()
+        return added
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                added = await self.sync()
+                if added:
+                    print(f"[REVOCATION] Synced {added} revoked token(s), {len(self._revoked)} active")
+            except Exception as e:
+                print(f"[REVOCATION] Sync failed: {e}")
+            await asyncio.sleep(self.sync_seconds)
+
+    def start(self) -> None:
+        """Start the background sync on the running loop (application startup)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global revocation list, consulted by verify_user_token
+revocation_list = TokenRevocationList()
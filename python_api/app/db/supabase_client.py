@@ -3,7 +3,7 @@
 Pure Supabase Database Client - No SQLite fallback
 """
 import asyncio
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from supabase import create_client, Client
 from ..core.config import settings
 
@@ -12,14 +12,51 @@ class SupabaseDBClient:
         if not supabase_url or not supabase_key:
             raise ValueError("Supabase URL and Key must be provided.")
         self.supabase_client: Client = create_client(supabase_url, supabase_key)
+        # table -> callbacks run after a successful write (used to drop cached rows)
+        self._write_listeners: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
         print("[DB] Supabase client initialized.")
 
+    def on_write(self, table: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Call callback(filters) after every update/delete on table (callback(row) after inserts)"""
+        self._write_listeners.setdefault(table, []).append(callback)
+
+    def _notify_write(self, table: str, match: Dict[str, Any]) -> None:
+        for callback in self._write_listeners.get(table, ()):
+            try:
+                callback(match)
+            except Exception as e:
+                print(f"[DB] Write listener for {table} failed: {e}")
+
     async def _run_sync(self, func, *args, **kwargs):
         """Runs a synchronous function in a separate thread to avoid blocking the asyncio event loop."""
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
 
-    async def select(self, table: str, columns: str = "*", select: str = None, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None, offset: Optional[int] = None, order_by: Optional[str] = None, ascending: bool = True) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _apply_filter(query, key: str, value: Any):
+        """Add one AND filter: a list means IN, a dict holds operators ({"gt": 100}, {"in": [...]})"""
+        if isinstance(value, dict):
+            for op, op_value in value.items():
+                if op in ("gt", "gte", "lt", "lte", "is"):
+                    # {"is": "null"} / {"is": "not.null"}
+                    query = query.filter(key, op, op_value)
+                elif op == "in":
+                    query = SupabaseDBClient._apply_filter(query, key, list(op_value) if isinstance(op_value, (list, tuple, set)) else [op_value])
+            return query
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            if not values:
+                # Empty list - return no results by filtering with impossible value
+                return query.filter(key, 'eq', '00000000-0000-0000-0000-000000000000')
+            # in_ renders id=in.(a,b); filter(key, 'in', list) would send the Python repr
+            return query.in_(key, values)
+        return query.filter(key, 'eq', value)
+
+    async def select(self, table: str, columns: str = "*", select: str = None, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None, offset: Optional[int] = None, order_by: Optional[str] = None, ascending: bool = True, raise_errors: bool = False, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Rows matching filters. Errors and timeouts return [] unless raise_errors is set,
+        for callers that must tell "no rows" from "read failed" (paging loads, caches).
+        """
         def _execute_sync():
             if select == "count":
                 query = self.supabase_client.table(table).select("*", count='exact', head=True)
@@ -49,70 +86,10 @@ class SupabaseDBClient:
                                 print(f"[DB] OR filter failed, will use fallback: {or_error}")
                                 # If OR fails, we'll need to handle it in the calling code
                                 raise ValueError(f"OR query not supported: {or_error}")
-                    # Process other filters if any (after OR)
-                    for key, value in filters.items():
-                        if key != "or":
-                            if isinstance(value, list):
-                                # Supabase Python client's filter with 'in' expects a tuple
-                                # But we need to handle it properly for UUIDs
-                                if value:
-                                    # Pass list directly - Supabase client should handle conversion
-                                    query = query.filter(key, 'in', value)
-                                else:
-                                    # Empty list - return no results by filtering with impossible value
-                                    query = query.filter(key, 'eq', '00000000-0000-0000-0000-000000000000')
-                            elif isinstance(value, dict):
-                                for op, op_value in value.items():
-                                    if op == "gt":
-                                        query = query.filter(key, 'gt', op_value)
-                                    elif op == "gte":
-                                        query = query.filter(key, 'gte', op_value)
-                                    elif op == "lt":
-                                        query = query.filter(key, 'lt', op_value)
-                                    elif op == "lte":
-                                        query = query.filter(key, 'lte', op_value)
-                                    elif op == "in":
-                                        # Handle 'in' operator in nested dict
-                                        if isinstance(op_value, list):
-                                            if op_value:
-                                                query = query.filter(key, 'in', op_value)
-                                            else:
-                                                query = query.filter(key, 'eq', '00000000-0000-0000-0000-000000000000')
-                                        else:
-                                            query = query.filter(key, 'in', op_value)
-                            else:
-                                query = query.filter(key, 'eq', value)
-                else:
-                    # Normal AND filters
-                    for key, value in filters.items():
-                        if isinstance(value, list):
-                            # Supabase Python client's filter with 'in' expects a list
-                            if value:
-                                query = query.filter(key, 'in', value)
-                            else:
-                                # Empty list - return no results
-                                query = query.filter(key, 'eq', '00000000-0000-0000-0000-000000000000')
-                        elif isinstance(value, dict):
-                            # Support operators like {"gt": 100}, {"gte": 100}, {"lt": 100}, {"lte": 100}
-                            for op, op_value in value.items():
-                                if op == "gt":
-                                    query = query.filter(key, 'gt', op_value)
-                                elif op == "gte":
-                                    query = query.filter(key, 'gte', op_value)
-                                elif op == "lt":
-                                    query = query.filter(key, 'lt', op_value)
-                                elif op == "lte":
-                                    query = query.filter(key, 'lte', op_value)
-                                elif op == "in":
-                                    if isinstance(op_value, list):
-                                        if op_value:
-                                            query = query.filter(key, 'in', op_value)
-                                        else:
-                                            query = query.filter(key, 'eq', '00000000-0000-0000-0000-000000000000')
-                                    else:
-                                        query = query.filter(key, 'in', op_value)
-                        else:
-                            query = query.filter(key, 'eq', value)
+                # Normal AND filters (and any filters alongside an OR)
+                for key, value in filters.items():
+                    if key != "or":
+                        query = self._apply_filter(query, key, value)
             
             # Add ordering
             if order_by and select != "count":
@@ -133,11 +110,10 @@ class SupabaseDBClient:
                 return [{"count": response.count}]
             return response.data
 
+        # Add timeout to database operations to prevent hanging
+        # Use shorter timeout for count queries (0.5s) vs regular queries (1.5s) for faster response
+        timeout_seconds = timeout or (0.5 if select == "count" else 1.5)
         try:
-            # Add timeout to database operations to prevent hanging
-            # Use shorter timeout for count queries (0.5s) vs regular queries (1.5s) for faster response
-            import asyncio
-            timeout_seconds = 0.5 if select == "count" else 1.5
             result = await asyncio.wait_for(
                 self._run_sync(_execute_sync),
                 timeout=timeout_seconds
@@ -145,21 +121,26 @@ class SupabaseDBClient:
             print(f"[DB] Supabase SELECT {table}: {len(result)} rows (timeout: {timeout_seconds}s)")
             return result
         except asyncio.TimeoutError:
-            timeout_seconds = 0.5 if select == "count" else 1.5
             print(f"[DB] Timeout error in Supabase select for table {table} (timeout: {timeout_seconds}s)")
+            if raise_errors:
+                raise
             return []
         except Exception as e:
             print(f"Error in Supabase select for table {table}: {e}")
+            if raise_errors:
+                raise
             return []
 
-    async def admin_select(self, table: str, columns: str = "*", select: str = None, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None, offset: Optional[int] = None, order_by: Optional[str] = None, ascending: bool = True) -> List[Dict[str, Any]]:
-        return await self.select(table, columns=columns, select=select, filters=filters, limit=limit, offset=offset, order_by=order_by, ascending=ascending)
+    async def admin_select(self, table: str, columns: str = "*", select: str = None, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None, offset: Optional[int] = None, order_by: Optional[str] = None, ascending: bool = True, raise_errors: bool = False, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await self.select(table, columns=columns, select=select, filters=filters, limit=limit, offset=offset, order_by=order_by, ascending=ascending, raise_errors=raise_errors, timeout=timeout)
 
     async def insert(self, table: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         def _execute_sync():
             return self.supabase_client.table(table).insert(data).execute().data
         try:
-            return await self._run_sync(_execute_sync)
+            result = await self._run_sync(_execute_sync)
+            self._notify_write(table, data)
+            return result
         except Exception as e:
             print(f"[DB] Supabase INSERT {table} error: {e}")
             raise
@@ -168,10 +149,13 @@ class SupabaseDBClient:
         def _execute_sync():
             query = self.supabase_client.table(table).update(data)
             for key, value in filters.items():
-                query = query.eq(key, value)
+                # A list value updates every matching row in one statement
+                query = query.in_(key, value) if isinstance(value, list) else query.eq(key, value)
             return query.execute().data
         try:
-            return await self._run_sync(_execute_sync)
+            result = await self._run_sync(_execute_sync)
+            self._notify_write(table, filters)
+            return result
         except Exception as e:
             print(f"[DB] Supabase UPDATE {table} error: {e}")
             raise
@@ -183,7 +167,9 @@ class SupabaseDBClient:
                 query = query.eq(key, value)
             return query.execute().data
         try:
-            return await self._run_sync(_execute_sync)
+            result = await self._run_sync(_execute_sync)
+            self._notify_write(table, filters)
+            return result
         except Exception as e:
             print(f"[DB] Supabase DELETE error: {e}")
             raise
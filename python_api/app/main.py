@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+import asyncio
 import datetime as dt
 import traceback
 
@@ -57,6 +58,10 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Decode the caller's token and resolve user/roles at most once per request
+from .core.auth_context import AuthContextMiddleware
+app.add_middleware(AuthContextMiddleware)
+
 # Import routes after app initialization to avoid circular dependencies
 from .routes import (
     auth, properties, users, uploads, records, maintenance,
@@ -78,6 +83,20 @@ async def startup_event():
     print(f"Supabase URL: {bool(settings.SUPABASE_URL)}")
     print(f"API Key configured: {bool(settings.PYTHON_API_KEY)}")
 
+    # Read JWT signing/verification keys once
+    try:
+        from .core.crypto import jwt_keyring
+        jwt_keyring.load()
+    except Exception as e:
+        print(f"[JWT] Failed to load JWT keys: {e}")
+
+    # Load revoked access tokens and keep following revocations made by other workers
+    try:
+        from .core.token_revocation import revocation_list
+        revocation_list.start()
+    except Exception as e:
+        print(f"[REVOCATION] Failed to start revocation sync: {e}")
+
     # Test and report database connection on startup
     try:
         from .db.supabase_client import db
@@ -105,9 +124,26 @@ async def startup_event():
     except Exception as e:
         print(f"[DB] Supabase connection or query failed: {e}")
 
+    # Map the offline pincode gazetteer (missing file just means web API lookups)
+    try:
+        from .services.pincode_gazetteer import pincode_gazetteer
+        if pincode_gazetteer.load():
+            # Nearest-pincode tree for map pins; built off the event loop
+            from .services.pincode_kdtree import pincode_kdtree
+            await asyncio.to_thread(pincode_kdtree.build_from_gazetteer)
+    except Exception as e:
+        print(f"[GAZETTEER] Failed to load pincode gazetteer: {e}")
+
+    # Start the bcrypt worker processes before the first login needs them
+    try:
+        from .core.cpu_pool import cpu_executor
+        await cpu_executor.warm_up()
+    except Exception as e:
+        print(f"[CPU_POOL] Failed to start CPU pool: {e}")
+
     # Ensure default admin user exists
     try:
-        from .core.crypto import get_password_hash
+        from .core.crypto import get_password_hash_async
         from .db.supabase_client import db
         ADMIN_EMAIL = getattr(settings, 'DEFAULT_ADMIN_EMAIL', 'admin@homeandown.com')
         ADMIN_PASSWORD = getattr(settings, 'DEFAULT_ADMIN_PASSWORD', 'Frisco@2025')
@@ -116,7 +152,7 @@ async def startup_event():
             print("[DB] Default admin not found, creating...")
             await db.insert('users', {
                 'email': ADMIN_EMAIL,
-                'password_hash': get_password_hash(ADMIN_PASSWORD),  # Fixed: use password_hash not hashed_password
+                'password_hash': await get_password_hash_async(ADMIN_PASSWORD),  # Fixed: use password_hash not hashed_password
                 'user_type': 'admin',
                 'first_name': 'Admin',
                 'last_name': 'User',
@@ -133,6 +169,42 @@ async def startup_event():
     print("API Ready and Listening!")
     print("============================================================")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Application shutdown event."""
+    # Finish geocode cache writes still running in the background
+    try:
+        from .services.geocode_cache import geocode_cache
+        await geocode_cache.flush()
+    except Exception as e:
+        print(f"[GEOCODE_CACHE] Failed to flush pending writes: {e}")
+
+    # Close pooled outbound connections used for geocoding
+    try:
+        from .services.geo_http import close_geo_client
+        await close_geo_client()
+    except Exception as e:
+        print(f"[GEO_HTTP] Failed to close geocoding HTTP client: {e}")
+
+    try:
+        from .core.cpu_pool import cpu_executor
+        cpu_executor.shutdown()
+    except Exception as e:
+        print(f"[CPU_POOL] Failed to shut down CPU pool: {e}")
+
+    # Send whatever SMS are still queued, then close the Twilio connection pool
+    try:
+        from .services.sms_service import sms_sender
+        await sms_sender.close()
+    except Exception as e:
+        print(f"[SMS] Failed to close SMS sender: {e}")
+
+    try:
+        from .core.token_revocation import revocation_list
+        await revocation_list.stop()
+    except Exception as e:
+        print(f"[REVOCATION] Failed to stop revocation sync: {e}")
+
 # Include routers with prefixes
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(auth_otp.router, prefix="/api/auth", tags=["auth"])
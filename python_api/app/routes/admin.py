@@ -4,6 +4,8 @@ import traceback
 from ..core.security import require_admin_or_api_key
 from ..db.supabase_client import db
 from ..services.email import send_email
+from ..services.spatial_index import property_spatial_index
+from .properties import _prepare_property_write
 
 from ..models.schemas import (
     SignupRequest,
@@ -105,6 +107,13 @@ async def list_users(request: Request, _=Depends(require_admin_or_api_key), limi
         
         result = users or []
         
+        # Roles for the whole page in one user_roles query (cached per user)
+        if result:
+            from ..services.user_role_service import UserRoleService
+            roles_by_user = await UserRoleService.get_active_roles_for_users([u.get("id") for u in result])
+            for u in result:
+                u["active_roles"] = roles_by_user.get(str(u.get("id")), [])
+        
         elapsed = (time.time() - start_time) * 1000
         print(f"[ADMIN] Users fetched ({elapsed:.0f}ms, {len(result)} users)")
         
@@ -785,6 +794,8 @@ async def create_property(payload: PropertyRequest, request: Request, _=Depends(
         property_data.setdefault("verified", False)
         property_data.setdefault("featured", False)
         
+        # Same write-time normalization as the owner routes (canonical arrays, formatted_pricing)
+        _prepare_property_write(property_data)
         return await db.insert("properties", property_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -794,9 +805,16 @@ async def update_property(property_id: str, payload: PropertyRequest, request: R
     try:
         update_data = payload.dict(exclude_unset=True)
         if update_data:
+            existing = await db.select("properties", filters={"id": property_id})
+            if not existing:
+                raise HTTPException(status_code=404, detail="Property not found")
+            # Recompute the stored formatted_pricing from the merged row when prices change
+            _prepare_property_write(update_data, existing=dict(existing[0]))
             update_data["updated_at"] = dt.datetime.utcnow().isoformat()
             return await db.update("properties", update_data, {"id": property_id})
         return {"message": "No changes to update"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -804,6 +822,7 @@ async def update_property(property_id: str, payload: PropertyRequest, request: R
 async def delete_property(property_id: str, request: Request, _=Depends(require_admin_or_api_key)):
     try:
         await db.delete("properties", {"id": property_id})
+        property_spatial_index.remove(property_id)
         return {"success": True, "message": "Property deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
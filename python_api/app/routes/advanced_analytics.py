@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import Optional, List, Dict, Any
 from ..db.supabase_client import db
 from ..core.security import get_current_user_claims, require_api_key
+from ..core.auth_context import get_auth_context
 import datetime as dt
 import traceback
 import csv
@@ -25,12 +26,8 @@ async def get_trends(
         if not claims:
             raise HTTPException(status_code=401, detail="Not authenticated")
         
-        user_type = None
-        user_id = claims.get("sub")
-        if user_id:
-            user_data = await db.select("users", filters={"id": user_id})
-            if user_data:
-                user_type = user_data[0].get("user_type")
+        user = await get_auth_context(request).user()
+        user_type = user.get("user_type") if user else None
         
         # Parse time range
         range_map = {
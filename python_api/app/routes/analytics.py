@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
 from ..db.supabase_client import db
 from ..core.security import get_current_user_claims
+from ..core.auth_context import get_auth_context
 import datetime as dt
 import uuid
 import traceback
@@ -99,8 +100,7 @@ async def get_property_views(
             raise HTTPException(status_code=404, detail="Property not found")
         
         property_info = property_data[0]
-        user_data = await db.select("users", filters={"id": user_id})
-        user_info = user_data[0] if user_data else {}
+        user_info = await get_auth_context(request).user() or {}
         
         # Only owner or admin can view analytics
         if property_info.get("owner_id") != user_id and user_info.get("user_type") != "admin":
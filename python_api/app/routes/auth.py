@@ -3,14 +3,19 @@ from typing import Dict, Any, List, Optional
 from ..models.schemas import SignupRequest, LoginRequest, SendOTPRequest, VerifyOTPRequest, UpdateProfileRequest
 from ..core.config import settings
 from ..core.security import get_current_user_claims
+from ..core.auth_context import get_auth_context
+from ..core.rate_limit import rate_limiter
+from ..core.token_revocation import revocation_list
 from ..core.crypto import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_and_rehash_async,
     generate_token,
     issue_user_token,
     generate_refresh_token,
-    hash_refresh_token,
-    verify_refresh_token_hash,
+    split_refresh_token,
+    verify_refresh_verifier,
+    verify_refresh_token_hash_async,
+    verify_user_token,
 )
 from ..services.email import send_email
 from ..services.templates import verification_email
@@ -23,6 +28,79 @@ import json
 
 router = APIRouter()
 
+# A rotated-out refresh token presented again within this window is a concurrent
+# refresh (two tabs); later than that it was copied, and the user's sessions are revoked
+REFRESH_REUSE_GRACE_SECONDS = 30
+
+
+def _refresh_expires_days() -> int:
+    # Use a safe default if the setting is missing or falsy
+    return int(getattr(settings, 'JWT_REFRESH_EXPIRATION_DAYS', 30) or 30)
+
+
+def _secure_cookies() -> bool:
+    return settings.SITE_URL.startswith("https") if settings.SITE_URL else False
+
+
+async def _issue_refresh_token(response: Response, user_id: str, request: Optional[Request] = None) -> None:
+    """Store a new selector/verifier refresh token and set it as the refresh_token cookie"""
+    refresh_raw, selector, verifier_hash = generate_refresh_token()
+    refresh_expires_days = _refresh_expires_days()
+    refresh_record: Dict[str, Any] = {
+        "user_id": user_id,
+        "selector": selector,
+        "verifier_hash": verifier_hash,
+        "user_agent": (request.headers.get("user-agent", "") if request else "")[:500],
+        "ip_address": (request.client.host if request and request.client else ""),
+        "expires_at": (dt.datetime.now(dt.timezone.utc) + dt.timedelta(days=refresh_expires_days)).isoformat(),
+    }
+    try:
+        await db.insert("refresh_tokens", refresh_record)
+    except Exception as e:
+        print(f"[AUTH] Failed to store refresh token: {e}")
+
+    response.set_cookie(
+        "refresh_token",
+        refresh_raw,
+        httponly=True,
+        secure=_secure_cookies(),
+        samesite="lax",
+        max_age=60 * 60 * 24 * refresh_expires_days,
+        path="/api"
+    )
+
+
+async def _find_refresh_token(raw_token: str, request: Request) -> Optional[Dict[str, Any]]:
+    """Stored row for a presented refresh token, or None if it does not match"""
+    parts = split_refresh_token(raw_token)
+    if parts:
+        selector, verifier = parts
+        rows = await db.select("refresh_tokens", filters={"selector": selector}, limit=1)
+        if rows and verify_refresh_verifier(verifier, rows[0].get("verifier_hash")):
+            return rows[0]
+        return None
+
+    # Legacy token (bcrypt hash only, issued before selectors): the access token names the
+    # user, even if expired, so only that user's few legacy rows are checked
+    access_token = request.cookies.get("auth_token")
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.lower().startswith("bearer "):
+        access_token = auth_header.split(None, 1)[1].strip()
+    claims = verify_user_token(access_token, verify_exp=False) if access_token else None
+    if not claims or not claims.get("sub"):
+        return None
+    rows = await db.select(
+        "refresh_tokens",
+        filters={"user_id": claims["sub"], "selector": {"is": "null"}, "revoked": False},
+        limit=5
+    )
+    for row in rows:
+        if row.get("token_hash") and await verify_refresh_token_hash_async(raw_token, row["token_hash"]):
+            print(f"[AUTH] Upgrading legacy refresh token for user {claims['sub']}")
+            return row
+    return None
+
+
 @router.get("/test")
 async def test_auth_route():
     """Test route to verify auth router is working"""
@@ -30,6 +108,8 @@ async def test_auth_route():
 
 @router.post("/signup")
 async def signup(payload: SignupRequest, request: Request) -> Dict[str, Any]:
+    # Throttle before the existence lookup and password hashing
+    await rate_limiter.check("signup", request, payload.email)
     try:
         print(f"\n[AUTH] Signup request for: {payload.email}")
         print(f"[AUTH] User details: {payload.first_name} {payload.last_name}")
@@ -50,12 +130,8 @@ async def signup(payload: SignupRequest, request: Request) -> Dict[str, Any]:
         # Generate user ID
         user_id = str(uuid.uuid4())
         print(f"[AUTH] Generated user ID: {user_id}")
-        
-        # TEMPORARY STORAGE: Store signup data in memory, don't save to DB yet
-        # Data will be saved to DB only after OTP verification
-        from ..services.otp_service import _temp_signup_storage
-        
-        # Prepare user data (not saved to DB yet)
+
+        # Prepare user data
         now_utc = dt.datetime.now(dt.timezone.utc).isoformat()
         
         # Set verification status and initial status based on user role
@@ -66,7 +142,7 @@ async def signup(payload: SignupRequest, request: Request) -> Dict[str, Any]:
         user_data: Dict[str, Any] = {
             "id": user_id,
             "email": payload.email.lower(),
-            "password_hash": get_password_hash(payload.password),
+            "password_hash": await get_password_hash_async(payload.password),
             "first_name": payload.first_name or "",
             "last_name": payload.last_name or "",
             "phone_number": payload.phone_number or "",
@@ -234,8 +310,10 @@ async def signup(payload: SignupRequest, request: Request) -> Dict[str, Any]:
 
 
 @router.post("/login")
-async def login(payload: LoginRequest, response: Response, role: Optional[str] = None) -> Dict[str, Any]:
+async def login(payload: LoginRequest, response: Response, request: Request, role: Optional[str] = None) -> Dict[str, Any]:
     """Authenticates a user and issues an access token and refresh token cookie."""
+    # Throttle before the user lookup and bcrypt verification
+    await rate_limiter.check("login", request, payload.email)
     try:
         print(f"\n[AUTH] Login attempt for: {payload.email} (requested role: {role})")
         
@@ -279,7 +357,8 @@ async def login(payload: LoginRequest, response: Response, role: Optional[str] =
         password_hash = password_hash.strip() if isinstance(password_hash, str) else password_hash
         
         try:
-            if not verify_password(password, password_hash):
+            password_ok, upgraded_hash = await verify_and_rehash_async(password, password_hash)
+            if not password_ok:
                 print(f"[AUTH] Invalid password for: {payload.email}")
                 print(f"[AUTH] Password hash exists: {bool(password_hash)}, hash length: {len(password_hash) if password_hash else 0}")
                 print(f"[AUTH] Password hash starts with: {password_hash[:20] if password_hash and len(password_hash) > 20 else password_hash}")
@@ -294,6 +373,16 @@ async def login(payload: LoginRequest, response: Response, role: Optional[str] =
             print(f"[AUTH] Traceback: {traceback.format_exc()}")
             raise HTTPException(status_code=401, detail="Authentication failed")
         
+        # Stored hash uses an outdated scheme or work factor: replace it now that we have the password
+        if upgraded_hash:
+            hash_field = "password_hash" if user.get("password_hash") else "hashed_password"
+            try:
+                await db.update("users", {hash_field: upgraded_hash}, {"id": user["id"]})
+                print(f"[AUTH] Upgraded password hash for: {payload.email}")
+            except Exception as rehash_error:
+                # Login still succeeds; the upgrade is retried on the next login
+                print(f"[AUTH] Password hash upgrade failed: {rehash_error}")
+        
         # Validate user role if specified
         user_type = user.get("user_type", "buyer")
         if role and role.lower() != user_type.lower():
@@ -353,32 +442,7 @@ async def login(payload: LoginRequest, response: Response, role: Optional[str] =
             
             auth_token = issue_user_token(user_id, user_type)
 
-            refresh_raw = generate_refresh_token()
-            refresh_hash = hash_refresh_token(refresh_raw)
-
-            # Use a safe default if the setting is missing or falsy
-            refresh_expires_days = int(getattr(settings, 'JWT_REFRESH_EXPIRATION_DAYS', 30) or 30)
-            refresh_record: Dict[str, Any] = {
-                "user_id": user_id,
-                "token_hash": refresh_hash,
-                "user_agent": "",
-                "ip_address": "",
-                "expires_at": (dt.datetime.now(dt.timezone.utc) + dt.timedelta(days=refresh_expires_days)).isoformat(),
-            }
-            try:
-                await db.insert("refresh_tokens", refresh_record)
-            except Exception as e:
-                print(f"[AUTH] Failed to store refresh token: {e}")
-
-            response.set_cookie(
-                "refresh_token",
-                refresh_raw,
-                httponly=True,
-                secure=settings.SITE_URL.startswith("https") if settings.SITE_URL else False,
-                samesite="lax",
-                max_age=60 * 60 * 24 * refresh_expires_days,
-                path="/api"
-            )
+            await _issue_refresh_token(response, user_id, request)
             
             # Also set auth_token cookie for session-based authentication
             # This allows the backend to authenticate requests via cookie
@@ -410,7 +474,10 @@ async def login(payload: LoginRequest, response: Response, role: Optional[str] =
             print(f"[AUTH] Token generation error: {token_error}")
             raise HTTPException(status_code=500, detail="Failed to generate authentication tokens")
         
-    except HTTPException:
+    except HTTPException as e:
+        if e.status_code == 401:
+            # Wrong email or password: counts against this client's attempts on the account only
+            await rate_limiter.record_failure("login", request, payload.email)
         raise
     except Exception as e:
         print(f"[AUTH] Login error: {e}")
@@ -608,8 +675,9 @@ async def update_profile(request: Request, updates: UpdateProfileRequest) -> Dic
 
 
 @router.post("/send-otp")
-async def send_otp(payload: SendOTPRequest) -> Dict[str, Any]:
+async def send_otp(payload: SendOTPRequest, request: Request) -> Dict[str, Any]:
     """Send OTP via email for email verification."""
+    await rate_limiter.check("send_otp", request, payload.email)
     try:
         print(f"[OTP] Send OTP request: {payload.email} for {payload.action}")
         
@@ -630,7 +698,7 @@ async def verify_otp(payload: VerifyOTPRequest) -> Dict[str, Any]:
         print(f"[OTP] Verify OTP: {payload.email} for {payload.action}")
         
         from ..services.otp_service import verify_email_otp
-        is_valid = verify_email_otp(payload.email, payload.otp, payload.action)
+        is_valid = await verify_email_otp(payload.email, payload.otp, payload.action)
         
         if not is_valid:
             print(f"[OTP] Invalid OTP provided for {payload.email}")
@@ -781,7 +849,7 @@ async def verify_email_otp(payload: Dict[str, Any]) -> Dict[str, Any]:
         # Verify OTP using the OTP service
         try:
             from ..services.otp_service import verify_email_otp as verify_otp_service
-            is_valid = verify_otp_service(email, otp, "email_verification")
+            is_valid = await verify_otp_service(email, otp, "email_verification")
             
             if not is_valid:
                 print(f"[AUTH] Invalid OTP provided for {email}")
@@ -907,36 +975,39 @@ async def resend_verification_email(request: Request) -> Dict[str, Any]:
 async def logout(request: Request, response: Response) -> Dict[str, Any]:
     """Logout user by revoking refresh token - optimized for speed."""
     try:
-        # Clear the cookie immediately (don't wait for database)
+        # Clear the cookies immediately (don't wait for database)
         response.delete_cookie("refresh_token", path="/api")
+        response.delete_cookie("auth_token", path="/api")
+        
+        # Revoke the access token itself, or it would stay valid until it expires
+        auth = get_auth_context(request)
+        claims = auth.claims
+        if claims and claims.get("jti"):
+            await revocation_list.revoke(claims["jti"], claims.get("exp"), claims.get("sub"))
         
         # Get refresh token from cookie (before clearing)
         refresh_token = request.cookies.get("refresh_token")
         
         # Revoke token in background (non-blocking) - don't wait for it
-        if refresh_token:
+        parts = split_refresh_token(refresh_token) if refresh_token else None
+        if parts:
             import asyncio
-            # Hash the token to find it in database
-            refresh_hash = hash_refresh_token(refresh_token)
-            
+            selector, verifier = parts
+
             # Delete token in background with timeout - don't block response
             async def revoke_token_background():
                 try:
-                    import asyncio
+                    # Single indexed lookup by selector; the verifier proves the caller owns it
                     tokens = await asyncio.wait_for(
-                        db.select("refresh_tokens", filters={"token_hash": refresh_hash}, limit=10),
+                        db.select("refresh_tokens", filters={"selector": selector}, limit=1),
                         timeout=2.0  # 2 second timeout
                     )
                     for t in tokens:
-                        try:
+                        if verify_refresh_verifier(verifier, t.get("verifier_hash")):
                             await asyncio.wait_for(
                                 db.delete("refresh_tokens", {"id": t["id"]}),
                                 timeout=2.0  # 2 second timeout
                             )
-                        except asyncio.TimeoutError:
-                            pass  # Ignore timeout - token will expire anyway
-                        except Exception:
-                            pass  # Ignore errors - token will expire anyway
                 except asyncio.TimeoutError:
                     pass  # Ignore timeout - token will expire anyway
                 except Exception:
@@ -953,6 +1024,79 @@ async def logout(request: Request, response: Response) -> Dict[str, Any]:
         return {"success": True, "message": "Logged out successfully"}
 
 
+@router.post("/refresh")
+async def refresh_session(request: Request, response: Response) -> Dict[str, Any]:
+    """Rotate the refresh token cookie and issue a new access token."""
+    try:
+        refresh_token = request.cookies.get("refresh_token")
+        if not refresh_token:
+            raise HTTPException(status_code=401, detail="No refresh token")
+
+        record = await _find_refresh_token(refresh_token, request)
+        if not record:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+        user_id = str(record["user_id"])
+        now = dt.datetime.now(dt.timezone.utc)
+        if record.get("revoked"):
+            revoked_at = record.get("revoked_at")
+            revoked_at = dt.datetime.fromisoformat(revoked_at.replace("Z", "+00:00")) if revoked_at else None
+            if not revoked_at or (now - revoked_at).total_seconds() > REFRESH_REUSE_GRACE_SECONDS:
+                # An old token came back after rotation: it was copied, so end every session
+                print(f"[AUTH] Refresh token reuse detected for user {user_id}, revoking all sessions")
+                await db.update("refresh_tokens", {"revoked": True, "revoked_at": now.isoformat()},
+                                {"user_id": user_id, "revoked": False})
+            raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+
+        expires_at = dt.datetime.fromisoformat(str(record["expires_at"]).replace("Z", "+00:00"))
+        if now > expires_at:
+            raise HTTPException(status_code=401, detail="Refresh token has expired")
+
+        users = await db.select("users", filters={"id": user_id}, limit=1)
+        if not users:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        user = users[0]
+        if user.get("status", "pending") != "active":
+            raise HTTPException(status_code=403, detail="Your account is not active")
+
+        # Conditional revoke: of two concurrent refreshes with the same token only one rotates it
+        claimed = await db.update("refresh_tokens", {"revoked": True, "revoked_at": now.isoformat()},
+                                  {"id": record["id"], "revoked": False})
+        if not claimed:
+            raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+
+        user_type = str(user.get("user_type", "buyer"))
+        auth_token = issue_user_token(user_id, user_type)
+        await _issue_refresh_token(response, user_id, request)
+        response.set_cookie(
+            "auth_token",
+            auth_token,
+            httponly=True,
+            secure=_secure_cookies(),
+            samesite="lax",
+            max_age=60 * 60 * 24,  # 1 day for auth token
+            path="/api"
+        )
+        print(f"[AUTH] Refreshed session for user {user_id}")
+        return {
+            "success": True,
+            "user": {
+                "id": user["id"],
+                "email": user.get("email"),
+                "first_name": user.get("first_name", ""),
+                "last_name": user.get("last_name", ""),
+                "user_type": user_type,
+                "custom_id": user.get("custom_id")
+            },
+            "token": auth_token
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[AUTH] Refresh error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to refresh session")
+
+
 @router.get("/me")
 async def get_current_user(request: Request) -> Dict[str, Any]:
     """Get current user information with roles"""
@@ -1261,6 +1405,9 @@ async def forgot_password(request: Request) -> Dict[str, Any]:
         if not email:
             raise HTTPException(status_code=400, detail="Email is required")
         
+        # Throttle before the user lookup and reset email
+        await rate_limiter.check("forgot_password", request, email)
+        
         print(f"[AUTH] Password reset requested for: {email} (requested user_type: {user_type})")
         
         # Check if user exists
@@ -1510,7 +1657,7 @@ async def reset_password(request: Request) -> Dict[str, Any]:
         user_id = token_data["user_id"]
         
         # Hash new password
-        password_hash = get_password_hash(new_password)
+        password_hash = await get_password_hash_async(new_password)
         
         # Update user password (fix: correct parameter order for db.update)
         await db.update("users", {
@@ -1648,7 +1795,7 @@ async def change_password(request: Request) -> Dict[str, Any]:
     """Change user password by verifying current password and setting new one."""
     try:
         from ..core.security import get_current_user_claims
-        from ..core.crypto import verify_password, get_password_hash
+        from ..core.crypto import verify_password_async, get_password_hash_async
         from ..services.email import send_email
         from ..config import settings
         
@@ -1679,15 +1826,15 @@ async def change_password(request: Request) -> Dict[str, Any]:
         password_hash = user.get("password_hash")
         
         # Verify current password
-        if not password_hash or not verify_password(current_password, password_hash):
+        if not password_hash or not await verify_password_async(current_password, password_hash):
             raise HTTPException(status_code=400, detail="Invalid current password")
         
         # Check if new password is same as current
-        if verify_password(new_password, password_hash):
+        if await verify_password_async(new_password, password_hash):
             raise HTTPException(status_code=400, detail="New password must be different from current password")
         
         # Hash new password
-        new_password_hash = get_password_hash(new_password)
+        new_password_hash = await get_password_hash_async(new_password)
         
         # Update password
         await db.update("users", {
@@ -1,12 +1,14 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Request
 from typing import Dict, Any
 
+from ..core.rate_limit import rate_limiter
+
 router = APIRouter()
 
 
 @router.post("/send-otp")
-async def send_otp_endpoint(payload: Dict[str, Any] = Body(...)):
+async def send_otp_endpoint(request: Request, payload: Dict[str, Any] = Body(...)):
     from ..services.otp_service import send_email_otp
     
     # Handle request body
@@ -16,6 +18,8 @@ async def send_otp_endpoint(payload: Dict[str, Any] = Body(...)):
     if not email:
         raise HTTPException(status_code=422, detail="email is required")
     
+    await rate_limiter.check("send_otp", request, email)
+    
     print(f"[OTP] Received send OTP request for email: {email}")
     
     # Call the async function
@@ -41,7 +45,7 @@ async def verify_otp_endpoint(payload: Dict[str, Any] = Body(...)):
     
     print(f"[OTP] Received verify OTP request for email: {email}")
     
-    ok = verify_email_otp(email, otp, action)
+    ok = await verify_email_otp(email, otp, action)
     if not ok:
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
@@ -71,3 +75,19 @@ async def verify_otp_endpoint(payload: Dict[str, Any] = Body(...)):
     
     # Return in format frontend expects
     return {"success": True}
+
+
+@router.post("/sms-status")
+async def sms_status_webhook(request: Request):
+    """Twilio delivery status callback (TWILIO_STATUS_CALLBACK_URL)"""
+    from ..services.sms_service import sms_sender, validate_twilio_signature
+    from ..core.config import settings
+    
+    form = await request.form()
+    params = {key: str(value) for key, value in form.items()}
+    url = settings.TWILIO_STATUS_CALLBACK_URL or str(request.url)
+    if not validate_twilio_signature(url, params, request.headers.get("X-Twilio-Signature", "")):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    
+    sms_sender.handle_status_webhook(params)
+    return {"success": True}
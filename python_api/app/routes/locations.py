@@ -2,6 +2,9 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import Optional, List, Dict, Any
 from ..db.supabase_client import db
 from ..core.security import require_api_key
+from ..services.location_service import LocationService
+from ..services.geocode_cache import geocode_cache
+from ..services.geocode_scheduler import geocode_scheduler
 import traceback
 
 router = APIRouter()
@@ -152,7 +155,10 @@ async def get_coordinates_from_pincode(
         except Exception as db_error:
             print(f"[LOCATIONS] Database query failed: {db_error}")
         
-        # No hardcoded fallback coordinates - rely on database or external APIs only
+        # No hardcoded fallback coordinates - gazetteer, geocode cache, then external APIs
+        resolved = await LocationService.get_coordinates_from_pincode(pincode)
+        if resolved:
+            return {"lat": resolved[0], "lng": resolved[1], "pincode": pincode}
         
         # If no coordinates found, return null
         return {"lat": None, "lng": None, "pincode": pincode}
@@ -161,6 +167,45 @@ async def get_coordinates_from_pincode(
         print(f"[LOCATIONS] Get coordinates error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get coordinates: {str(e)}")
 
+@router.get("/nearby-properties")
+async def get_nearby_properties(
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the search center"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the search center"),
+    pincode: Optional[str] = Query(None, description="Pincode to use as the search center"),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Distance-sorted, paginated active properties around a point or pincode"""
+    try:
+        if lat is None or lng is None:
+            if not pincode:
+                raise HTTPException(status_code=400, detail="Provide lat and lng, or a pincode")
+            coordinates = await LocationService.get_coordinates_from_pincode(pincode)
+            if not coordinates:
+                raise HTTPException(status_code=404, detail=f"No coordinates found for pincode {pincode}")
+            lat, lng = coordinates
+        
+        print(f"[LOCATIONS] Nearby properties: center=({lat}, {lng}), radius={radius_km}km, limit={limit}, offset={offset}")
+        result = await LocationService.search_properties_in_radius(lat, lng, radius_km, limit=limit, offset=offset)
+        return {**result, "center": {"lat": lat, "lng": lng}, "radius_km": radius_km}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[LOCATIONS] Nearby properties error: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to search nearby properties: {str(e)}")
+
+@router.get("/geocode-cache/stats")
+async def get_geocode_cache_stats(_=Depends(require_api_key)):
+    """Hit/miss counters for the shared geocoding cache"""
+    return geocode_cache.stats()
+
+@router.get("/geocode-scheduler/stats")
+async def get_geocode_scheduler_stats(_=Depends(require_api_key)):
+    """Queue depth, queue wait and quota counters per geocoding provider"""
+    return geocode_scheduler.stats()
+
 @router.post("/states")
 async def create_state(state_data: dict, _=Depends(require_api_key)):
     """Create a new state"""
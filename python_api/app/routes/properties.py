@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from typing import Optional, Any
 from ..db.supabase_client import db
+from ..services.image_urls import resolve_image_url, group_document_images
+from ..services.spatial_index import property_spatial_index
+from ..services.geo_distance import haversine_km_many
+from ..services.locality_index import locality_index
 from ..core.security import require_admin_or_api_key, require_api_key
 from ..core.cache import cache
 import traceback
@@ -8,11 +12,190 @@ import uuid
 import datetime as dt
 import hashlib
 import json
-from fastapi import Request
+import asyncio
+import math
+import re
 
 router = APIRouter()
 
 
+# Valid database columns for properties table (based on actual schema)
+PROPERTY_COLUMNS = {
+    'id', 'custom_id', 'title', 'description', 'price', 'monthly_rent', 'security_deposit',
+    'property_type', 'bedrooms', 'bathrooms', 'area_sqft', 'area_sqyd', 'area_acres', 'area_unit',  # Added area_unit
+    'address', 'city', 'state', 'zip_code', 'latitude', 'longitude', 'images', 'amenities', 
+    'owner_id', 'status', 'featured', 'verified', 'listing_type', 'available_from', 'furnishing_status',
+    'created_at', 'updated_at', 'district', 'mandal', 'room_images', 'maintenance_charges',
+    'rate_per_sqft', 'rate_per_sqyd', 'carpet_area_sqft', 'built_up_area_sqft', 
+    'plot_area_sqft', 'plot_area_sqyd', 'commercial_subtype', 'total_floors', 'available_floor', 
+    'parking_slots', 'bhk_config', 'floor_count', 'facing', 'private_garden', 'private_driveway', 
+    'plot_dimensions', 'land_type', 'soil_type', 'road_access', 'boundary_fencing', 
+    'water_availability', 'electricity_availability', 'apartment_type', 'floor_number', 
+    'total_floors_building', 'balconies', 'community_type', 'gated_community_features', 
+    'visitor_parking', 'legal_status', 'rera_status', 'rera_number', 'video_url', 
+    'virtual_tour_url', 'nearby_business_hubs', 'nearby_transport', 'agent_id', 'priority', 
+    'possession_date', 'corner_plot', 'water_source', 'amenities_json', 'images_json', 
+    'added_by', 'added_by_role', 'state_id', 'district_id', 'mandal_id', 'floor', 
+    'lift_available', 'parking_spaces', 'assigned_agent_id', 'assignment_date', 
+    'assignment_status', 'assignment_notes', 'transfer_reason', 'previous_agent_id', 'seller_id',
+    # New pricing fields for new_property and lot types
+    'pricing_display_mode', 'starting_price_per_unit', 'pricing_unit_type'
+    # Note: city_id is NOT in the database schema, so it's not included here
+}
+
+# Response-only fields computed by the API rather than stored on the row
+DERIVED_PROPERTY_FIELDS = {'formatted_pricing', 'owner', 'seller', 'agent', 'assigned_agent'}
+
+# Named presets for ?fields=; "full" (or no fields param) returns complete rows
+PROPERTY_FIELD_PRESETS = {
+    'card': [
+        'id', 'custom_id', 'title', 'property_type', 'listing_type', 'price', 'monthly_rent',
+        'city', 'state', 'mandal', 'bedrooms', 'bathrooms', 'area_sqft', 'area_unit',
+        'images', 'featured', 'formatted_pricing'
+    ],
+    'map_pin': [
+        'id', 'title', 'latitude', 'longitude', 'property_type', 'listing_type',
+        'price', 'monthly_rent', 'formatted_pricing'
+    ],
+    'full': None,
+}
+
+# Columns _format_property_pricing reads
+PRICING_COLUMNS = {
+    'price', 'monthly_rent', 'listing_type', 'pricing_display_mode', 'starting_price_per_unit',
+    'pricing_unit_type', 'rate_per_sqft', 'rate_per_sqyd'
+}
+
+# Columns get_properties needs for its post-fetch filters
+LIST_FILTER_COLUMNS = {
+    'id', 'status', 'property_type', 'price', 'monthly_rent', 'area_sqft', 'bedrooms',
+    'bathrooms', 'city', 'state', 'furnishing_status'
+}
+
+# Columns _enrich_properties reads to find owner/seller/agent
+ENRICHMENT_COLUMNS = {
+    'id', 'owner_id', 'added_by', 'seller_id', 'agent_id', 'assigned_agent_id', 'latitude', 'longitude'
+}
+
+# Array (TEXT[]/JSONB list) and JSONB object fields stored in canonical form at write time
+PROPERTY_ARRAY_FIELDS = ['images', 'amenities', 'room_images', 'gated_community_features']
+PROPERTY_JSONB_FIELDS = ['sections', 'nearby_highlights']
+
+
+def _resolve_property_fields(fields: Optional[str]) -> Optional[set]:
+    """
+    Parse a ?fields= value (comma-separated field names and/or preset names).
+    Returns None when full rows are wanted, otherwise the set of requested fields.
+    """
+    if not fields or not fields.strip():
+        return None
+    requested = set()
+    for name in (f.strip() for f in fields.split(',')):
+        if not name:
+            continue
+        if name in PROPERTY_FIELD_PRESETS:
+            preset = PROPERTY_FIELD_PRESETS[name]
+            if preset is None:
+                return None
+            requested.update(preset)
+        elif name in PROPERTY_COLUMNS or name in DERIVED_PROPERTY_FIELDS:
+            requested.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown property field: {name}")
+    requested.add('id')
+    return requested
+
+
+def _property_projection(requested: Optional[set], *extra_columns: set) -> str:
+    """Build the DB select() column list for the requested fields plus any columns the handler needs."""
+    if requested is None:
+        return "*"
+    columns = {f for f in requested if f in PROPERTY_COLUMNS}
+    if 'formatted_pricing' in requested:
+        # Stored at write time; pricing columns are the fallback for rows not yet backfilled
+        columns |= PRICING_COLUMNS | {'formatted_pricing'}
+    for extra in extra_columns:
+        columns |= extra
+    return ",".join(sorted(columns))
+
+
+def _trim_property_fields(property_data: dict, requested: Optional[set]) -> dict:
+    """Drop helper columns that were fetched for filtering/enrichment but not requested."""
+    if requested is None:
+        return property_data
+    return {k: v for k, v in property_data.items() if k in requested}
+
+
+def _normalize_array_value(value) -> list:
+    """Coerce an array field value (list, JSON string, 'NA', None...) to a list."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    if value is None or value in ('', 'NA', '[]', '{}'):
+        return []
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return [value]
+        if isinstance(parsed, list):
+            return parsed
+        return [parsed] if parsed else []
+    return [value]
+
+
+def _normalize_jsonb_value(value):
+    """Decode a JSONB field that may have been stored as a JSON string."""
+    if value is None or value in ('', 'NA'):
+        return []
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    return value
+
+
+def _normalize_property_fields(property_data: dict, fields: Optional[set] = None, fill_missing: bool = False) -> dict:
+    """
+    Canonicalize array/JSONB fields in place. Only keys present on the dict are
+    touched unless fill_missing is set (read path), which defaults absent arrays to [].
+    """
+    for field in PROPERTY_ARRAY_FIELDS:
+        if fields is not None and field not in fields:
+            continue
+        if field in property_data:
+            if not isinstance(property_data[field], list):
+                property_data[field] = _normalize_array_value(property_data[field])
+        elif fill_missing:
+            property_data[field] = []
+    for field in PROPERTY_JSONB_FIELDS:
+        if fields is not None and field not in fields:
+            continue
+        if field in property_data and not isinstance(property_data[field], (list, dict)):
+            property_data[field] = _normalize_jsonb_value(property_data[field])
+    return property_data
+
+
+def _prepare_property_write(write_data: dict, existing: Optional[dict] = None) -> dict:
+    """
+    Write-time normalization for create/update: store canonical arrays and the
+    precomputed formatted_pricing so list/detail reads can pass rows through.
+    ``existing`` is the current row for partial updates.
+    """
+    _normalize_property_fields(write_data)
+    if existing is None or any(key in write_data for key in PRICING_COLUMNS | {'property_type'}):
+        merged = {**(existing or {}), **write_data}
+        write_data['formatted_pricing'] = _format_property_pricing(merged)
+    return write_data
+
+
+def _property_pricing(property_data: dict) -> dict:
+    """Stored formatted_pricing, computed on the fly for rows written before it existed."""
+    return property_data.get('formatted_pricing') or _format_property_pricing(property_data)
+
+
 def _format_property_pricing(property_data: dict) -> dict:
     """
     Format property pricing based on pricing_display_mode.
@@ -180,12 +363,16 @@ async def get_properties(
     facing: Optional[str] = Query(None),
     owner_id: Optional[str] = Query(None),
     added_by: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields or presets (card, map_pin, full)"),
     limit: Optional[int] = Query(50, ge=1, le=1000),  # Default 50 for faster initial load, max 1000 for buyers
     offset: Optional[int] = Query(0, ge=0)
 ):
     import time
     start_time = time.time()
     
+    # Validate ?fields= up front so an unknown field is a 400, not a 500
+    requested_fields = _resolve_property_fields(fields)
+    
     try:
         print(f"\n[PROPERTIES] GET /properties request received")
         if owner_id:
@@ -259,7 +446,7 @@ async def get_properties(
         try:
             # Create a safe string representation of filters for cache key
             filter_str = str(sorted(base_filters.items())) if base_filters else ""
-            cache_key = f"properties:{hashlib.md5((filter_str + str(limit) + str(offset) + str(min_price) + str(max_price) + str(min_rent) + str(max_rent) + str(min_area) + str(max_area) + str(property_type)).encode()).hexdigest()}"
+            cache_key = f"properties:{hashlib.md5((filter_str + str(limit) + str(offset) + str(min_price) + str(max_price) + str(min_rent) + str(max_rent) + str(min_area) + str(max_area) + str(property_type) + str(sorted(requested_fields) if requested_fields else None)).encode()).hexdigest()}"
             
             # Check cache (only for first page to avoid stale pagination)
             if offset == 0:
@@ -279,6 +466,7 @@ async def get_properties(
             properties = await asyncio.wait_for(
                 db.select(
                     "properties", 
+                    columns=_property_projection(requested_fields, LIST_FILTER_COLUMNS),
                     filters=base_filters,
                     limit=limit,
                     offset=offset,
@@ -351,32 +539,9 @@ async def get_properties(
         for prop in properties:
             enhanced_prop = dict(prop)  # Make a copy to avoid modifying original
             
-            # Handle PostgreSQL array fields - these are already arrays, don't parse as JSON
-            array_fields = ['images', 'amenities', 'room_images', 'gated_community_features']
-            for field in array_fields:
-                if enhanced_prop.get(field) is None:
-                    enhanced_prop[field] = []
-                elif isinstance(enhanced_prop.get(field), str):
-                    # If it's a string, it might be a JSON string representation
-                    try:
-                        import json
-                        parsed = json.loads(enhanced_prop[field])
-                        enhanced_prop[field] = parsed if isinstance(parsed, list) else []
-                    except (json.JSONDecodeError, TypeError):
-                        enhanced_prop[field] = []
-                # If it's already a list/array, keep it as is
-            
-            # Handle JSONB fields that might be stored as strings
-            jsonb_fields = ['sections', 'nearby_highlights']
-            for field in jsonb_fields:
-                if isinstance(enhanced_prop.get(field), str):
-                    try:
-                        import json
-                        enhanced_prop[field] = json.loads(enhanced_prop[field])
-                    except (json.JSONDecodeError, TypeError):
-                        enhanced_prop[field] = []
-                elif enhanced_prop.get(field) is None:
-                    enhanced_prop[field] = []
+            # Array/JSONB fields are stored canonical at write time; this only
+            # touches legacy rows that still hold JSON strings or NULLs
+            _normalize_property_fields(enhanced_prop, requested_fields, fill_missing=True)
 
             # Apply price filters
             price = enhanced_prop.get('price', 0)
@@ -446,58 +611,35 @@ async def get_properties(
             # Property passed all filters
             filtered_properties.append(enhanced_prop)
 
-        # Batch fetch all images for properties that don't have them (optimize N+1 query problem)
-        property_ids_needing_images = [prop.get('id') for prop in filtered_properties 
-                                      if not prop.get('images') or len(prop.get('images', [])) == 0]
-        
+        # New uploads are persisted onto properties.images; rows not yet covered by
+        # scripts/backfill_property_images.py still get their images from documents
+        # (one batched query for the whole page)
+        property_ids_needing_images = []
+        if requested_fields is None or 'images' in requested_fields:
+            property_ids_needing_images = [prop.get('id') for prop in filtered_properties
+                                           if not prop.get('images')]
+
         if property_ids_needing_images:
             try:
-                # Fetch all images in one query instead of per-property
-                all_image_docs = await db.select("documents", filters={
+                image_docs = await db.select("documents", filters={
                     "entity_type": "property",
                     "entity_id": {"in": property_ids_needing_images}
                 })
-                
-                # Group images by property_id
-                images_by_property = {}
-                for doc in all_image_docs or []:
-                    prop_id = doc.get('entity_id')
-                    file_type = doc.get('file_type', '')
-                    if prop_id and file_type.startswith('image/'):
-                        if prop_id not in images_by_property:
-                            images_by_property[prop_id] = []
-                        # Get image URL - convert file_path to public URL if needed
-                        image_url = doc.get('url') or doc.get('file_path')
-                        if image_url:
-                            # If it's not already a full URL, convert file_path to public URL
-                            if not (image_url.startswith('http://') or image_url.startswith('https://')):
-                                try:
-                                    # Property images are in 'property-images' bucket
-                                    public_url = db.supabase_client.storage.from_('property-images').get_public_url(image_url)
-                                    image_url = public_url
-                                except Exception as url_error:
-                                    print(f"[PROPERTIES] Failed to get public URL for {image_url}: {url_error}")
-                                    # Try documents bucket as fallback
-                                    try:
-                                        public_url = db.supabase_client.storage.from_('documents').get_public_url(image_url)
-                                        image_url = public_url
-                                    except:
-                                        # Use file_path as-is if conversion fails
-                                        pass
-                            images_by_property[prop_id].append(image_url)
-                
-                # Assign images to properties
+                images_by_property = group_document_images(image_docs)
                 for prop in filtered_properties:
-                    if not prop.get('images') or len(prop.get('images', [])) == 0:
-                        prop_id = prop.get('id')
-                        if prop_id in images_by_property:
-                            prop['images'] = images_by_property[prop_id]
+                    if not prop.get('images') and prop.get('id') in images_by_property:
+                        prop['images'] = images_by_property[prop['id']]
             except Exception as img_err:
                 print(f"[PROPERTIES] Failed to batch fetch images: {img_err}")
         
         # Add formatted pricing display to each property (single loop)
-        for prop in filtered_properties:
-            prop['formatted_pricing'] = _format_property_pricing(prop)
+        if requested_fields is None or 'formatted_pricing' in requested_fields:
+            for prop in filtered_properties:
+                prop['formatted_pricing'] = _property_pricing(prop)
+        
+        # Drop columns fetched only for filtering when a sparse fieldset was requested
+        if requested_fields is not None:
+            filtered_properties = [_trim_property_fields(prop, requested_fields) for prop in filtered_properties]
 
         print(f"[PROPERTIES] Returning {len(filtered_properties)} filtered properties")
         
@@ -541,6 +683,7 @@ async def create_property(request: Request):
         if request:
             try:
                 from ..core.security import get_current_user_claims
+                from ..core.auth_context import get_auth_context
                 claims = get_current_user_claims(request)
                 if claims:
                     user_id = claims.get("sub")
@@ -548,9 +691,8 @@ async def create_property(request: Request):
                     
                     # Get user type to determine if agent is creating property
                     try:
-                        users = await db.select("users", filters={"id": user_id})
-                        if users:
-                            user_type = users[0].get("user_type", "").lower()
+                        user_type = await get_auth_context(request).user_type()
+                        if user_type is not None:
                             print(f"[PROPERTIES] User type: {user_type}")
                     except Exception as user_error:
                         print(f"[PROPERTIES] Could not fetch user type: {user_error}")
@@ -841,6 +983,19 @@ async def create_property(request: Request):
                     print(f"[PROPERTIES] Error converting longitude to float: {e}, value: {lng_value}")
                     property_data['longitude'] = None
         
+        # Dropped pin without a pincode: take pincode/mandal from the nearest gazetteer pincode
+        if (property_data.get('latitude') is not None and property_data.get('longitude') is not None
+                and property_data.get('zip_code') in (None, '', 'NA')):
+            from ..services.location_service import LocationService
+            nearby = LocationService.get_nearest_pincode(property_data['latitude'], property_data['longitude'])
+            if nearby:
+                property_data['zip_code'] = nearby['pincode']
+                for field in ('mandal', 'district', 'state', 'city'):
+                    if property_data.get(field) in (None, '', 'NA'):
+                        property_data[field] = nearby.get(field)
+                print(f"[PROPERTIES] Derived pincode {nearby['pincode']} ({nearby.get('mandal')}) from map pin, "
+                      f"{nearby.get('distance_km')} km from its centroid")
+
         # Auto-populate location fields from zipcode (suggested values, editable)
         if property_data.get('zip_code'):
             try:
@@ -883,22 +1038,7 @@ async def create_property(request: Request):
         sections_data = property_data.pop('sections', None)
         
         # Handle JSON fields that exist in the database - keep as native arrays for Supabase
-        json_fields = ['images', 'amenities', 'room_images', 'gated_community_features']
-        for field in json_fields:
-            if field in property_data:
-                value = property_data[field]
-                if isinstance(value, (list, dict)):
-                    # Keep as-is, Supabase handles native arrays
-                    pass
-                elif value is None or value == '' or value == 'NA':
-                    property_data[field] = []
-                elif isinstance(value, str) and value not in ['[]', '{}']:
-                    # Try to parse as JSON
-                    try:
-                        import json
-                        property_data[field] = json.loads(value)
-                    except (json.JSONDecodeError, TypeError):
-                        property_data[field] = [value] if value else []
+        _normalize_property_fields(property_data, set(PROPERTY_ARRAY_FIELDS))
         
         # Handle string fields with DB constraints - set to NULL if empty
         # These fields have CHECK constraints in DB and cannot be 'NA'
@@ -1184,6 +1324,9 @@ async def create_property(request: Request):
             else:
                 print(f"[PROPERTIES] ✅ custom_id is set: {property_data.get('custom_id')}")
             
+            # Store canonical arrays and the precomputed pricing display
+            _prepare_property_write(property_data)
+            
             print(f"[PROPERTIES] Attempting to insert property into database...")
             print(f"[PROPERTIES] Property ID: {property_id}")
             print(f"[PROPERTIES] Custom ID: {property_data.get('custom_id')}")
@@ -1191,6 +1334,7 @@ async def create_property(request: Request):
             
             result = await db.insert("properties", property_data)
             print(f"[PROPERTIES] ✅ Database insert successful! Result: {result}")
+            property_spatial_index.sync_property(property_data)
             print(f"[PROPERTIES] Property created successfully with ID: {property_id}")
             
             # Verify the property was saved correctly
@@ -1348,80 +1492,419 @@ async def create_property(request: Request):
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error creating property: {str(e)}")
 
+async def _resolve_show_agent_info(request: Optional[Request]) -> bool:
+    """Return True when the request comes from a logged-in buyer (agent contact details are shown)."""
+    if not request:
+        return False
+    try:
+        from ..core.auth_context import get_auth_context
+        auth = get_auth_context(request)
+        if not auth.user_id:
+            return False
+
+        # User row and active roles come from the request's auth context (loaded once)
+        principal = await auth.principal()
+        if not principal:
+            return False
+        user_type = (principal["user"].get("user_type") or "").lower()
+        active_roles = principal["roles"]
+        is_buyer = "buyer" in active_roles or user_type == "buyer"
+        if is_buyer:
+            print(f"[PROPERTIES] Buyer authenticated - will show agent info if available")
+        return is_buyer
+    except Exception as auth_error:
+        print(f"[PROPERTIES] Auth check failed (non-buyer or not logged in): {auth_error}")
+        return False
+
+
+def _slugify_title(title: str) -> str:
+    """Build the URL slug the frontend derives from a property title."""
+    slug = title.lower()
+    slug = re.sub(r'[^a-z0-9\s-]', '', slug)  # Remove special chars
+    slug = slug.strip()
+    slug = re.sub(r'\s+', '-', slug)  # Replace spaces with dashes
+    slug = re.sub(r'-+', '-', slug)  # Replace multiple dashes
+    return slug
+
+
+# Upper bound on ids accepted by POST /batch (compare pages, saved lists, map popups)
+MAX_BATCH_PROPERTIES = 50
+
+
+@router.post("/batch")
+async def get_properties_batch(payload: dict, request: Request = None):
+    """
+    Fetch details for several properties (ids or slugs) in one request.
+    Results are returned in the requested order; ids that could not be
+    found or enriched are reported in ``errors`` instead of failing the batch.
+    """
+    try:
+        requested = payload.get("ids") if isinstance(payload, dict) else None
+        if not isinstance(requested, list) or not requested:
+            raise HTTPException(status_code=400, detail="'ids' must be a non-empty list of property ids or slugs")
+        if len(requested) > MAX_BATCH_PROPERTIES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PROPERTIES} properties can be fetched per batch")
+        if not all(isinstance(k, str) for k in requested):
+            raise HTTPException(status_code=422, detail="'ids' must contain only string property ids or slugs")
+        fields = payload.get("fields")
+        if isinstance(fields, list):
+            fields = ",".join(str(f) for f in fields)
+        requested_fields = _resolve_property_fields(fields)
+
+        # Keep first occurrence order, drop duplicates and blanks
+        keys = list(dict.fromkeys(k.strip() for k in requested if k.strip()))
+        print(f"[PROPERTIES] Batch fetch for {len(keys)} properties")
+
+        # Canonical (lowercase) UUID -> requested key, so an uppercase id still matches its row
+        uuid_keys, slug_keys = {}, []
+        for key in keys:
+            try:
+                uuid_keys[str(uuid.UUID(key))] = key
+            except (ValueError, TypeError, AttributeError):
+                slug_keys.append(key)
+
+        async def _load_by_ids():
+            if not uuid_keys:
+                return []
+            return await db.select("properties", columns=_property_projection(requested_fields, ENRICHMENT_COLUMNS), filters={"id": {"in": list(uuid_keys)}})
+
+        async def _load_slug_candidates():
+            if not slug_keys:
+                return []
+            # Same search window as get_property's slug lookup
+            return await db.select(
+                "properties",
+                columns=_property_projection(requested_fields, ENRICHMENT_COLUMNS, {'title'}),
+                filters={"status": "active"},
+                limit=100
+            )
+
+        show_agent_info, by_id_rows, slug_rows = await asyncio.gather(
+            _resolve_show_agent_info(request),
+            _load_by_ids(),
+            _load_slug_candidates()
+        )
+
+        found: dict = {}
+        for row in by_id_rows or []:
+            key = uuid_keys.get(str(row.get('id')).lower())
+            if key is not None:
+                found[key] = dict(row)
+        wanted_slugs = set(slug_keys)
+        for row in slug_rows or []:
+            title = row.get('title', '')
+            slug = _slugify_title(title) if title else None
+            if slug in wanted_slugs and slug not in found:
+                found[slug] = dict(row)
+
+        ordered_keys = [k for k in keys if k in found]
+        enriched = await _enrich_properties([found[k] for k in ordered_keys], show_agent_info=show_agent_info, requested=requested_fields)
+
+        properties = []
+        errors = [{"id": k, "status": 404, "detail": "Property not found"} for k in keys if k not in found]
+        for key, (property_data, error) in zip(ordered_keys, enriched):
+            if error:
+                errors.append({"id": key, "status": 500, "detail": f"Error processing property: {error}"})
+            else:
+                properties.append(property_data)
+        # Report errors in requested order as well
+        position = {k: i for i, k in enumerate(keys)}
+        errors.sort(key=lambda e: position[e["id"]])
+
+        print(f"[PROPERTIES] Batch fetch returned {len(properties)} properties, {len(errors)} errors")
+        return {
+            "properties": properties,
+            "errors": errors,
+            "requested": len(keys),
+            "found": len(properties)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[PROPERTIES] Batch fetch error: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error fetching properties: {str(e)}")
+
+
+# Map endpoint: zoom levels below MAP_CLUSTER_MAX_ZOOM return grid clusters, at or above it individual pins
+MAP_CLUSTER_MAX_ZOOM = 14
+# Clusters per tile side (4x4 per 256px tile, roughly one cluster per 64px)
+MAP_CLUSTER_GRID = 4
+MAP_MAX_TILES = 64
+MAP_TILE_CACHE_TTL = 60
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def _parse_bbox(bbox: str) -> tuple:
+    """Parse 'west,south,east,north' into floats, raising 400 on bad input."""
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(','))
+    except (ValueError, AttributeError):
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'")
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south < north <= 90):
+        raise HTTPException(status_code=400, detail="bbox is out of range")
+    return west, south, east, north
+
+
+def _lon_to_tile_x(lon: float, zoom: int) -> int:
+    n = 2 ** zoom
+    return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+
+def _lat_to_tile_y(lat: float, zoom: int) -> int:
+    n = 2 ** zoom
+    lat_rad = math.radians(max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat)))
+    return min(n - 1, max(0, int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)))
+
+
+def _tile_bounds(x: int, y: int, zoom: int) -> tuple:
+    """(west, south, east, north) of a web-mercator tile."""
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    # Edge tiles stretch to the poles so nothing outside the mercator range is dropped
+    if y == 0:
+        north = 90.0
+    if y == n - 1:
+        south = -90.0
+    return west, south, east, north
+
+
+def _viewport_tiles(west: float, south: float, east: float, north: float, zoom: int) -> list:
+    """Tiles covering the viewport, or 400 when there are more than MAP_MAX_TILES."""
+    n = 2 ** zoom
+    x_start, x_end = _lon_to_tile_x(west, zoom), _lon_to_tile_x(east, zoom)
+    xs = range(x_start, x_end + 1) if west <= east else [*range(x_start, n), *range(0, x_end + 1)]
+    ys = range(_lat_to_tile_y(north, zoom), _lat_to_tile_y(south, zoom) + 1)
+    if len(xs) * len(ys) > MAP_MAX_TILES:
+        raise HTTPException(status_code=400, detail="Viewport is too large for this zoom level")
+    return [(x, y) for x in xs for y in ys]
+
+
+def _map_display_price(attributes: dict):
+    return attributes.get('price') or attributes.get('monthly_rent')
+
+
+def _matches_map_filters(attributes: dict, filters: dict) -> bool:
+    """Same filter semantics as get_properties, applied to indexed attributes."""
+    # Public listings only show verified properties (status is already 'active' in the index)
+    if attributes.get('verified') is not True:
+        return False
+    for key in ('featured', 'owner_id', 'added_by', 'mandal', 'listing_type', 'commercial_subtype',
+                'land_type', 'facing', 'bedrooms', 'bathrooms', 'furnishing_status', 'city', 'state'):
+        if filters.get(key) is not None and attributes.get(key) != filters[key]:
+            return False
+    property_type = filters.get('property_type')
+    if property_type:
+        property_types = [pt.strip() for pt in property_type.split(',')]
+        if attributes.get('property_type') not in property_types:
+            return False
+    for column, low, high in (('price', 'min_price', 'max_price'),
+                              ('monthly_rent', 'min_rent', 'max_rent'),
+                              ('area_sqft', 'min_area', 'max_area')):
+        if filters.get(low) is None and filters.get(high) is None:
+            continue
+        value = attributes.get(column)
+        if not value:
+            return False
+        if filters.get(low) is not None and value < filters[low]:
+            return False
+        if filters.get(high) is not None and value > filters[high]:
+            return False
+    return True
+
+
+def _map_pin(property_id: str, lat: float, lon: float, attributes: dict) -> dict:
+    return {
+        'id': property_id,
+        'lat': lat,
+        'lng': lon,
+        'title': attributes.get('title'),
+        'property_type': attributes.get('property_type'),
+        'listing_type': attributes.get('listing_type'),
+        'price': attributes.get('price'),
+        'monthly_rent': attributes.get('monthly_rent'),
+    }
+
+
+def _build_map_tile(x: int, y: int, zoom: int, filters: dict) -> dict:
+    """Clusters (low zoom) or pins (high zoom) for one tile."""
+    west, south, east, north = _tile_bounds(x, y, zoom)
+    members = [
+        entry for entry in property_spatial_index.within_bbox(south, west, north, east)
+        # Tiles share edges; keep points on the east/south edge in the neighbouring tile
+        if entry[2] < east or x == 2 ** zoom - 1
+        if entry[1] > south or y == 2 ** zoom - 1
+        if _matches_map_filters(entry[3], filters)
+    ]
+    if zoom >= MAP_CLUSTER_MAX_ZOOM:
+        return {'clusters': [], 'pins': [_map_pin(*entry) for entry in members]}
+
+    groups: dict = {}
+    for entry in members:
+        _, lat, lon, _ = entry
+        col = min(MAP_CLUSTER_GRID - 1, int((lon - west) / (east - west) * MAP_CLUSTER_GRID))
+        row = min(MAP_CLUSTER_GRID - 1, int((north - lat) / (north - south) * MAP_CLUSTER_GRID))
+        groups.setdefault((row, col), []).append(entry)
+
+    clusters, pins = [], []
+    for (row, col), group in groups.items():
+        if len(group) == 1:
+            pins.append(_map_pin(*group[0]))
+            continue
+        prices = [p for p in (_map_display_price(entry[3]) for entry in group) if p]
+        center_lat = sum(entry[1] for entry in group) / len(group)
+        center_lng = sum(entry[2] for entry in group) / len(group)
+        # Farthest member from the centroid, so the client can zoom to fit the cluster
+        spread = haversine_km_many(center_lat, center_lng, [entry[1] for entry in group], [entry[2] for entry in group])
+        clusters.append({
+            'id': f"{zoom}/{x}/{y}/{row}/{col}",
+            'count': len(group),
+            'lat': center_lat,
+            'lng': center_lng,
+            'radius_km': round(float(spread.max()), 2),
+            'min_price': min(prices) if prices else None,
+            'max_price': max(prices) if prices else None,
+        })
+    return {'clusters': clusters, 'pins': pins}
+
+
+@router.get("/map")
+async def get_properties_map(
+    bbox: str = Query(..., description="Viewport as west,south,east,north"),
+    zoom: int = Query(..., ge=0, le=22),
+    city: Optional[str] = Query(None),
+    state: Optional[str] = Query(None),
+    mandal: Optional[str] = Query(None),
+    property_type: Optional[str] = Query(None),
+    listing_type: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    min_rent: Optional[float] = Query(None),
+    max_rent: Optional[float] = Query(None),
+    featured: Optional[bool] = Query(None),
+    commercial_subtype: Optional[str] = Query(None),
+    land_type: Optional[str] = Query(None),
+    min_area: Optional[float] = Query(None),
+    max_area: Optional[float] = Query(None),
+    bedrooms: Optional[int] = Query(None),
+    bathrooms: Optional[int] = Query(None),
+    furnishing_status: Optional[str] = Query(None),
+    facing: Optional[str] = Query(None),
+    owner_id: Optional[str] = Query(None),
+    added_by: Optional[str] = Query(None)
+):
+    """
+    Map markers for a viewport: grid clusters (count, centroid, min/max price)
+    below MAP_CLUSTER_MAX_ZOOM, compact pins at or above it. Results are built
+    per web-mercator tile from the spatial index and cached per tile, so tiles
+    may extend slightly beyond the requested bbox.
+    """
+    import time
+    start_time = time.time()
+    west, south, east, north = _parse_bbox(bbox)
+    tile_zoom = min(zoom, 20)
+    tiles = _viewport_tiles(west, south, east, north, tile_zoom)
+
+    filters = {
+        'city': city, 'state': state, 'mandal': mandal, 'property_type': property_type,
+        'listing_type': listing_type, 'min_price': min_price, 'max_price': max_price,
+        'min_rent': min_rent, 'max_rent': max_rent, 'featured': featured,
+        'commercial_subtype': commercial_subtype, 'land_type': land_type,
+        'min_area': min_area, 'max_area': max_area, 'bedrooms': bedrooms, 'bathrooms': bathrooms,
+        'furnishing_status': furnishing_status, 'facing': facing,
+        'owner_id': owner_id, 'added_by': added_by
+    }
+    try:
+        await property_spatial_index.ensure_loaded()
+        filter_key = hashlib.md5(str(sorted((k, v) for k, v in filters.items() if v is not None)).encode()).hexdigest()
+
+        clusters, pins, cache_hits = [], [], 0
+        for x, y in tiles:
+            # Index version in the key: any property write makes old tiles unreachable
+            cache_key = f"map_tile:{tile_zoom}:{x}:{y}:{filter_key}:{property_spatial_index.version}"
+            tile = cache.get(cache_key)
+            if tile is None:
+                tile = _build_map_tile(x, y, tile_zoom, filters)
+                cache.set(cache_key, tile, ttl=MAP_TILE_CACHE_TTL)
+            else:
+                cache_hits += 1
+            clusters.extend(tile['clusters'])
+            pins.extend(tile['pins'])
+
+        total = len(pins) + sum(c['count'] for c in clusters)
+        elapsed = (time.time() - start_time) * 1000
+        print(f"[PROPERTIES] Map zoom={zoom}: {len(tiles)} tiles ({cache_hits} cached), "
+              f"{len(clusters)} clusters, {len(pins)} pins in {elapsed:.0f}ms")
+        return {
+            'zoom': zoom,
+            'bbox': [west, south, east, north],
+            'mode': 'pins' if tile_zoom >= MAP_CLUSTER_MAX_ZOOM else 'clusters',
+            'total': total,
+            'clusters': clusters,
+            'pins': pins
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[PROPERTIES] Map error: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error building property map: {str(e)}")
+
+
 @router.get("/{property_id_or_slug}")
-async def get_property(property_id_or_slug: str, request: Request = None):
+async def get_property(
+    property_id_or_slug: str,
+    request: Request = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields or presets (card, map_pin, full)")
+):
+    requested_fields = _resolve_property_fields(fields)
+    columns = _property_projection(requested_fields, ENRICHMENT_COLUMNS)
     try:
         print(f"[PROPERTIES] Fetching single property by ID or slug: {property_id_or_slug}")
         
-        # Check if user is authenticated and is a buyer
-        show_agent_info = False
-        if request:
-            try:
-                from ..core.security import try_get_current_user_claims
-                claims = try_get_current_user_claims(request)
-                if claims:
-                    user_id = claims.get("sub")
-                    if user_id:
-                        # Check if user is a buyer
-                        users = await db.select("users", filters={"id": user_id})
-                        if users:
-                            user = users[0]
-                            user_type = user.get("user_type", "").lower()
-                            # Check active roles if available
-                            try:
-                                from ..services.user_role_service import UserRoleService
-                                active_roles = await UserRoleService.get_active_user_roles(user_id)
-                                is_buyer = "buyer" in active_roles or user_type == "buyer"
-                            except Exception:
-                                is_buyer = user_type == "buyer"
-                            
-                            if is_buyer:
-                                show_agent_info = True
-                                print(f"[PROPERTIES] Buyer authenticated - will show agent info if available")
-            except Exception as auth_error:
-                print(f"[PROPERTIES] Auth check failed (non-buyer or not logged in): {auth_error}")
-                show_agent_info = False
+        # The buyer check (user + roles) does not depend on the property row,
+        # so it runs concurrently with the property lookup below
+        show_agent_info_task = asyncio.create_task(_resolve_show_agent_info(request))
         
-        # First, try to fetch by ID (assuming it's a UUID)
         try:
-            import uuid
-            uuid.UUID(property_id_or_slug) # Check if it's a valid UUID
-            properties = await db.select("properties", filters={"id": property_id_or_slug})
-            if properties:
-                property_data = dict(properties[0])
-                return await _process_single_property(property_data, show_agent_info=show_agent_info)
-        except ValueError:
-            # It's not a UUID, so treat it as a slug
-            pass
-
-        # If not found by ID, search by slug using database query
-        print(f"[PROPERTIES] Not a valid UUID. Searching by slug: {property_id_or_slug}")
-        import re
-        
-        # Try to find by searching titles that might match the slug
-        # First, try a direct search with the slug as a substring in title
-        # This is much more efficient than fetching all properties
-        search_term = property_id_or_slug.replace('-', ' ')
-        properties_by_title = await db.select(
-            "properties",
-            filters={"status": "active"},
-            limit=100  # Limit search to first 100 active properties
-        )
-        
-        # Search through limited results for slug match
-        for prop in properties_by_title:
-            title = prop.get('title', '')
-            if title:
-                # Generate slug from title
-                slug = title.lower()
-                slug = re.sub(r'[^a-z0-9\s-]', '', slug) # Remove special chars
-                slug = slug.strip()
-                slug = re.sub(r'\s+', '-', slug) # Replace spaces with dashes
-                slug = re.sub(r'-+', '-', slug) # Replace multiple dashes
-                
-                if slug == property_id_or_slug:
+            # First, try to fetch by ID (assuming it's a UUID)
+            try:
+                uuid.UUID(property_id_or_slug)  # Check if it's a valid UUID
+                properties = await db.select("properties", columns=columns, filters={"id": property_id_or_slug})
+                if properties:
+                    property_data = dict(properties[0])
+                    show_agent_info = await show_agent_info_task
+                    return await _process_single_property(property_data, show_agent_info=show_agent_info, requested=requested_fields)
+            except ValueError:
+                # It's not a UUID, so treat it as a slug
+                pass
+
+            # If not found by ID, search by slug using database query
+            print(f"[PROPERTIES] Not a valid UUID. Searching by slug: {property_id_or_slug}")
+            
+            # Try to find by searching titles that might match the slug
+            # This is much more efficient than fetching all properties
+            properties_by_title = await db.select(
+                "properties",
+                columns=_property_projection(requested_fields, ENRICHMENT_COLUMNS, {'title'}),
+                filters={"status": "active"},
+                limit=100  # Limit search to first 100 active properties
+            )
+            
+            # Search through limited results for slug match
+            for prop in properties_by_title:
+                title = prop.get('title', '')
+                if title and _slugify_title(title) == property_id_or_slug:
                     print(f"[PROPERTIES] Property found by slug: {prop.get('id')}")
-                    return await _process_single_property(dict(prop), show_agent_info=show_agent_info)
+                    show_agent_info = await show_agent_info_task
+                    return await _process_single_property(dict(prop), show_agent_info=show_agent_info, requested=requested_fields)
+        finally:
+            if not show_agent_info_task.done():
+                show_agent_info_task.cancel()
 
         # If we reach here, no property was found by ID or slug
         raise HTTPException(status_code=404, detail="Property not found")
@@ -1433,28 +1916,69 @@ async def get_property(property_id_or_slug: str, request: Request = None):
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error fetching property: {str(e)}")
 
-async def _process_single_property(property_data: dict, show_agent_info: bool = False):
-    """Helper function to process and enrich a single property object."""
-    # (The processing logic from the original get_property function will be moved here)
-    # Handle array fields, JSONB fields, fetch owner, fetch sections, fetch images, etc.
-    
-    # Handle PostgreSQL array fields
-    array_fields = ['images', 'amenities', 'room_images', 'gated_community_features']
-    for field in array_fields:
-        if property_data.get(field) is None:
-            property_data[field] = []
-        elif isinstance(property_data.get(field), str):
-            try:
-                import json
-                parsed = json.loads(property_data[field])
-                property_data[field] = parsed if isinstance(parsed, list) else []
-            except (json.JSONDecodeError, TypeError):
-                property_data[field] = []
 
-    # Fetch owner details if available (for agent-created properties)
-    # Owner details (owner_name, owner_email, owner_phone) are stored when agent creates property
+async def _fetch_users_by_ids(user_ids: list) -> dict:
+    """Fetch several users in one query and return them keyed by id."""
+    user_ids = [uid for uid in dict.fromkeys(user_ids) if uid]
+    if not user_ids:
+        return {}
+    try:
+        users = await db.select("users", filters={"id": {"in": user_ids}})
+        return {str(u.get('id')): dict(u) for u in users or []}
+    except Exception as e:
+        print(f"[PROPERTIES] Error fetching users {user_ids}: {e}")
+        return {}
+
+
+async def _fetch_document_images(property_ids: list) -> dict:
+    """Fetch image documents for several properties in one query, grouped by property id."""
+    property_ids = [pid for pid in dict.fromkeys(property_ids) if pid]
+    if not property_ids:
+        return {}
+    images_by_property: dict = {}
+    try:
+        image_docs = await db.select("documents", filters={
+            "entity_type": "property",
+            "entity_id": {"in": property_ids}
+        })
+        images_by_property = group_document_images(image_docs)
+    except Exception as img_err:
+        print(f"[PROPERTIES] Error fetching images: {img_err}")
+        print(traceback.format_exc())
+        # Ignore image fetch errors but log them
+    return images_by_property
+
+
+def _user_summary(user: dict) -> dict:
+    """Public contact summary for an owner/seller/agent user row."""
+    return {
+        'id': user.get('id'),
+        'first_name': user.get('first_name'),
+        'last_name': user.get('last_name'),
+        'name': f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
+        'email': user.get('email', ''),  # Use registered user's email
+        'phone_number': user.get('phone_number') or user.get('phone')
+    }
+
+
+def _related_user_ids(property_data: dict, show_agent_info: bool) -> list:
+    """User ids (owner, seller, agent) whose rows are needed to enrich a property."""
     # CRITICAL: owner_email, owner_name, owner_phone are NOT database columns - they're stored in nested 'owner' object
     # If owner_email is not provided, use the registered user's email from owner_id
+    if property_data.get('owner_name') or property_data.get('owner_email') or property_data.get('owner_phone'):
+        owner_id = property_data.get('owner_id') if not property_data.get('owner_email') else None
+    else:
+        owner_id = property_data.get('owner_id') or property_data.get('added_by')
+    agent_id = property_data.get("agent_id") or property_data.get("assigned_agent_id")
+    return [owner_id, property_data.get('seller_id'), agent_id if show_agent_info else None]
+
+
+def _apply_enrichment(property_data: dict, users_by_id: dict, images_by_property: dict, show_agent_info: bool,
+                      requested: Optional[set] = None) -> dict:
+    """Attach owner/seller/agent details, fallback images, coordinates and pricing to a property."""
+    owner_id, seller_id, _ = _related_user_ids(property_data, show_agent_info)
+
+    # Owner details (owner_name, owner_email, owner_phone) are stored when agent creates property
     if property_data.get('owner_name') or property_data.get('owner_email') or property_data.get('owner_phone'):
         # Use provided owner details
         property_data['owner'] = {
@@ -1462,133 +1986,129 @@ async def _process_single_property(property_data: dict, show_agent_info: bool =
             'email': property_data.get('owner_email', ''),
             'phone': property_data.get('owner_phone', '')
         }
-        # If owner_email is empty but we have owner_id, fetch email from users table
-        if not property_data.get('owner_email') and property_data.get('owner_id'):
-            try:
-                owners = await db.select("users", filters={"id": property_data.get('owner_id')})
-                if owners:
-                    owner = dict(owners[0])
-                    property_data['owner']['email'] = owner.get('email', '')
-                    print(f"[PROPERTIES] Using registered user's email for owner: {owner.get('email')}")
-            except Exception as e:
-                print(f"[PROPERTIES] Error fetching owner email: {e}")
-    else:
-        # Try to fetch owner from owner_id or added_by
-        owner_id = property_data.get('owner_id') or property_data.get('added_by')
-        if owner_id:
-            try:
-                owners = await db.select("users", filters={"id": owner_id})
-                if owners:
-                    owner = dict(owners[0])
-                    property_data['owner'] = {
-                        'id': owner.get('id'),
-                        'first_name': owner.get('first_name'),
-                        'last_name': owner.get('last_name'),
-                        'name': f"{owner.get('first_name', '')} {owner.get('last_name', '')}".strip(),
-                        'email': owner.get('email', ''),  # Use registered user's email
-                        'phone_number': owner.get('phone_number') or owner.get('phone')
-                    }
-                    print(f"[PROPERTIES] Fetched owner details from registered user: {owner.get('email')}")
-            except Exception as e:
-                print(f"[PROPERTIES] Error fetching owner details: {e}")
-                pass
+        owner = users_by_id.get(str(owner_id)) if owner_id else None
+        if owner:
+            property_data['owner']['email'] = owner.get('email', '')
+            print(f"[PROPERTIES] Using registered user's email for owner: {owner.get('email')}")
+    elif owner_id:
+        owner = users_by_id.get(str(owner_id))
+        if owner:
+            property_data['owner'] = _user_summary(owner)
+            print(f"[PROPERTIES] Fetched owner details from registered user: {owner.get('email')}")
 
-    # Fetch seller details if seller_id is set (for seller-created properties)
-    seller_id = property_data.get('seller_id')
+    # Seller details if seller_id is set (for seller-created properties)
     if seller_id:
-        try:
-            sellers = await db.select("users", filters={"id": seller_id})
-            if sellers:
-                seller = dict(sellers[0])
-                property_data['seller'] = {
-                    'id': seller.get('id'),
-                    'first_name': seller.get('first_name'),
-                    'last_name': seller.get('last_name'),
-                    'name': f"{seller.get('first_name', '')} {seller.get('last_name', '')}".strip(),
-                    'email': seller.get('email', ''),  # Use registered seller's email
-                    'phone_number': seller.get('phone_number') or seller.get('phone')
-                }
-                print(f"[PROPERTIES] Seller info added: {property_data['seller']['name']} ({property_data['seller']['email']})")
-        except Exception as e:
-            print(f"[PROPERTIES] Error fetching seller details: {e}")
-            pass
+        seller = users_by_id.get(str(seller_id))
+        if seller:
+            property_data['seller'] = _user_summary(seller)
+            print(f"[PROPERTIES] Seller info added: {property_data['seller']['name']} ({property_data['seller']['email']})")
 
-    # Fetch assigned agent details if available - ONLY for logged-in buyers
+    # Assigned agent details - ONLY for logged-in buyers
     agent_id = property_data.get("agent_id") or property_data.get("assigned_agent_id")
     if show_agent_info and agent_id:
-        try:
-            agents = await db.select("users", filters={"id": agent_id})
-            if agents:
-                agent = dict(agents[0])
-                # Add agent name and phone number (for logged-in buyers only)
-                property_data['agent'] = {
-                    'id': agent.get('id'),
-                    'name': f"{agent.get('first_name', '')} {agent.get('last_name', '')}".strip(),
-                    'phone_number': agent.get('phone_number') or agent.get('phone'),
-                }
-                # Also keep full agent details for backward compatibility
-                property_data['assigned_agent'] = {
-                    'id': agent.get('id'),
-                    'first_name': agent.get('first_name'),
-                    'last_name': agent.get('last_name'),
-                    'name': f"{agent.get('first_name', '')} {agent.get('last_name', '')}".strip(),
-                    'email': agent.get('email'),
-                    'phone_number': agent.get('phone_number') or agent.get('phone'),
-                }
-                print(f"[PROPERTIES] Agent info added for buyer: {property_data['agent']['name']}")
-            else:
-                print(f"[PROPERTIES] Agent ID {agent_id} not found in database")
-        except Exception as e:
-            print(f"[PROPERTIES] Error fetching agent info: {e}")
-            pass # Ignore agent fetch errors
+        agent = users_by_id.get(str(agent_id))
+        if agent:
+            # Add agent name and phone number (for logged-in buyers only)
+            property_data['agent'] = {
+                'id': agent.get('id'),
+                'name': f"{agent.get('first_name', '')} {agent.get('last_name', '')}".strip(),
+                'phone_number': agent.get('phone_number') or agent.get('phone'),
+            }
+            # Also keep full agent details for backward compatibility
+            property_data['assigned_agent'] = {
+                'id': agent.get('id'),
+                'first_name': agent.get('first_name'),
+                'last_name': agent.get('last_name'),
+                'name': f"{agent.get('first_name', '')} {agent.get('last_name', '')}".strip(),
+                'email': agent.get('email'),
+                'phone_number': agent.get('phone_number') or agent.get('phone'),
+            }
+            print(f"[PROPERTIES] Agent info added for buyer: {property_data['agent']['name']}")
+        else:
+            print(f"[PROPERTIES] Agent ID {agent_id} not found in database")
     else:
         if not show_agent_info:
             print(f"[PROPERTIES] Agent info not shown - user not authenticated as buyer")
         elif not agent_id:
             print(f"[PROPERTIES] Agent info not shown - property has no assigned agent")
 
-    # Fetch images if empty
-    if not property_data.get('images'):
-        try:
-            image_docs = await db.select("documents", filters={"entity_type": "property", "entity_id": property_data.get('id')})
-            if image_docs:
-                image_urls = []
-                for doc in image_docs:
-                    file_type = doc.get('file_type', '')
-                    if file_type.startswith('image/'):
-                        image_url = doc.get('url') or doc.get('file_path')
-                        if image_url:
-                            # If it's not already a full URL, convert file_path to public URL
-                            if not (image_url.startswith('http://') or image_url.startswith('https://')):
-                                try:
-                                    # Property images are in 'property-images' bucket
-                                    public_url = db.supabase_client.storage.from_('property-images').get_public_url(image_url)
-                                    image_url = public_url
-                                except Exception as url_error:
-                                    print(f"[PROPERTIES] Failed to get public URL for {image_url}: {url_error}")
-                                    # Try documents bucket as fallback
-                                    try:
-                                        public_url = db.supabase_client.storage.from_('documents').get_public_url(image_url)
-                                        image_url = public_url
-                                    except:
-                                        # Use file_path as-is if conversion fails
-                                        pass
-                            image_urls.append(image_url)
-                property_data['images'] = image_urls
-        except Exception as img_err:
-            print(f"[PROPERTIES] Error fetching images: {img_err}")
-            import traceback
-            print(traceback.format_exc())
-            # Ignore image fetch errors but log them
+    # Images from documents table if the row had none
+    if not property_data.get('images') and property_data.get('id') in images_by_property:
+        property_data['images'] = images_by_property[property_data.get('id')]
 
-    # Ensure coordinates
-    if property_data.get('latitude') is None or property_data.get('longitude') is None:
-        property_data['latitude'] = 17.3850
-        property_data['longitude'] = 78.4867
+    # Missing coordinates stay null (scripts/backfill_property_coordinates.py fills them);
+    # a made-up default would put the property on the map at the wrong place
     
     # Add formatted pricing display
-    property_data['formatted_pricing'] = _format_property_pricing(property_data)
-        
+    if requested is None or 'formatted_pricing' in requested:
+        property_data['formatted_pricing'] = _property_pricing(property_data)
+    return _trim_property_fields(property_data, requested)
+
+
+async def _enrich_properties(properties: list, show_agent_info: bool = False, requested: Optional[set] = None) -> list:
+    """
+    Enrich several property rows with shared lookups.
+    
+    Owner, seller and agent rows for every property are loaded with one batched
+    ``users`` query that runs concurrently with one documents/images query, so
+    enrichment costs roughly one database round trip regardless of how many
+    properties are passed. Returns ``(property, error)`` pairs in input order;
+    ``error`` is set when a single property could not be enriched.
+    
+    With a sparse fieldset (``requested``), lookups for fields that were not
+    asked for are skipped and the result is trimmed to the requested fields.
+    """
+    import time
+    start_time = time.time()
+    timings = {}
+    
+    # Array fields are canonical for rows written since write-time normalization;
+    # older rows are fixed up here
+    for property_data in properties:
+        _normalize_property_fields(property_data, requested, fill_missing=True)
+
+    # Work out which related rows are needed before issuing any query
+    needed_user_ids = []
+    if requested is None or requested & {'owner', 'seller', 'agent', 'assigned_agent'}:
+        for property_data in properties:
+            needed_user_ids.extend(_related_user_ids(property_data, show_agent_info))
+    ids_needing_images = []
+    if requested is None or 'images' in requested:
+        ids_needing_images = [p.get('id') for p in properties if not p.get('images')]
+
+    async def _timed(step: str, coro):
+        step_start = time.time()
+        try:
+            return await coro
+        finally:
+            timings[step] = (time.time() - step_start) * 1000
+
+    users_by_id, images_by_property = await asyncio.gather(
+        _timed('users', _fetch_users_by_ids(needed_user_ids)),
+        _timed('images', _fetch_document_images(ids_needing_images))
+    )
+
+    step_start = time.time()
+    results = []
+    for property_data in properties:
+        try:
+            results.append((_apply_enrichment(property_data, users_by_id, images_by_property, show_agent_info, requested), None))
+        except Exception as e:
+            print(f"[PROPERTIES] Failed to enrich property {property_data.get('id')}: {e}")
+            results.append((property_data, str(e)))
+    timings['apply'] = (time.time() - step_start) * 1000
+
+    total_elapsed = (time.time() - start_time) * 1000
+    breakdown = ", ".join(f"{step}={elapsed:.0f}ms" for step, elapsed in timings.items())
+    print(f"[PROPERTIES] Enrichment for {len(properties)} properties: {breakdown}, total={total_elapsed:.0f}ms")
+    return results
+
+
+async def _process_single_property(property_data: dict, show_agent_info: bool = False, requested: Optional[set] = None):
+    """Helper function to process and enrich a single property object."""
+    property_data, error = (await _enrich_properties([property_data], show_agent_info=show_agent_info, requested=requested))[0]
+    if error:
+        raise Exception(error)
     return property_data
 
 
@@ -1715,29 +2235,6 @@ async def update_property(property_id: str, update_data: dict):
                 if update_data.get('starting_price_per_unit') is None and update_data.get('rate_per_sqyd'):
                     update_data['starting_price_per_unit'] = update_data.get('rate_per_sqyd')
         
-        # Define valid database columns for properties table (based on actual schema)
-        valid_property_columns = {
-            'id', 'custom_id', 'title', 'description', 'price', 'monthly_rent', 'security_deposit',
-            'property_type', 'bedrooms', 'bathrooms', 'area_sqft', 'area_sqyd', 'area_acres', 'area_unit',  # Added area_unit
-            'address', 'city', 'state', 'zip_code', 'latitude', 'longitude', 'images', 'amenities', 
-            'owner_id', 'status', 'featured', 'verified', 'listing_type', 'available_from', 'furnishing_status',
-            'created_at', 'updated_at', 'district', 'mandal', 'room_images', 'maintenance_charges',
-            'rate_per_sqft', 'rate_per_sqyd', 'carpet_area_sqft', 'built_up_area_sqft', 
-            'plot_area_sqft', 'plot_area_sqyd', 'commercial_subtype', 'total_floors', 'available_floor', 
-            'parking_slots', 'bhk_config', 'floor_count', 'facing', 'private_garden', 'private_driveway', 
-            'plot_dimensions', 'land_type', 'soil_type', 'road_access', 'boundary_fencing', 
-            'water_availability', 'electricity_availability', 'apartment_type', 'floor_number', 
-            'total_floors_building', 'balconies', 'community_type', 'gated_community_features', 
-            'visitor_parking', 'legal_status', 'rera_status', 'rera_number', 'video_url', 
-            'virtual_tour_url', 'nearby_business_hubs', 'nearby_transport', 'agent_id', 'priority', 
-            'possession_date', 'corner_plot', 'water_source', 'amenities_json', 'images_json', 
-            'added_by', 'added_by_role', 'state_id', 'district_id', 'mandal_id', 'floor', 
-            'lift_available', 'parking_spaces', 'assigned_agent_id', 'assignment_date', 
-            'assignment_status', 'assignment_notes', 'transfer_reason', 'previous_agent_id', 'seller_id',
-            # New pricing fields for new_property and lot types
-            'pricing_display_mode', 'starting_price_per_unit', 'pricing_unit_type'
-            # Note: city_id is NOT in the database schema, so it's not included here
-        }
         
         # CRITICAL: Remove city_id from update_data as it doesn't exist in the database
         if 'city_id' in update_data:
@@ -1774,7 +2271,7 @@ async def update_property(property_id: str, update_data: dict):
         # Filter update_data to only include valid database columns
         filtered_update_data = {}
         for key, value in update_data.items():
-            if key in valid_property_columns:
+            if key in PROPERTY_COLUMNS:
                 filtered_update_data[key] = value
                 # Debug: Log area_unit specifically
                 if key == 'area_unit':
@@ -1783,49 +2280,15 @@ async def update_property(property_id: str, update_data: dict):
                 print(f"[PROPERTIES] Skipping invalid column '{key}' - not in database schema")
         
         # Handle array fields that exist in the database as PostgreSQL arrays (TEXT[])
-        # These should be sent as native arrays, not JSON strings
-        array_fields = ['images', 'amenities', 'room_images', 'gated_community_features']
-        for field in array_fields:
-            if field in filtered_update_data:
-                value = filtered_update_data[field]
-                print(f"[PROPERTIES] Processing {field}: {value} (type: {type(value)})")
-                
-                if isinstance(value, (list, dict)):
-                    # Keep as native array for PostgreSQL array columns
-                    # Don't convert to JSON string
-                    filtered_update_data[field] = value
-                    print(f"[PROPERTIES] {field} kept as array: {value}")
-                elif isinstance(value, str):
-                    # Handle string values
-                    if value == '[]' or value == '{}' or value == '' or value == 'NA':
-                        # Set empty array for empty/null values
-                        filtered_update_data[field] = []
-                        print(f"[PROPERTIES] {field} set to empty array")
-                    else:
-                        # Try to parse as JSON if it's a string
-                        try:
-                            import json
-                            parsed_value = json.loads(value)
-                            filtered_update_data[field] = parsed_value
-                            print(f"[PROPERTIES] {field} parsed from JSON: {parsed_value}")
-                        except (json.JSONDecodeError, TypeError):
-                            # If parsing fails, treat as single item array
-                            filtered_update_data[field] = [value] if value else []
-                            print(f"[PROPERTIES] {field} treated as single item array: {[value] if value else []}")
-                elif value is None:
-                    # Set empty array for null values
-                    filtered_update_data[field] = []
-                    print(f"[PROPERTIES] {field} set to empty array for null")
-                else:
-                    # For any other type, try to convert to array
-                    filtered_update_data[field] = [value] if value else []
-                    print(f"[PROPERTIES] {field} converted to array: {[value] if value else []}")
+        # These should be sent as native arrays, not JSON strings. Pricing display
+        # is recomputed from the merged row whenever a pricing column changes.
+        _prepare_property_write(filtered_update_data, existing=dict(existing_properties[0]))
         
         # Update property (only existing columns)
         try:
             # Debug: Print what we're sending to database
             print(f"[PROPERTIES] Sending to database:")
-            for field in array_fields:
+            for field in PROPERTY_ARRAY_FIELDS:
                 if field in filtered_update_data:
                     print(f"[PROPERTIES] DB {field}: {filtered_update_data[field]} (type: {type(filtered_update_data[field])})")
             
@@ -1841,6 +2304,10 @@ async def update_property(property_id: str, update_data: dict):
             result = await db.update("properties", clean_update_data, {"id": property_id})
             print(f"[PROPERTIES] Updating fields: {list(clean_update_data.keys())}")
             
+            # Reflect the write in the grid index (and tile cache version) right away;
+            # the db write hook re-reads the row shortly after as well
+            property_spatial_index.sync_property({**existing_properties[0], **clean_update_data, 'id': property_id})
+            
             # Handle sections update separately if provided
             if sections_data is not None:
                 if isinstance(sections_data, str):
@@ -1896,21 +2363,8 @@ async def update_property(property_id: str, update_data: dict):
                                     # Use 'file_path' if available, otherwise fallback to 'url'
                                     image_url = doc.get('file_path') or doc.get('url')
                                     if image_url:
-                                        # If it's not already a full URL, convert file_path to public URL
-                                        if not (image_url.startswith('http://') or image_url.startswith('https://')):
-                                            try:
-                                                # Property images are in 'property-images' bucket
-                                                public_url = db.supabase_client.storage.from_('property-images').get_public_url(image_url)
-                                                image_url = public_url
-                                            except Exception as url_error:
-                                                print(f"[PROPERTIES] Failed to get public URL for {image_url}: {url_error}")
-                                                # Try documents bucket as fallback
-                                                try:
-                                                    public_url = db.supabase_client.storage.from_('documents').get_public_url(image_url)
-                                                    image_url = public_url
-                                                except:
-                                                    # Use file_path as-is if conversion fails
-                                                    pass
+                                        # Resolve storage paths to public URLs (memoized)
+                                        image_url = resolve_image_url(image_url)
                                         image_urls.append(image_url)
                             
                             if image_urls:
@@ -1919,7 +2373,7 @@ async def update_property(property_id: str, update_data: dict):
                                 await db.update("properties", {"images": image_urls}, {"id": property_id})
                     
                     # Add formatted pricing display
-                    property_data['formatted_pricing'] = _format_property_pricing(property_data)
+                    property_data['formatted_pricing'] = _property_pricing(property_data)
                     
                     print(f"[PROPERTIES] Property updated successfully: {property_id}")
                     return {
@@ -2108,6 +2562,7 @@ async def delete_property(property_id: str, request: Request, _=Depends(require_
         try:
             delete_result = await db.delete("properties", {"id": property_id})
             print(f"[PROPERTIES] ✓ Deleted property record: {delete_result}")
+            property_spatial_index.remove(property_id)
             if not delete_result or (isinstance(delete_result, list) and len(delete_result) == 0):
                 print(f"[PROPERTIES] ⚠️ Delete returned empty result - property may not exist or already deleted")
                 # Don't fail if property doesn't exist - it's already deleted
@@ -2206,21 +2661,8 @@ async def get_property_images(property_id: str):
                     # Use 'file_path' if available, otherwise fallback to 'url'
                     image_url = doc.get('file_path') or doc.get('url')
                     if image_url:
-                        # If it's not already a full URL, convert file_path to public URL
-                        if not (image_url.startswith('http://') or image_url.startswith('https://')):
-                            try:
-                                # Property images are in 'property-images' bucket
-                                public_url = db.supabase_client.storage.from_('property-images').get_public_url(image_url)
-                                image_url = public_url
-                            except Exception as url_error:
-                                print(f"[PROPERTIES] Failed to get public URL for {image_url}: {url_error}")
-                                # Try documents bucket as fallback
-                                try:
-                                    public_url = db.supabase_client.storage.from_('documents').get_public_url(image_url)
-                                    image_url = public_url
-                                except:
-                                    # Use file_path as-is if conversion fails
-                                    pass
+                        # Resolve storage paths to public URLs (memoized)
+                        image_url = resolve_image_url(image_url)
                         images.append({
                             "id": doc.get('id'),
                             "url": image_url,
@@ -2249,21 +2691,11 @@ async def get_property_contact(property_id: str, request: Request = None, user_r
         is_authenticated_buyer = False
         if request:
             try:
-                from ..core.security import try_get_current_user_claims
-                claims = try_get_current_user_claims(request)
-                if claims:
-                    user_id = claims.get("sub")
-                    if user_id:
-                        users = await db.select("users", filters={"id": user_id})
-                        if users:
-                            user = users[0]
-                            user_type = user.get("user_type", "").lower()
-                            try:
-                                from ..services.user_role_service import UserRoleService
-                                active_roles = await UserRoleService.get_active_user_roles(user_id)
-                                is_authenticated_buyer = "buyer" in active_roles or user_type == "buyer"
-                            except Exception:
-                                is_authenticated_buyer = user_type == "buyer"
+                from ..core.auth_context import get_auth_context
+                principal = await get_auth_context(request).principal()
+                if principal:
+                    user_type = (principal["user"].get("user_type") or "").lower()
+                    is_authenticated_buyer = "buyer" in principal["roles"] or user_type == "buyer"
             except Exception as auth_error:
                 print(f"[PROPERTIES] Auth check failed: {auth_error}")
         
@@ -2333,6 +2765,20 @@ async def get_zipcode_suggestions(zipcode: str):
     try:
         print(f"[PROPERTIES] Fetching suggestions for zipcode: {zipcode}")
         
+        # Partial pincode (typing in progress): serve prefix matches from memory
+        zipcode = zipcode.strip()
+        if zipcode.isdigit() and len(zipcode) < 6:
+            await locality_index.ensure_loaded()
+            matches = locality_index.search(zipcode, limit=10, types=['pincode'])
+            if not matches:
+                raise HTTPException(status_code=404, detail=f"No pincodes found starting with {zipcode}")
+            return {
+                "zipcode": zipcode,
+                "pincode": zipcode,  # Keep for backward compatibility
+                "partial": True,
+                "matches": matches
+            }
+        
         from ..services.location_service import LocationService
         
         # Get complete location data
@@ -2382,7 +2828,7 @@ async def geocode_address(address_data: dict):
         
         from ..services.google_maps_service import GoogleMapsService
         
-        location_data = GoogleMapsService.geocode_address(address)
+        location_data = await GoogleMapsService.geocode_address(address)
         
         if not location_data:
             raise HTTPException(status_code=404, detail="Could not geocode the address")
@@ -2434,7 +2880,7 @@ async def get_place_autocomplete(
     try:
         from ..services.google_maps_service import GoogleMapsService
         
-        suggestions = GoogleMapsService.get_place_autocomplete(input_text, country)
+        suggestions = await GoogleMapsService.get_place_autocomplete(input_text, country)
         
         return {
             "success": True,
@@ -2444,13 +2890,36 @@ async def get_place_autocomplete(
         print(f"[PROPERTIES] Error getting autocomplete: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get autocomplete: {str(e)}")
 
+@router.get("/localities/autocomplete", tags=["properties"])
+async def get_locality_autocomplete(
+    q: str = Query(..., min_length=1, description="Pincode or place name prefix"),
+    limit: int = Query(10, ge=1, le=50),
+    types: Optional[str] = Query(None, description="Comma-separated: city, mandal, locality, district, pincode")
+):
+    """Locality autocomplete from the in-memory prefix index, ranked by active listings; Google Places only when nothing matches locally"""
+    try:
+        await locality_index.ensure_loaded()
+        type_filter = [t.strip() for t in types.split(',') if t.strip()] if types else None
+        suggestions = locality_index.search(q, limit=limit, types=type_filter)
+        if suggestions:
+            return {"success": True, "source": "local", "suggestions": suggestions}
+        
+        from ..services.google_maps_service import GoogleMapsService
+        
+        print(f"[PROPERTIES] No local locality match for '{q}', falling back to Google Places")
+        predictions = await GoogleMapsService.get_place_autocomplete(q, "in")
+        return {"success": True, "source": "google", "suggestions": predictions[:limit]}
+    except Exception as e:
+        print(f"[PROPERTIES] Error getting locality autocomplete: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get locality autocomplete: {str(e)}")
+
 @router.get("/places/{place_id}", tags=["properties"])
 async def get_place_details(place_id: str):
     """Get detailed information about a place using Google Places API"""
     try:
         from ..services.google_maps_service import GoogleMapsService
         
-        place_data = GoogleMapsService.get_place_details(place_id)
+        place_data = await GoogleMapsService.get_place_details(place_id)
         
         if not place_data:
             raise HTTPException(status_code=404, detail="Place not found")
@@ -5,6 +5,7 @@ from ..core.security import require_api_key
 from ..services.email import send_email
 from ..services.templates import inquiry_email, booking_email, booking_status_email, inquiry_status_email, notify_info
 from ..db.supabase_client import db
+from .properties import _prepare_property_write
 import datetime as dt
 import uuid
 
@@ -646,6 +647,8 @@ async def create_property(prop: dict, _=Depends(require_api_key)):
             "images": getattr(prop, 'images', []) or [],
             "created_at": dt.datetime.now(dt.timezone.utc).isoformat()
         }
+        # Canonical arrays and stored formatted_pricing, same as the other property writes
+        _prepare_property_write(property_data)
 
         # Diagnostic: which client and service-role validity
         try:
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import Optional, List, Dict, Any
 from ..db.supabase_client import db
+from ..services.image_urls import resolve_image_url
 from ..core.security import get_current_user_claims
 import datetime as dt
 import traceback
@@ -195,21 +196,8 @@ async def get_seller_properties(
                     images_by_property[prop_id] = []
                 image_url = doc.get("file_path") or doc.get("url")
                 if image_url:
-                    # If it's not already a full URL, convert file_path to public URL
-                    if not (image_url.startswith('http://') or image_url.startswith('https://')):
-                        try:
-                            # Property images are in 'property-images' bucket
-                            public_url = db.supabase_client.storage.from_('property-images').get_public_url(image_url)
-                            image_url = public_url
-                        except Exception as url_error:
-                            print(f"[SELLER] Failed to get public URL for {image_url}: {url_error}")
-                            # Try documents bucket as fallback
-                            try:
-                                public_url = db.supabase_client.storage.from_('documents').get_public_url(image_url)
-                                image_url = public_url
-                            except:
-                                # Use file_path as-is if conversion fails
-                                pass
+                    # Resolve storage paths to public URLs (memoized)
+                    image_url = resolve_image_url(image_url)
                     images_by_property[prop_id].append(image_url)
         
         agents_by_id = {}
@@ -875,21 +863,8 @@ async def get_seller_property_details(property_id: str, request: Request):
                     if file_type.startswith('image/'):
                         image_url = doc.get("file_path") or doc.get("url")
                         if image_url:
-                            # If it's not already a full URL, convert file_path to public URL
-                            if not (image_url.startswith('http://') or image_url.startswith('https://')):
-                                try:
-                                    # Property images are in 'property-images' bucket
-                                    public_url = db.supabase_client.storage.from_('property-images').get_public_url(image_url)
-                                    image_url = public_url
-                                except Exception as url_error:
-                                    print(f"[SELLER] Failed to get public URL for {image_url}: {url_error}")
-                                    # Try documents bucket as fallback
-                                    try:
-                                        public_url = db.supabase_client.storage.from_('documents').get_public_url(image_url)
-                                        image_url = public_url
-                                    except:
-                                        # Use file_path as-is if conversion fails
-                                        pass
+                            # Resolve storage paths to public URLs (memoized)
+                            image_url = resolve_image_url(image_url)
                             property_images.append(image_url)
         except Exception as img_error:
             print(f"[SELLER] Error fetching property images: {img_error}")
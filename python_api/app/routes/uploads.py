@@ -2,6 +2,7 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, R
 from fastapi.responses import RedirectResponse
 from ..core.security import require_api_key, try_get_current_user_claims # Use the new optional auth
 from ..db.supabase_client import db
+from ..services.image_urls import attach_image_to_property
 import os
 import uuid
 import datetime as dt
@@ -100,13 +101,23 @@ async def upload_file_to_storage(
     try:
         result = await db.insert("documents", doc_data)
         print(f"[UPLOAD] Document uploaded successfully: {public_url}, entity: {entity_type}:{entity_id}")
-        return result[0] if result else None
     except Exception as insert_error:
         print(f"[UPLOAD] Failed to insert document record: {insert_error}")
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Failed to record document metadata")
 
+    # Persist the resolved public URL onto the property so listings can skip the documents fallback
+    if normalized_entity_type == 'property' and file.content_type.startswith("image/"):
+        try:
+            if await attach_image_to_property(entity_id, public_url):
+                print(f"[UPLOAD] Added image to property {entity_id}")
+        except Exception as attach_error:
+            # The document row is the source of truth; the backfill job can fill this in later
+            print(f"[UPLOAD] Failed to add image to property {entity_id}: {attach_error}")
+
+    return result[0] if result else None
+
 
 @router.post("/upload")
 async def upload_file(
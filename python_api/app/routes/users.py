@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
 from ..models.schemas import UpdateProfileRequest, BankDetailsRequest
 from ..core.security import get_current_user_claims
+from ..core.auth_context import get_auth_context
 from ..services.otp_service import verify_otp_simple
 from ..db.supabase_client import db
 import datetime as dt
@@ -20,21 +21,15 @@ async def get_user_profile(request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        # Get user details
-        users = await db.select("users", filters={"id": user_id})
-        if not users:
+        # Get user details and active roles (resolved once per request)
+        principal = await get_auth_context(request).principal()
+        if not principal:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user = users[0]
+        user = principal["user"]
         user_type = user.get("user_type", "buyer")
-        
-        # Get user's active roles
-        try:
-            from ..services.user_role_service import UserRoleService
-            active_roles = await UserRoleService.get_active_user_roles(user_id)
-        except Exception as role_error:
-            print(f"[USERS] Failed to get user roles: {role_error}")
-            active_roles = [user_type]
+        # Role lookup failed: report the registered user type rather than no roles
+        active_roles = [user_type] if principal.get("roles_failed") else principal["roles"]
         
         # Fetch agent profile data if user is an agent
         experience_years = None
@@ -117,15 +112,15 @@ async def update_profile(payload: UpdateProfileRequest, request: Request):
         # For sensitive updates, require current password or OTP verification
         if payload.current_password:
             print(f"[USERS] Current password provided, verifying...")
-            from ..core.crypto import verify_password
+            from ..core.crypto import verify_password_async
             password_hash = current_user.get("password_hash")
-            if not password_hash or not verify_password(payload.current_password, password_hash):
+            if not password_hash or not await verify_password_async(payload.current_password, password_hash):
                 raise HTTPException(status_code=400, detail="Invalid current password")
             print(f"[USERS] Current password verified for profile update")
         elif payload.otp:
             print(f"[USERS] OTP provided, verifying...")
             phone = current_user.get("phone_number", "")
-            if not verify_otp_simple(phone, payload.otp, "profile_update"):
+            if not await verify_otp_simple(phone, payload.otp, "profile_update"):
                 raise HTTPException(status_code=400, detail="Invalid OTP")
             print(f"[USERS] OTP verified for profile update")
         
@@ -320,7 +315,7 @@ async def update_bank_details(payload: BankDetailsRequest, request: Request):
         print(f"[USERS] Updating bank details for user: {user_id}")
         
         # Verify OTP (required for bank details)
-        if not verify_otp_simple(payload.phone, payload.otp, "bank_update"):
+        if not await verify_otp_simple(payload.phone, payload.otp, "bank_update"):
             print(f"[USERS] Invalid OTP for bank update")
             raise HTTPException(status_code=400, detail="Invalid OTP for bank update")
         
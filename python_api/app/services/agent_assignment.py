@@ -6,7 +6,9 @@ Handles automatic assignment of agents to properties and inquiries with pincode-
 import asyncio
 from typing import Dict, List, Optional, Any
 from ..db.supabase_client import db
+from .geo_distance import haversine_km_many
 import datetime as dt
+import numpy as np
 
 class AgentAssignmentService:
     """Service for managing agent assignments to properties and inquiries"""
@@ -85,7 +87,7 @@ class AgentAssignmentService:
             
             if not agents_in_area:
                 # If no agents in same pincode, get agents from nearby areas
-                agents_in_area = await AgentAssignmentService._get_agents_by_nearby_pincodes(zip_code)
+                agents_in_area = await AgentAssignmentService._get_agents_by_nearby_pincodes(zip_code, property_data)
             
             if not agents_in_area:
                 return {"success": False, "error": "No agents available in the area"}
@@ -131,19 +133,54 @@ class AgentAssignmentService:
             return []
     
     @staticmethod
-    async def _get_agents_by_nearby_pincodes(zip_code: str) -> List[Dict[str, Any]]:
-        """Get agents from nearby pincode areas"""
+    async def _get_agents_by_nearby_pincodes(zip_code: str, property_data: Optional[Dict[str, Any]] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Get the active agents whose pincodes are closest to the property"""
         try:
-            # For now, get all active agents as fallback
-            # In a real implementation, you'd have a pincode proximity service
             agents = await db.select("users", filters={
                 "user_type": "agent",
                 "status": "active"
             })
-            return agents[:5]  # Limit to 5 agents
         except Exception as e:
             print(f"[AGENT_ASSIGNMENT] Error getting nearby agents: {e}")
             return []
+        if not agents:
+            return []
+        
+        try:
+            # Property location: its own coordinates, else its pincode's centroid
+            property_data = property_data or {}
+            origin = None
+            if property_data.get("latitude") is not None and property_data.get("longitude") is not None:
+                origin = (float(property_data["latitude"]), float(property_data["longitude"]))
+            
+            agent_zips = list({agent.get("zip_code") for agent in agents if agent.get("zip_code")})
+            lookup_zips = agent_zips + ([zip_code] if origin is None else [])
+            pincode_rows = await db.select("pincodes", columns="pincode,latitude,longitude", filters={
+                "pincode": {"in": lookup_zips}
+            }) if lookup_zips else []
+            coords_by_zip = {
+                str(row.get("pincode")): (float(row["latitude"]), float(row["longitude"]))
+                for row in pincode_rows or []
+                if row.get("latitude") is not None and row.get("longitude") is not None
+            }
+            if origin is None:
+                origin = coords_by_zip.get(str(zip_code))
+            
+            located = [agent for agent in agents if str(agent.get("zip_code")) in coords_by_zip]
+            if origin is None or not located:
+                # No coordinates to rank by - fall back to any active agents
+                return agents[:limit]
+            
+            # One vectorized distance pass over every agent's pincode centroid
+            coords = np.array([coords_by_zip[str(agent.get("zip_code"))] for agent in located])
+            distances = haversine_km_many(origin[0], origin[1], coords[:, 0], coords[:, 1])
+            nearest = np.argsort(distances, kind="stable")[:limit]
+            print(f"[AGENT_ASSIGNMENT] Ranked {len(located)} agents by distance from pincode {zip_code}")
+            return [{**located[i], "distance_km": round(float(distances[i]), 2)} for i in nearest]
+        except Exception as e:
+            # Ranking is best effort (bad coordinates, pincode lookup errors); still notify agents
+            print(f"[AGENT_ASSIGNMENT] Error ranking nearby agents, using unranked agents: {e}")
+            return agents[:limit]
     
     @staticmethod
     async def _send_property_notifications(property_id: str, agents: List[Dict[str, Any]], current_round: int) -> Dict[str, Any]:
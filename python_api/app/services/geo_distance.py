@@ -0,0 +1,38 @@
+"""
+Geo Distance
+Haversine distance kernels shared by location search, agent proximity and map clustering.
+
+``haversine_km`` handles a single pair; ``haversine_km_many`` computes distances
+from one point to whole coordinate arrays with NumPy instead of a Python loop.
+"""
+
+import math
+from typing import Sequence, Union
+
+import numpy as np
+
+# Radius of earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+ArrayLike = Union[Sequence[float], np.ndarray]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometers."""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km_many(lat: float, lon: float, lats: ArrayLike, lons: ArrayLike) -> np.ndarray:
+    """Distances in kilometers from (lat, lon) to every point of the lats/lons arrays."""
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lons_rad = np.radians(np.asarray(lons, dtype=np.float64))
+    lat_rad = math.radians(lat)
+    dlat = lats_rad - lat_rad
+    dlon = lons_rad - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat_rad) * np.cos(lats_rad) * np.sin(dlon / 2) ** 2
+    # Clip guards against rounding pushing a just above 1 for antipodal points
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
@@ -0,0 +1,41 @@
+"""
+Geo HTTP
+Pooled async HTTP client shared by every outbound geocoding call (OpenStreetMap,
+PostalPincode, geocode.xyz, Google Maps), so lookups reuse keep-alive connections instead of
+opening a new client per request and never block the event loop.
+"""
+
+import asyncio
+from typing import Optional
+
+import httpx
+
+# Required by OpenStreetMap's usage policy
+USER_AGENT = 'HomeAndOwn-PropertyPlatform/1.0 (contact@homeandown.com)'
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+POOL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_geo_client() -> httpx.AsyncClient:
+    """Shared client for the running event loop (recreated if the loop changed)"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=POOL_LIMITS,
+            headers={'User-Agent': USER_AGENT}
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_geo_client() -> None:
+    """Close the shared client (application shutdown)"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client, _client_loop = None, None
@@ -0,0 +1,276 @@
+"""
+Geocode Cache
+One cache layer for every geocoding lookup (pincode coordinates, forward/reverse
+geocoding, postal data, place details), keyed by kind + normalized query.
+
+Lookups go memory (bounded LRU) -> geocode_cache table -> provider. Successful
+answers are kept for POSITIVE_TTL; definitive "no result" answers are kept for the
+shorter NEGATIVE_TTL. get_or_fetch() hands a fresh answer to its callers first and
+writes it to the table in a background task (flush() waits for those writes). Provider failures (timeouts, rate limits, HTTP errors) raise
+GeocodeUnavailable and are never cached, so they are retried on the next request.
+"""
+
+import asyncio
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from ..db.supabase_client import db
+
+POSITIVE_TTL = 30 * 24 * 3600
+NEGATIVE_TTL = 6 * 3600
+# Reverse geocodes are keyed on coordinates rounded to ~1 m
+COORDINATE_PRECISION = 5
+# Opaque provider identifiers (Google place_id) are case-sensitive
+CASE_SENSITIVE_KINDS = {"google_place"}
+
+_MISSING = object()
+
+
+class GeocodeUnavailable(Exception):
+    """The provider could not answer (as opposed to answering "not found")"""
+
+
+def normalize_query(query: Any) -> str:
+    """Lowercased, whitespace-collapsed query; coordinate pairs are rounded"""
+    if isinstance(query, (tuple, list)):
+        parts = []
+        for part in query:
+            if isinstance(part, float):
+                part = round(part, COORDINATE_PRECISION)
+            parts.append(normalize_query(part))
+        return "|".join(parts)
+    return " ".join(str(query if query is not None else "").lower().replace(",", " ").split())
+
+
+class GeocodeCache:
+    """Bounded in-memory LRU in front of the geocode_cache table"""
+
+    def __init__(self, max_entries: int = 20000, table: str = "geocode_cache"):
+        self.max_entries = max_entries
+        self.table = table
+        # key -> (value, expires_at); value None means a cached "not found"
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # lookup()/store() also run in worker threads
+        self._lock = threading.Lock()
+        self._store_enabled = True
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Background table writes, kept referenced until they finish
+        self._persist_tasks: Set[asyncio.Task] = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # ---- metrics ----
+
+    def _count(self, kind: str, metric: str) -> None:
+        kind_stats = self._stats.setdefault(kind, {
+            "memory_hits": 0, "store_hits": 0, "negative_hits": 0,
+            "misses": 0, "fetch_errors": 0, "evictions": 0
+        })
+        kind_stats[metric] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per kind plus totals"""
+        totals: Dict[str, int] = {}
+        for kind_stats in self._stats.values():
+            for metric, value in kind_stats.items():
+                totals[metric] = totals.get(metric, 0) + value
+        hits = totals.get("memory_hits", 0) + totals.get("store_hits", 0) + totals.get("negative_hits", 0)
+        lookups = hits + totals.get("misses", 0)
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "store_enabled": self._store_enabled,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "totals": totals,
+            "by_kind": {kind: dict(kind_stats) for kind, kind_stats in self._stats.items()}
+        }
+
+    # ---- memory layer ----
+
+    @staticmethod
+    def make_key(kind: str, query: Any) -> str:
+        if kind in CASE_SENSITIVE_KINDS:
+            return f"{kind}:{str(query).strip()}"
+        return f"{kind}:{normalize_query(query)}"
+
+    def _memory_get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if time.time() > expires_at:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def _memory_set(self, kind: str, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count(kind, "evictions")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # ---- durable layer (sync supabase client; async callers use a thread) ----
+
+    def _disable_store(self, error: Exception) -> None:
+        if "does not exist" in str(error) or "relation" in str(error) or "PGRST205" in str(error):
+            print(f"[GEOCODE_CACHE] Table {self.table} doesn't exist, caching in memory only")
+            self._store_enabled = False
+
+    def _store_get(self, key: str) -> Tuple[Any, float]:
+        if not self._store_enabled:
+            return _MISSING, 0.0
+        try:
+            rows = db.supabase_client.table(self.table).select("result,found,expires_at") \
+                .eq("cache_key", key).limit(1).execute().data
+        except Exception as e:
+            print(f"[GEOCODE_CACHE] Store lookup failed for {key}: {e}")
+            self._disable_store(e)
+            return _MISSING, 0.0
+        if not rows:
+            return _MISSING, 0.0
+        row = rows[0]
+        expires_at = dt.datetime.fromisoformat(str(row["expires_at"]).replace("Z", "+00:00")).timestamp()
+        if time.time() > expires_at:
+            return _MISSING, 0.0
+        return (row.get("result") if row.get("found") else None), expires_at
+
+    def _store_set(self, kind: str, key: str, value: Any, expires_at: float) -> None:
+        if not self._store_enabled:
+            return
+        try:
+            now = dt.datetime.now(dt.timezone.utc)
+            db.supabase_client.table(self.table).upsert({
+                "cache_key": key,
+                "kind": kind,
+                "result": value,
+                "found": value is not None,
+                "expires_at": dt.datetime.fromtimestamp(expires_at, dt.timezone.utc).isoformat(),
+                "updated_at": now.isoformat()
+            }, on_conflict="cache_key").execute()
+        except Exception as e:
+            print(f"[GEOCODE_CACHE] Failed to persist {key}: {e}")
+            self._disable_store(e)
+
+    # ---- public API (sync) ----
+
+    def lookup(self, kind: str, query: Any) -> Tuple[bool, Any]:
+        """(hit, value) from memory or the store; value None on a hit is a cached "not found" """
+        key = self.make_key(kind, query)
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            self._count(kind, "negative_hits" if value is None else "memory_hits")
+            return True, value
+        value, expires_at = self._store_get(key)
+        if value is not _MISSING:
+            self._count(kind, "negative_hits" if value is None else "store_hits")
+            self._memory_set(kind, key, value, expires_at)
+            return True, value
+        self._count(kind, "misses")
+        return False, None
+
+    @staticmethod
+    def _expires_at(value: Any, ttl: Optional[int] = None) -> float:
+        return time.time() + (ttl or (NEGATIVE_TTL if value is None else POSITIVE_TTL))
+
+    def store(self, kind: str, query: Any, value: Any, persist: bool = True, ttl: Optional[int] = None) -> None:
+        """Cache a provider answer; None caches a "not found" for NEGATIVE_TTL"""
+        key = self.make_key(kind, query)
+        expires_at = self._expires_at(value, ttl)
+        self._memory_set(kind, key, value, expires_at)
+        if persist:
+            self._store_set(kind, key, value, expires_at)
+
+    def cached_call(self, kind: str, query: Any, fetch: Callable[[], Any], persist: bool = True) -> Any:
+        """Sync read-through: cached value, else fetch() and cache its answer (fetch errors propagate uncached)"""
+        hit, value = self.lookup(kind, query)
+        if hit:
+            return value
+        try:
+            value = fetch()
+        except Exception:
+            self._count(kind, "fetch_errors")
+            raise
+        self.store(kind, query, value, persist=persist)
+        return value
+
+    # ---- public API (async) ----
+
+    async def alookup(self, kind: str, query: Any) -> Tuple[bool, Any]:
+        key = self.make_key(kind, query)
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            self._count(kind, "negative_hits" if value is None else "memory_hits")
+            return True, value
+        return await asyncio.to_thread(self.lookup, kind, query)
+
+    async def astore(self, kind: str, query: Any, value: Any, persist: bool = True, ttl: Optional[int] = None) -> None:
+        key = self.make_key(kind, query)
+        expires_at = self._expires_at(value, ttl)
+        self._memory_set(kind, key, value, expires_at)
+        if persist:
+            await asyncio.to_thread(self._store_set, kind, key, value, expires_at)
+
+    def _persist_in_background(self, kind: str, key: str, value: Any, expires_at: float) -> None:
+        task = asyncio.get_running_loop().create_task(
+            asyncio.to_thread(self._store_set, kind, key, value, expires_at)
+        )
+        self._persist_tasks.add(task)
+        task.add_done_callback(self._persist_tasks.discard)
+
+    async def flush(self) -> None:
+        """Wait for pending background table writes (shutdown, scripts, tests)"""
+        while self._persist_tasks:
+            await asyncio.gather(*list(self._persist_tasks), return_exceptions=True)
+
+    async def get_or_fetch(
+        self, kind: str, query: Any, fetch: Callable[[], Awaitable[Any]], persist: bool = True
+    ) -> Any:
+        """
+        Async read-through; concurrent misses for the same key share one provider call.
+        Fetch errors propagate to every waiter and are not cached. A fresh answer is
+        returned as soon as it is in memory; the table write runs in the background.
+        """
+        hit, value = await self.alookup(kind, query)
+        if hit:
+            return value
+        key = self.make_key(kind, query)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            error, value = await asyncio.shield(pending)
+            if error is not None:
+                raise error
+            return value
+        # Resolves to (error, value) so an unobserved failure is never logged by asyncio
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                value = await fetch()
+            except Exception as e:
+                self._count(kind, "fetch_errors")
+                future.set_result((e, None))
+                raise
+            expires_at = self._expires_at(value)
+            self._memory_set(kind, key, value, expires_at)
+            future.set_result((None, value))
+            if persist:
+                self._persist_in_background(kind, key, value, expires_at)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+
+
+# Global cache instance shared by LocationService and GoogleMapsService
+geocode_cache = GeocodeCache()
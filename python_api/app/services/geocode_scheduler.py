@@ -0,0 +1,270 @@
+"""
+Geocode Scheduler
+Outbound geocoding requests go through one lane per provider so the whole host
+stays inside provider quotas (Nominatim allows at most 1 request/second) no matter
+how many requests or backfill jobs are running.
+
+- A token bucket per provider paces dispatch; a concurrency cap bounds open requests.
+  The buckets live in the shared "geocode" ExpiringStore (see core/expiring_store), so
+  every gunicorn worker and backfill script on the host draws from the same quota
+  (taken in a worker thread, off the event loop); GEOCODE_STORE_BACKEND=memory makes
+  them per-process again.
+- Identical requests (same provider + key) that are queued or running share one call.
+- Each lane has a bounded priority queue. Interactive lookups (the default) go before
+  backfill work (see geocode_priority); when a queue is full new work is rejected with
+  GeocodeUnavailable instead of piling up.
+- Queue wait and outcome counters are kept per provider.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..core.expiring_store import ExpiringStore, create_expiring_store
+from .geocode_cache import GeocodeUnavailable
+
+INTERACTIVE = 0
+BACKFILL = 10
+
+# provider: (requests per second, burst, max concurrent requests, max queued jobs)
+PROVIDER_LIMITS = {
+    "nominatim": (1.0, 1, 2, 60),
+    "postalpincode": (5.0, 5, 5, 200),
+    "geocode_xyz": (1.0, 1, 1, 30),
+}
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("geocode_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def geocode_priority(priority: int):
+    """Run geocoding calls in this block (and tasks it creates) at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    With a store the bucket state is kept there under `key` and taken atomically with
+    store.update(), so all processes sharing the store share the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: int, store: Optional[ExpiringStore] = None, key: str = ""):
+        self.rate = rate
+        self.capacity = capacity
+        self.store = store
+        self.key = key
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _take_shared(self, bucket: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], float]:
+        # Wall-clock time: the timestamp is compared across processes
+        now = time.time()
+        tokens = float(self.capacity)
+        if bucket:
+            tokens = min(self.capacity, bucket["tokens"] + (now - bucket["ts"]) * self.rate)
+        if tokens >= 1:
+            return {"tokens": tokens - 1, "ts": now}, 0.0
+        return {"tokens": tokens, "ts": now}, (1 - tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available"""
+        if self.store is not None:
+            try:
+                # A bucket idle long enough to refill is the same as a missing one
+                return self.store.update(f"geocode:{self.key}", self._take_shared,
+                                         ttl=max(1.0, self.capacity / self.rate))
+            except Exception as e:
+                # Keep pacing this process rather than stalling or flooding the provider
+                print(f"[GEOCODE] Shared bucket for {self.key} unavailable, using local bucket: {e}")
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> float:
+        """try_acquire() from async code; a shared bucket is taken in a worker thread"""
+        if self.store is None:
+            return self.try_acquire()
+        # The store's write lock may be held by another process
+        return await asyncio.to_thread(self.try_acquire)
+
+
+class _Job:
+    __slots__ = ("key", "factory", "future", "priority", "enqueued_at", "waiters", "started")
+
+    def __init__(self, key: str, factory: Callable[[], Awaitable[Any]], future: asyncio.Future, priority: int):
+        self.key = key
+        self.factory = factory
+        # Resolves to (error, value) so a failure nobody awaits is never logged by asyncio
+        self.future = future
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.waiters = 0
+        self.started = False
+
+
+class _ProviderLane:
+    """Queue, bucket and worker for one provider, bound to one event loop"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int, max_queue: int,
+                 store: Optional[ExpiringStore] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, store=store, key=name)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.loop = asyncio.get_running_loop()
+        self.heap: List[Tuple[int, int, _Job]] = []
+        self.jobs: Dict[str, _Job] = {}
+        self.running = 0
+        self.changed = asyncio.Event()
+        self.sequence = itertools.count()
+        # Strong references to running request tasks (the loop only keeps weak ones)
+        self.tasks = set()
+        self.stats = {
+            "submitted": 0, "coalesced": 0, "rejected": 0, "abandoned": 0,
+            "dispatched": 0, "failed": 0, "queue_wait_ms_total": 0.0, "queue_wait_ms_max": 0.0
+        }
+        self.worker = asyncio.create_task(self._work())
+
+    def queued(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.started)
+
+    def push(self, job: _Job) -> None:
+        heapq.heappush(self.heap, (job.priority, next(self.sequence), job))
+        self.changed.set()
+
+    async def _wait_for_change(self, timeout: Optional[float] = None) -> None:
+        self.changed.clear()
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self) -> None:
+        while True:
+            # Drop entries for jobs that already started (re-prioritized) or lost all waiters
+            while self.heap and (self.heap[0][2].started or self.heap[0][2].future.done()):
+                heapq.heappop(self.heap)
+            if not self.heap or self.running >= self.max_concurrency:
+                await self._wait_for_change()
+                continue
+            wait = await self.bucket.acquire()
+            if wait:
+                # Re-check afterwards: a higher-priority job may have arrived meanwhile
+                await asyncio.sleep(wait)
+                continue
+            _, _, job = heapq.heappop(self.heap)
+            job.started = True
+            self.running += 1
+            waited_ms = (time.monotonic() - job.enqueued_at) * 1000
+            self.stats["dispatched"] += 1
+            self.stats["queue_wait_ms_total"] += waited_ms
+            self.stats["queue_wait_ms_max"] = max(self.stats["queue_wait_ms_max"], waited_ms)
+            task = asyncio.create_task(self._run(job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, job: _Job) -> None:
+        try:
+            value = await job.factory()
+        except Exception as e:
+            self.stats["failed"] += 1
+            if not job.future.done():
+                job.future.set_result((e, None))
+        else:
+            if not job.future.done():
+                job.future.set_result((None, value))
+        finally:
+            self.running -= 1
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+            self.changed.set()
+
+
+class GeocodeScheduler:
+    """Per-provider rate-limited, coalescing, prioritized dispatch of geocoding calls"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int, int, int]]] = None,
+                 store: Optional[ExpiringStore] = None):
+        self.limits = dict(limits or PROVIDER_LIMITS)
+        # Shared bucket store; None keeps the buckets in this process
+        self.store = store
+        self._lanes: Dict[str, _ProviderLane] = {}
+
+    def _lane(self, provider: str) -> _ProviderLane:
+        lane = self._lanes.get(provider)
+        if lane is None or lane.loop is not asyncio.get_running_loop():
+            if provider not in self.limits:
+                raise ValueError(f"Unknown geocoding provider: {provider}")
+            lane = _ProviderLane(provider, *self.limits[provider], store=self.store)
+            self._lanes[provider] = lane
+        return lane
+
+    async def submit(self, provider: str, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() once the provider's quota allows, sharing the call with any queued or
+        running request for the same key. Priority comes from geocode_priority().
+        """
+        lane = self._lane(provider)
+        priority = _priority.get()
+        lane.stats["submitted"] += 1
+        job = lane.jobs.get(key)
+        if job is not None:
+            lane.stats["coalesced"] += 1
+            if not job.started and priority < job.priority:
+                # An interactive caller joined queued backfill work: move it up
+                job.priority = priority
+                lane.push(job)
+        else:
+            if lane.queued() >= lane.max_queue:
+                lane.stats["rejected"] += 1
+                raise GeocodeUnavailable(f"{provider} queue is full")
+            job = _Job(key, factory, lane.loop.create_future(), priority)
+            lane.jobs[key] = job
+            lane.push(job)
+
+        job.waiters += 1
+        try:
+            error, value = await asyncio.shield(job.future)
+        finally:
+            job.waiters -= 1
+            if not job.waiters and not job.started and not job.future.done():
+                # Every caller gave up (e.g. a hedged lookup was won elsewhere); never send it
+                job.future.cancel()
+                lane.stats["abandoned"] += 1
+                if lane.jobs.get(key) is job:
+                    del lane.jobs[key]
+        if error is not None:
+            raise error
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, queue wait and outcome counters per provider"""
+        result = {}
+        for name, lane in self._lanes.items():
+            dispatched = lane.stats["dispatched"]
+            result[name] = {
+                **{metric: round(value, 1) for metric, value in lane.stats.items()},
+                "queue_wait_ms_avg": round(lane.stats["queue_wait_ms_total"] / dispatched, 1) if dispatched else None,
+                "queued": lane.queued(),
+                "running": lane.running,
+                "rate_per_second": lane.bucket.rate
+            }
+        return result
+
+
+# Global scheduler for every outbound geocoding call in this process; the provider
+# buckets are shared with the other workers and scripts on the host
+geocode_scheduler = GeocodeScheduler(store=create_expiring_store("geocode"))
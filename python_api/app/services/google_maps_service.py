@@ -3,10 +3,14 @@ Google Maps Service
 Handles accurate location data using Google Maps APIs
 """
 
-import requests
 import datetime as dt
 from typing import Dict, List, Optional, Any, Tuple
 from ..core.config import settings
+from .geo_http import get_geo_client
+from .geocode_cache import geocode_cache, GeocodeUnavailable
+
+# Statuses that mean "no such place" and may be cached as a negative answer
+NOT_FOUND_STATUSES = ("ZERO_RESULTS", "NOT_FOUND")
 
 
 class GoogleMapsService:
@@ -23,11 +27,28 @@ class GoogleMapsService:
         return api_key
     
     @staticmethod
-    def geocode_from_pincode(pincode: str, country: str = "IN") -> Optional[Dict[str, Any]]:
+    def _raise_unless_not_found(status: str) -> None:
+        """ZERO_RESULTS / NOT_FOUND are definitive answers; any other status is a provider failure"""
+        if status not in NOT_FOUND_STATUSES:
+            raise GeocodeUnavailable(f"Google Maps status {status}")
+    
+    @staticmethod
+    async def geocode_from_pincode(pincode: str, country: str = "IN") -> Optional[Dict[str, Any]]:
         """
         Geocode a pincode using Google Maps Geocoding API
         Returns location data including coordinates, address components, etc.
+        Cached in geocode_cache (including "not found" answers).
         """
+        try:
+            return await geocode_cache.get_or_fetch(
+                "google_pincode", (pincode, country),
+                lambda: GoogleMapsService._fetch_geocode_from_pincode(pincode, country)
+            )
+        except GeocodeUnavailable:
+            return None
+    
+    @staticmethod
+    async def _fetch_geocode_from_pincode(pincode: str, country: str = "IN") -> Optional[Dict[str, Any]]:
         try:
             api_key = GoogleMapsService._get_api_key()
             
@@ -43,7 +64,7 @@ class GoogleMapsService:
             }
             
             print(f"[GOOGLE_MAPS] Geocoding pincode: {pincode}")
-            response = requests.get(url, params=params, timeout=10)
+            response = await get_geo_client().get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -95,23 +116,37 @@ class GoogleMapsService:
                     return location_data
                 else:
                     print(f"[GOOGLE_MAPS] Geocoding failed for pincode {pincode}: {data.get('status')}")
+                    GoogleMapsService._raise_unless_not_found(data.get('status'))
                     return None
             else:
                 print(f"[GOOGLE_MAPS] API request failed with status {response.status_code}")
-                return None
+                raise GeocodeUnavailable(f"HTTP {response.status_code}")
                 
+        except GeocodeUnavailable:
+            raise
         except ValueError as e:
             print(f"[GOOGLE_MAPS] Configuration error: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
         except Exception as e:
             print(f"[GOOGLE_MAPS] Error geocoding pincode {pincode}: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
     
     @staticmethod
-    def reverse_geocode(lat: float, lng: float) -> Optional[Dict[str, Any]]:
+    async def reverse_geocode(lat: float, lng: float) -> Optional[Dict[str, Any]]:
         """
         Reverse geocode coordinates to get address information
+        Cached in geocode_cache (including "not found" answers).
         """
+        try:
+            return await geocode_cache.get_or_fetch(
+                "google_reverse", (float(lat), float(lng)),
+                lambda: GoogleMapsService._fetch_reverse_geocode(lat, lng)
+            )
+        except GeocodeUnavailable:
+            return None
+    
+    @staticmethod
+    async def _fetch_reverse_geocode(lat: float, lng: float) -> Optional[Dict[str, Any]]:
         try:
             api_key = GoogleMapsService._get_api_key()
             
@@ -123,7 +158,7 @@ class GoogleMapsService:
             }
             
             print(f"[GOOGLE_MAPS] Reverse geocoding coordinates: {lat}, {lng}")
-            response = requests.get(url, params=params, timeout=10)
+            response = await get_geo_client().get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -166,23 +201,37 @@ class GoogleMapsService:
                     return location_data
                 else:
                     print(f"[GOOGLE_MAPS] Reverse geocoding failed: {data.get('status')}")
+                    GoogleMapsService._raise_unless_not_found(data.get('status'))
                     return None
             else:
                 print(f"[GOOGLE_MAPS] API request failed with status {response.status_code}")
-                return None
+                raise GeocodeUnavailable(f"HTTP {response.status_code}")
                 
+        except GeocodeUnavailable:
+            raise
         except ValueError as e:
             print(f"[GOOGLE_MAPS] Configuration error: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
         except Exception as e:
             print(f"[GOOGLE_MAPS] Error reverse geocoding: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
     
     @staticmethod
-    def geocode_address(address: str, country: str = "IN") -> Optional[Dict[str, Any]]:
+    async def geocode_address(address: str, country: str = "IN") -> Optional[Dict[str, Any]]:
         """
         Geocode an address string using Google Maps Geocoding API
+        Cached in geocode_cache (including "not found" answers).
         """
+        try:
+            return await geocode_cache.get_or_fetch(
+                "google_address", (address, country),
+                lambda: GoogleMapsService._fetch_geocode_address(address, country)
+            )
+        except GeocodeUnavailable:
+            return None
+    
+    @staticmethod
+    async def _fetch_geocode_address(address: str, country: str = "IN") -> Optional[Dict[str, Any]]:
         try:
             api_key = GoogleMapsService._get_api_key()
             
@@ -195,7 +244,7 @@ class GoogleMapsService:
             }
             
             print(f"[GOOGLE_MAPS] Geocoding address: {address}")
-            response = requests.get(url, params=params, timeout=10)
+            response = await get_geo_client().get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -236,20 +285,23 @@ class GoogleMapsService:
                     return location_data
                 else:
                     print(f"[GOOGLE_MAPS] Geocoding failed: {data.get('status')}")
+                    GoogleMapsService._raise_unless_not_found(data.get('status'))
                     return None
             else:
                 print(f"[GOOGLE_MAPS] API request failed with status {response.status_code}")
-                return None
+                raise GeocodeUnavailable(f"HTTP {response.status_code}")
                 
+        except GeocodeUnavailable:
+            raise
         except ValueError as e:
             print(f"[GOOGLE_MAPS] Configuration error: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
         except Exception as e:
             print(f"[GOOGLE_MAPS] Error geocoding address: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
     
     @staticmethod
-    def get_place_autocomplete(input_text: str, country: str = "in") -> List[Dict[str, Any]]:
+    async def get_place_autocomplete(input_text: str, country: str = "in") -> List[Dict[str, Any]]:
         """
         Get place autocomplete suggestions using Google Places API
         """
@@ -265,7 +317,7 @@ class GoogleMapsService:
             }
             
             print(f"[GOOGLE_MAPS] Getting autocomplete for: {input_text}")
-            response = requests.get(url, params=params, timeout=10)
+            response = await get_geo_client().get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -298,10 +350,21 @@ class GoogleMapsService:
             return []
     
     @staticmethod
-    def get_place_details(place_id: str) -> Optional[Dict[str, Any]]:
+    async def get_place_details(place_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information about a place using Google Places API
+        Cached in geocode_cache (including "not found" answers).
         """
+        try:
+            return await geocode_cache.get_or_fetch(
+                "google_place", place_id,
+                lambda: GoogleMapsService._fetch_get_place_details(place_id)
+            )
+        except GeocodeUnavailable:
+            return None
+    
+    @staticmethod
+    async def _fetch_get_place_details(place_id: str) -> Optional[Dict[str, Any]]:
         try:
             api_key = GoogleMapsService._get_api_key()
             
@@ -313,7 +376,7 @@ class GoogleMapsService:
             }
             
             print(f"[GOOGLE_MAPS] Getting place details for: {place_id}")
-            response = requests.get(url, params=params, timeout=10)
+            response = await get_geo_client().get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -355,15 +418,18 @@ class GoogleMapsService:
                     return place_data
                 else:
                     print(f"[GOOGLE_MAPS] Place details failed: {data.get('status')}")
+                    GoogleMapsService._raise_unless_not_found(data.get('status'))
                     return None
             else:
                 print(f"[GOOGLE_MAPS] API request failed with status {response.status_code}")
-                return None
+                raise GeocodeUnavailable(f"HTTP {response.status_code}")
                 
+        except GeocodeUnavailable:
+            raise
         except ValueError as e:
             print(f"[GOOGLE_MAPS] Configuration error: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
         except Exception as e:
             print(f"[GOOGLE_MAPS] Error getting place details: {e}")
-            return None
+            raise GeocodeUnavailable(str(e)) from e
 
@@ -0,0 +1,96 @@
+"""
+Image URL resolution for property images.
+
+New uploads store their public URL on the document and the property row at
+upload time. Legacy document rows may still hold bare storage paths; those are
+resolved here once per path and memoized, so reads do not call the storage
+client for every image.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+from ..db.supabase_client import db
+
+# Buckets tried in order when a document holds a bare storage path
+PROPERTY_IMAGE_BUCKETS = ('property-images', 'documents')
+
+
+def _is_public_url(image_url: str) -> bool:
+    return image_url.startswith('http://') or image_url.startswith('https://')
+
+
+@lru_cache(maxsize=4096)
+def _public_url_for_path(path: str) -> str:
+    # Exceptions are not cached by lru_cache, so a failed lookup is retried next time
+    last_error = None
+    for bucket in PROPERTY_IMAGE_BUCKETS:
+        try:
+            return db.supabase_client.storage.from_(bucket).get_public_url(path)
+        except Exception as e:
+            print(f"[IMAGES] Failed to get public URL for {path} in bucket {bucket}: {e}")
+            last_error = e
+    raise last_error or ValueError(f"No public URL for {path}")
+
+
+def resolve_image_url(image_url: str) -> str:
+    """Return a public URL for a document's url/file_path (full URLs pass through)."""
+    if not image_url or _is_public_url(image_url):
+        return image_url
+    try:
+        return _public_url_for_path(image_url)
+    except Exception:
+        # Use file_path as-is if conversion fails
+        return image_url
+
+
+def document_image_url(doc: dict) -> str:
+    """Public URL for an image document row, or '' if it is not an image."""
+    file_type = doc.get('file_type', '') or ''
+    if not file_type.startswith('image/'):
+        return ''
+    return resolve_image_url(doc.get('file_path') or doc.get('url') or '')
+
+
+def group_document_images(docs: Iterable[dict]) -> Dict[str, List[str]]:
+    """Group image document rows into public URL lists keyed by entity_id."""
+    images_by_entity: Dict[str, List[str]] = {}
+    for doc in docs or []:
+        entity_id = doc.get('entity_id')
+        image_url = document_image_url(doc)
+        if entity_id and image_url:
+            images_by_entity.setdefault(entity_id, []).append(image_url)
+    return images_by_entity
+
+
+async def attach_image_to_property(property_id: str, image_url: str) -> bool:
+    """
+    Persist an uploaded image URL onto properties.images. Returns False when the
+    property does not exist yet; those uploads stay reachable through the documents
+    fallback in the listing routes until the backfill script links them.
+    """
+    try:
+        # Atomic append (row-locked UPDATE), so parallel uploads never drop each other's URL
+        return bool(await db.rpc("append_property_image", {
+            "property_id_param": property_id,
+            "image_url_param": image_url
+        }))
+    except Exception as e:
+        print(f"[IMAGES] append_property_image RPC failed, re-deriving from documents: {e}")
+
+    # Fallback when the function is not deployed: rebuild the list from every image
+    # document (this upload's row is already inserted), so a concurrent writer's URL
+    # is included rather than overwritten by a stale read
+    properties = await db.select("properties", columns="id,images", filters={"id": property_id})
+    if not properties:
+        return False
+    images = properties[0].get('images') or []
+    if not isinstance(images, list):
+        images = []
+    docs = await db.select("documents", filters={"entity_type": "property", "entity_id": property_id})
+    merged = list(images)
+    for url in group_document_images(docs).get(property_id, []) + [image_url]:
+        if url not in merged:
+            merged.append(url)
+    if merged != images:
+        await db.update("properties", {"images": merged}, {"id": property_id})
+    return True
@@ -0,0 +1,204 @@
+"""
+Locality Index
+In-memory prefix index over pincodes and place names (cities, mandals, districts,
+post office localities) for autocomplete without external API calls.
+
+Keys live in sorted arrays and a prefix query is a binary search for the first key
+>= the prefix followed by a forward scan. Matches are ranked by the number of active
+listings, so places that actually have properties come first.
+
+Places with listings are keyed in their own (small) arrays that are always scanned in
+full, so a short prefix can never cut off a well-listed match. Gazetteer-only places
+are only consulted to fill the remaining slots, with a bounded scan.
+"""
+
+import asyncio
+import bisect
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..db.supabase_client import db
+from .pincode_gazetteer import pincode_gazetteer
+
+# Tie-break order when listing counts are equal
+TYPE_PRIORITY = {'city': 0, 'mandal': 1, 'locality': 2, 'district': 3, 'pincode': 4}
+# Upper bound on gazetteer-only (no listings) prefix matches examined per query
+MAX_SCAN = 2000
+
+
+def _normalize(text: Any) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+class LocalityIndex:
+    """Sorted-array prefix index over pincodes and place names"""
+
+    def __init__(self, ttl: int = 600, page_size: int = 1000):
+        self.ttl = ttl
+        self.page_size = page_size
+        self._entries: List[Dict[str, Any]] = []
+        # (key, entry number) pairs sorted by key; names are also keyed by each later word.
+        # Entries with listings and gazetteer-only entries are keyed separately
+        self._name_keys: List[Tuple[str, int]] = []
+        self._pincode_keys: List[Tuple[str, int]] = []
+        self._listed_name_keys: List[Tuple[str, int]] = []
+        self._listed_pincode_keys: List[Tuple[str, int]] = []
+        self._built_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next query"""
+        self._built_at = 0.0
+
+    def is_fresh(self) -> bool:
+        return bool(self._built_at) and (time.time() - self._built_at) < self.ttl
+
+    async def ensure_loaded(self) -> None:
+        """Build the index if it is missing or older than the TTL"""
+        if self.is_fresh():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.is_fresh():
+                return
+            try:
+                await self._load()
+            except Exception as e:
+                if not self._entries:
+                    raise
+                # Keep serving the previous index (still stale, so the next query retries)
+                print(f"[LOCALITY] Rebuild failed, keeping previous index: {e}")
+
+    async def _fetch_listing_rows(self) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = await db.select(
+                "properties",
+                columns="city,mandal,district,state,zip_code",
+                filters={"status": "active"},
+                order_by="id",
+                limit=self.page_size,
+                offset=offset,
+                # A failed page must not truncate the listing counts used for ranking
+                raise_errors=True
+            )
+            rows.extend(page or [])
+            if not page or len(page) < self.page_size:
+                break
+            offset += self.page_size
+        return rows
+
+    async def _load(self) -> None:
+        start_time = time.time()
+        listing_rows = await self._fetch_listing_rows()
+        # Gazetteer iteration is CPU-only; keep it off the event loop
+        gazetteer_records = await asyncio.to_thread(lambda: list(pincode_gazetteer.iter_records()))
+        self.build(listing_rows, gazetteer_records)
+        elapsed = (time.time() - start_time) * 1000
+        print(f"[LOCALITY] Indexed {len(self._entries)} localities from {len(listing_rows)} listings "
+              f"and {len(gazetteer_records)} pincodes ({elapsed:.0f}ms)")
+
+    def build(self, listing_rows: List[Dict[str, Any]], gazetteer_records: List[Dict[str, Any]]) -> None:
+        """Rebuild from active listing rows and gazetteer records"""
+        entries: Dict[Tuple, Dict[str, Any]] = {}
+
+        def _add(kind: str, name: str, state: str = "", district: str = "", pincode: str = "", listings: int = 0):
+            name = str(name or "").strip()
+            if not name:
+                return
+            # A pincode is unique on its own; names repeat across districts/states
+            if kind == 'pincode':
+                key = (kind, name)
+            else:
+                key = (kind, _normalize(name), _normalize(district), _normalize(state))
+            entry = entries.get(key)
+            if entry is None:
+                entry = {'type': kind, 'name': name, 'district': district or None, 'state': state or None,
+                         'pincode': pincode or None, 'listings': 0}
+                entries[key] = entry
+            else:
+                # Gazetteer rows fill in details a listing left blank
+                entry['district'] = entry['district'] or district or None
+                entry['state'] = entry['state'] or state or None
+            entry['listings'] += listings
+
+        for row in listing_rows:
+            state, district = row.get('state') or "", row.get('district') or ""
+            _add('city', row.get('city'), state=state, listings=1)
+            _add('mandal', row.get('mandal'), state=state, district=district, listings=1)
+            _add('district', district, state=state, listings=1)
+            zip_code = str(row.get('zip_code') or "").strip()
+            if zip_code:
+                _add('pincode', zip_code, state=state, district=district, pincode=zip_code, listings=1)
+
+        for record in gazetteer_records:
+            state, district = record.get('state', ''), record.get('district', '')
+            _add('pincode', record.get('pincode'), state=state, district=district, pincode=record.get('pincode'))
+            _add('locality', record.get('office'), state=state, district=district, pincode=record.get('pincode'))
+            _add('district', district, state=state)
+
+        entry_list = list(entries.values())
+        name_keys, pincode_keys, listed_name_keys, listed_pincode_keys = [], [], [], []
+        for number, entry in enumerate(entry_list):
+            listed = entry['listings'] > 0
+            if entry['type'] == 'pincode':
+                (listed_pincode_keys if listed else pincode_keys).append((entry['name'], number))
+                continue
+            words = _normalize(entry['name']).split(" ")
+            # "Banjara Hills" is found by "ban..." and by "hil..."
+            target = listed_name_keys if listed else name_keys
+            for i in range(len(words)):
+                target.append((" ".join(words[i:]), number))
+        for keys in (name_keys, pincode_keys, listed_name_keys, listed_pincode_keys):
+            keys.sort()
+
+        self._entries, self._name_keys, self._pincode_keys = entry_list, name_keys, pincode_keys
+        self._listed_name_keys, self._listed_pincode_keys = listed_name_keys, listed_pincode_keys
+        self._built_at = time.time()
+
+    def _scan(self, keys: List[Tuple[str, int]], prefix: str, types: Optional[List[str]],
+              max_scan: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entries with a key starting with prefix (at most max_scan distinct entries examined)"""
+        position = bisect.bisect_left(keys, (prefix, -1))
+        seen, matches = set(), []
+        while position < len(keys) and (max_scan is None or len(seen) < max_scan):
+            key, number = keys[position]
+            if not key.startswith(prefix):
+                break
+            position += 1
+            if number in seen:
+                continue
+            seen.add(number)
+            entry = self._entries[number]
+            if types and entry['type'] not in types:
+                continue
+            matches.append(entry)
+        return matches
+
+    def search(self, query: str, limit: int = 10, types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Entries whose pincode or name (or a later word of it) starts with query, best ranked first"""
+        prefix = _normalize(query)
+        if not prefix:
+            return []
+        if prefix.isdigit():
+            listed_keys, other_keys = self._listed_pincode_keys, self._pincode_keys
+        else:
+            listed_keys, other_keys = self._listed_name_keys, self._name_keys
+
+        def rank(entry):
+            return (-entry['listings'], TYPE_PRIORITY.get(entry['type'], 9), len(entry['name']), entry['name'])
+
+        # Every match with listings is ranked (bounded by the number of active listings)
+        matches = sorted(self._scan(listed_keys, prefix, types), key=rank)
+        if len(matches) < limit:
+            matches += sorted(self._scan(other_keys, prefix, types, MAX_SCAN), key=rank)
+        return [dict(entry) for entry in matches[:limit]]
+
+
+# Global index instance
+locality_index = LocalityIndex()
@@ -4,18 +4,23 @@ Handles property location by pincode with radius search
 """
 
 import asyncio
-import requests
 import datetime as dt
-import time
 from typing import Dict, List, Optional, Any, Tuple
 from ..db.supabase_client import db
+from .spatial_index import property_spatial_index
+from .geo_distance import haversine_km
+from .pincode_gazetteer import pincode_gazetteer
+from .pincode_kdtree import pincode_kdtree
+from .geocode_cache import geocode_cache, GeocodeUnavailable
+from .geo_http import get_geo_client
+from .geocode_scheduler import geocode_scheduler
 import httpx
 
 class LocationService:
     """Service for handling property locations and pincode-based searches"""
     
-    # Cache for dynamically fetched coordinates
-    _coordinate_cache = {}
+    # Start the next coordinate provider if the running ones have not answered by then
+    HEDGE_DELAY_SECONDS = 0.8
     
     @staticmethod
     async def get_coordinates_from_pincode(pincode: str) -> Optional[Tuple[float, float]]:
@@ -29,30 +34,41 @@ class LocationService:
         # Clean pincode
         pincode = str(pincode).strip()
         
-        # Check dynamic cache first
-        if pincode in LocationService._coordinate_cache:
-            print(f"[LOCATION] Found coordinates in dynamic cache for pincode {pincode}")
-            return LocationService._coordinate_cache[pincode]
+        # Offline gazetteer (memory-mapped, no network)
+        gazetteer_coords = pincode_gazetteer.coordinates(pincode)
+        if gazetteer_coords:
+            return gazetteer_coords
         
-        # Check database for existing coordinates
+        # Shared geocode cache (memory, then geocode_cache table), then database, then web APIs
+        try:
+            coordinates = await geocode_cache.get_or_fetch(
+                "pincode", pincode, lambda: LocationService._lookup_pincode_coordinates(pincode)
+            )
+        except GeocodeUnavailable as e:
+            print(f"[LOCATION] Coordinate providers unavailable for pincode {pincode}: {e}")
+            return None
+        if coordinates:
+            # JSON round trips through the cache table turn the tuple into a list
+            return (float(coordinates[0]), float(coordinates[1]))
+        
+        print(f"[LOCATION] No coordinates found for pincode {pincode}")
+        return None
+    
+    @staticmethod
+    async def _lookup_pincode_coordinates(pincode: str) -> Optional[Tuple[float, float]]:
+        """Uncached pincode -> coordinates: pincode_locations table, then web APIs"""
         try:
             existing_coords = await LocationService._get_coordinates_from_db(pincode)
             if existing_coords:
                 print(f"[LOCATION] Found coordinates in database for pincode {pincode}")
-                LocationService._coordinate_cache[pincode] = existing_coords
                 return existing_coords
         except Exception as e:
             print(f"[LOCATION] Database lookup failed for pincode {pincode}: {e}")
         
-        # Fetch from web APIs and store in database
         coordinates = await LocationService._fetch_and_store_coordinates(pincode)
         if coordinates:
             print(f"[LOCATION] Successfully fetched and stored coordinates for pincode {pincode}: {coordinates}")
-            LocationService._coordinate_cache[pincode] = coordinates
-            return coordinates
-        
-        print(f"[LOCATION] No coordinates found for pincode {pincode}")
-        return None
+        return coordinates
     
     @staticmethod
     async def _get_coordinates_from_db(pincode: str) -> Optional[Tuple[float, float]]:
@@ -74,42 +90,75 @@ class LocationService:
     
     @staticmethod
     async def _fetch_and_store_coordinates(pincode: str) -> Optional[Tuple[float, float]]:
-        """Fetch coordinates from web APIs and store in database (async for speed)"""
-        # Use OpenStreetMap Nominatim as primary (free, reliable)
+        """Fetch coordinates from web APIs (hedged) and store in database"""
+        coordinates = await LocationService._hedged_provider_coordinates(pincode)
+        if coordinates:
+            # Store in database (non-blocking)
+            asyncio.create_task(LocationService._store_coordinates_in_db(pincode, coordinates))
+        return coordinates
+    
+    @staticmethod
+    async def _hedged_provider_coordinates(pincode: str) -> Optional[Tuple[float, float]]:
+        """
+        Try coordinate providers in priority order, but start the next one whenever the
+        running ones take longer than HEDGE_DELAY_SECONDS or come back empty; the first
+        provider with coordinates wins and the rest are cancelled.
+        Raises GeocodeUnavailable if OpenStreetMap (primary) failed and nobody answered,
+        since that is not a definitive "not found".
+        """
         # Priority: OpenStreetMap > Postal API > Other fallbacks
+        providers = [
+            ("OpenStreetMap", LocationService._get_from_nominatim_async),
+            ("PostalPincode", LocationService._get_from_postalpincode),
+            ("geocode.xyz", LocationService._get_from_geocoding_api),
+        ]
+        running: Dict[asyncio.Task, Tuple[int, str]] = {}
+        primary_error = None
         
-        # Try OpenStreetMap Nominatim first (async, faster)
-        try:
-            coordinates = await LocationService._get_from_nominatim_async(pincode)
-            if coordinates:
-                # Store in database (non-blocking)
-                asyncio.create_task(LocationService._store_coordinates_in_db(pincode, coordinates))
-                print(f"[LOCATION] Successfully fetched coordinates from OpenStreetMap for pincode {pincode}")
-                return coordinates
-        except Exception as e:
-            print(f"[LOCATION] OpenStreetMap API failed for pincode {pincode}: {e}")
-            # Continue to fallback APIs
-        
-        # Fallback: Try postal API (sync, but cached)
-        try:
-            coordinates = LocationService._get_from_postalpincode(pincode)
-            if coordinates:
-                # Store in database (non-blocking)
-                asyncio.create_task(LocationService._store_coordinates_in_db(pincode, coordinates))
-                return coordinates
-        except Exception as e:
-            print(f"[LOCATION] Postal API failed for pincode {pincode}: {e}")
+        def launch_next() -> None:
+            index = len(running)
+            name, provider = providers[index]
+            running[asyncio.create_task(provider(pincode))] = (index, name)
         
-        # Last resort: Try other geocoding services
+        launch_next()
+        pending = set(running)
         try:
-            coordinates = LocationService._get_from_geocoding_api(pincode)
-            if coordinates:
-                # Store in database (non-blocking)
-                asyncio.create_task(LocationService._store_coordinates_in_db(pincode, coordinates))
-                return coordinates
-        except Exception as e:
-            print(f"[LOCATION] Geocoding API failed for pincode {pincode}: {e}")
+            while pending:
+                can_hedge = len(running) < len(providers)
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=LocationService.HEDGE_DELAY_SECONDS if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    print(f"[LOCATION] Providers slow for pincode {pincode}, hedging with {providers[len(running)][0]}")
+                    launch_next()
+                    pending = {task for task in running if not task.done()}
+                    continue
+                for task in done:
+                    index, name = running[task]
+                    try:
+                        coordinates = task.result()
+                    except Exception as e:
+                        print(f"[LOCATION] {name} failed for pincode {pincode}: {e}")
+                        if index == 0:
+                            primary_error = e
+                        continue
+                    if coordinates:
+                        print(f"[LOCATION] Successfully fetched coordinates from {name} for pincode {pincode}")
+                        return coordinates
+                # Nothing usable yet; no point waiting out the hedge delay
+                if len(running) < len(providers):
+                    launch_next()
+                    pending = {task for task in running if not task.done()}
+        finally:
+            for task in running:
+                if not task.done():
+                    task.cancel()
         
+        if primary_error is not None:
+            # Nominatim never answered, so this is not a definitive "not found"
+            raise GeocodeUnavailable(str(primary_error))
         return None
     
     @staticmethod
@@ -150,11 +199,16 @@ class LocationService:
     
     @staticmethod
     async def _get_from_nominatim_async(pincode: str) -> Optional[Tuple[float, float]]:
-        """Get coordinates from OpenStreetMap Nominatim API (async, faster)"""
+        """
+        Get coordinates from OpenStreetMap Nominatim API (async, faster).
+        Returns None when OSM has no match; raises GeocodeUnavailable when it could not answer.
+        """
         try:
             print(f"[LOCATION] Using OpenStreetMap Nominatim for pincode {pincode}")
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
+            # Nominatim allows 1 request/second; the scheduler queues and coalesces
+            response = await geocode_scheduler.submit(
+                "nominatim", f"postalcode:{pincode}",
+                lambda: get_geo_client().get(
                     f"https://nominatim.openstreetmap.org/search",
                     params={
                         'postalcode': pincode,
@@ -163,110 +217,69 @@ class LocationService:
                         'limit': 1,
                         'addressdetails': 1
                     },
-                    headers={
-                        'User-Agent': 'HomeAndOwn-PropertyPlatform/1.0 (contact@homeandown.com)'
-                    }
+                    timeout=5.0
                 )
-                
-                print(f"[LOCATION] OpenStreetMap response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and len(data) > 0:
-                        lat = float(data[0]['lat'])
-                        lon = float(data[0]['lon'])
-                        if lat != 0 and lon != 0:
-                            print(f"[LOCATION] OpenStreetMap found coordinates for {pincode}: {lat}, {lon}")
-                            return (lat, lon)
-                    else:
-                        print(f"[LOCATION] OpenStreetMap returned empty results for {pincode}")
-                elif response.status_code == 429:
-                    print(f"[LOCATION] OpenStreetMap rate limit reached")
-                    await asyncio.sleep(1)  # Respect rate limits
-                else:
-                    print(f"[LOCATION] OpenStreetMap returned status {response.status_code}")
-        except httpx.TimeoutException:
-            print(f"[LOCATION] OpenStreetMap request timeout for pincode {pincode}")
-        except Exception as e:
-            print(f"[LOCATION] OpenStreetMap API error for {pincode}: {e}")
-        return None
-    
-    @staticmethod
-    def _get_from_nominatim(pincode: str) -> Optional[Tuple[float, float]]:
-        """Get coordinates from OpenStreetMap Nominatim API (sync fallback)"""
-        try:
-            print(f"[LOCATION] Using OpenStreetMap Nominatim for pincode {pincode}")
-            response = requests.get(
-                f"https://nominatim.openstreetmap.org/search",
-                params={
-                    'postalcode': pincode,
-                    'countrycodes': 'in',
-                    'format': 'json',
-                    'limit': 1,
-                    'addressdetails': 1
-                },
-                headers={
-                    'User-Agent': 'HomeAndOwn-PropertyPlatform/1.0 (contact@homeandown.com)'
-                },
-                timeout=5
             )
             
+            print(f"[LOCATION] OpenStreetMap response status: {response.status_code}")
+            
             if response.status_code == 200:
                 data = response.json()
                 if data and len(data) > 0:
                     lat = float(data[0]['lat'])
                     lon = float(data[0]['lon'])
                     if lat != 0 and lon != 0:
+                        print(f"[LOCATION] OpenStreetMap found coordinates for {pincode}: {lat}, {lon}")
                         return (lat, lon)
-        except Exception as e:
-            print(f"[LOCATION] OpenStreetMap API error: {e}")
-        return None
-    
-    @staticmethod
-    def _get_from_postalpincode(pincode: str) -> Optional[Tuple[float, float]]:
-        """Get coordinates from PostalPincode API"""
-        try:
-            print(f"[LOCATION] Trying PostalPincode API for pincode {pincode}")
-            response = requests.get(
-                f"https://api.postalpincode.in/pincode/{pincode}",
-                timeout=15,
-                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-            )
-            
-            print(f"[LOCATION] PostalPincode response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"[LOCATION] PostalPincode response data: {data}")
-                if data and len(data) > 0 and data[0].get('Status') == 'Success':
-                    post_office = data[0]['PostOffice'][0]
-                    city = post_office.get('District', '')
-                    state = post_office.get('State', '')
-                    
-                    print(f"[LOCATION] PostalPincode found city: {city}, state: {state}")
-                    
-                    # Use city and state to get coordinates
-                    if city and state:
-                        coords = LocationService._get_coordinates_from_city_state(city, state)
-                        if coords:
-                            print(f"[LOCATION] PostalPincode found coordinates via city/state: {coords}")
-                            return coords
                 else:
-                    print(f"[LOCATION] PostalPincode returned unsuccessful status: {data}")
+                    print(f"[LOCATION] OpenStreetMap returned empty results for {pincode}")
+                return None
+            elif response.status_code == 429:
+                print(f"[LOCATION] OpenStreetMap rate limit reached")
             else:
-                print(f"[LOCATION] PostalPincode returned status {response.status_code}: {response.text}")
+                print(f"[LOCATION] OpenStreetMap returned status {response.status_code}")
+            raise GeocodeUnavailable(f"OpenStreetMap HTTP {response.status_code}")
+        except httpx.TimeoutException as e:
+            print(f"[LOCATION] OpenStreetMap request timeout for pincode {pincode}")
+            raise GeocodeUnavailable("OpenStreetMap timeout") from e
+        except GeocodeUnavailable:
+            raise
         except Exception as e:
-            print(f"[LOCATION] PostalPincode API error for {pincode}: {e}")
+            print(f"[LOCATION] OpenStreetMap API error for {pincode}: {e}")
+            raise GeocodeUnavailable(str(e)) from e
+    
+    @staticmethod
+    async def _get_from_postalpincode(pincode: str) -> Optional[Tuple[float, float]]:
+        """Get coordinates from PostalPincode API (district/state, then geocoded)"""
+        print(f"[LOCATION] Trying PostalPincode API for pincode {pincode}")
+        post_office = await LocationService._fetch_postal_data(pincode)
+        if not post_office:
+            return None
+        city = post_office.get('District', '')
+        state = post_office.get('State', '')
+        
+        print(f"[LOCATION] PostalPincode found city: {city}, state: {state}")
+        
+        # Use city and state to get coordinates
+        if city and state:
+            coords = await LocationService._get_coordinates_from_city_state(city, state)
+            if coords:
+                print(f"[LOCATION] PostalPincode found coordinates via city/state: {coords}")
+                return coords
         return None
     
     @staticmethod
-    def _get_from_geocoding_api(pincode: str) -> Optional[Tuple[float, float]]:
+    async def _get_from_geocoding_api(pincode: str) -> Optional[Tuple[float, float]]:
         """Get coordinates from a generic geocoding service"""
         try:
             # Using a free geocoding service
-            response = requests.get(
-                f"https://geocode.xyz/{pincode},India?json=1",
-                timeout=10
+            response = await geocode_scheduler.submit(
+                "geocode_xyz", pincode,
+                lambda: get_geo_client().get(
+                    f"https://geocode.xyz/{pincode},India",
+                    params={'json': 1},
+                    timeout=10.0
+                )
             )
             
             if response.status_code == 200:
@@ -280,23 +293,34 @@ class LocationService:
         return None
     
     @staticmethod
-    def _get_coordinates_from_city_state(city: str, state: str) -> Optional[Tuple[float, float]]:
-        """Get coordinates from city and state using OpenStreetMap Nominatim"""
+    async def _get_coordinates_from_city_state(city: str, state: str) -> Optional[Tuple[float, float]]:
+        """Get coordinates from city and state using OpenStreetMap Nominatim (cached)"""
+        try:
+            coords = await geocode_cache.get_or_fetch(
+                "osm_city_state", (city, state),
+                lambda: LocationService._fetch_coordinates_from_city_state(city, state)
+            )
+        except GeocodeUnavailable:
+            return None
+        return (float(coords[0]), float(coords[1])) if coords else None
+    
+    @staticmethod
+    async def _fetch_coordinates_from_city_state(city: str, state: str) -> Optional[Tuple[float, float]]:
+        query = f"{city}, {state}, India"
         try:
-            query = f"{city}, {state}, India"
             print(f"[LOCATION] 🌍 Geocoding city/state with OpenStreetMap: {query}")
-            response = requests.get(
-                f"https://nominatim.openstreetmap.org/search",
-                params={
-                    'q': query,
-                    'format': 'json',
-                    'limit': 1,
-                    'addressdetails': 1
-                },
-                headers={
-                    'User-Agent': 'HomeAndOwn-PropertyPlatform/1.0 (contact@homeandown.com)'  # Required by OSM
-                },
-                timeout=15
+            response = await geocode_scheduler.submit(
+                "nominatim", f"q:{query.lower()}",
+                lambda: get_geo_client().get(
+                    f"https://nominatim.openstreetmap.org/search",
+                    params={
+                        'q': query,
+                        'format': 'json',
+                        'limit': 1,
+                        'addressdetails': 1
+                    },
+                    timeout=15.0
+                )
             )
             
             print(f"[LOCATION] OpenStreetMap city/state response status: {response.status_code}")
@@ -311,43 +335,61 @@ class LocationService:
                         return (lat, lon)
                 else:
                     print(f"[LOCATION] ⚠️ OpenStreetMap returned empty results for {query}")
+                return None
             elif response.status_code == 429:
-                print(f"[LOCATION] ⚠️ OpenStreetMap rate limit, waiting 1 second...")
-                time.sleep(1)  # Respect rate limits
+                print(f"[LOCATION] ⚠️ OpenStreetMap rate limit reached")
             else:
                 print(f"[LOCATION] ⚠️ OpenStreetMap returned status {response.status_code}")
-        except requests.exceptions.Timeout:
+            raise GeocodeUnavailable(f"OpenStreetMap HTTP {response.status_code}")
+        except httpx.TimeoutException as e:
             print(f"[LOCATION] ⚠️ OpenStreetMap request timeout for {query}")
+            raise GeocodeUnavailable("OpenStreetMap timeout") from e
+        except GeocodeUnavailable:
+            raise
         except Exception as e:
             print(f"[LOCATION] ❌ OpenStreetMap city/state geocoding error: {e}")
-        return None
+            raise GeocodeUnavailable(str(e)) from e
     
     @staticmethod
     def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """
         Calculate distance between two coordinates using Haversine formula
-        Returns distance in kilometers
+        Returns distance in kilometers (use haversine_km_many for many points)
         """
-        import math
-        
-        # Convert to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # Radius of earth in kilometers
-        r = 6371
-        
-        return c * r
+        return haversine_km(lat1, lon1, lat2, lon2)
     
     @staticmethod
-    async def get_properties_by_pincode(pincode: str, radius_km: float = 10.0) -> List[Dict[str, Any]]:
+    async def search_properties_in_radius(
+        latitude: float, longitude: float, radius_km: float = 10.0,
+        limit: Optional[int] = None, offset: int = 0
+    ) -> Dict[str, Any]:
         """
-        Get properties within a radius of the given pincode (optimized with pagination)
+        Distance-sorted, paginated radius search over all active properties.
+        Candidates come from the grid index; only the requested page is loaded from the DB.
+        """
+        total, page = await property_spatial_index.query_radius(latitude, longitude, radius_km, limit=limit, offset=offset)
+        properties = []
+        if page:
+            ids = [property_id for property_id, _ in page]
+            # Chunk the id list to keep the "in" filter URL short
+            chunks = [ids[i:i + 200] for i in range(0, len(ids), 200)]
+            results = await asyncio.gather(*[
+                db.select("properties", filters={"id": {"in": chunk}}) for chunk in chunks
+            ])
+            rows_by_id = {str(row.get('id')): row for rows in results for row in rows or []}
+            for property_id, distance in page:
+                row = rows_by_id.get(property_id)
+                # Skip rows deleted or deactivated since the index was built
+                if row and row.get('status') == 'active':
+                    properties.append({**row, 'distance_km': round(distance, 2)})
+        return {"properties": properties, "total": total, "limit": limit, "offset": offset}
+    
+    @staticmethod
+    async def get_properties_by_pincode(
+        pincode: str, radius_km: float = 10.0, limit: Optional[int] = None, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Get properties within a radius of the given pincode, nearest first
         """
         try:
             # Get coordinates for the pincode (async)
@@ -356,37 +398,10 @@ class LocationService:
                 return []
             
             target_lat, target_lon = coordinates
-            
-            # Get properties with coordinates (limit to 200 for performance)
-            properties = await db.select(
-                "properties", 
-                filters={"status": "active"},
-                limit=200  # Limit for performance
+            result = await LocationService.search_properties_in_radius(
+                target_lat, target_lon, radius_km, limit=limit, offset=offset
             )
-            
-            nearby_properties = []
-            for property in properties:
-                prop_lat = property.get('latitude')
-                prop_lon = property.get('longitude')
-                
-                # Skip properties without coordinates
-                if prop_lat is None or prop_lon is None:
-                    continue
-                
-                # Calculate distance
-                distance = LocationService.calculate_distance(
-                    target_lat, target_lon, prop_lat, prop_lon
-                )
-                
-                # Add to nearby properties if within radius
-                if distance <= radius_km:
-                    property['distance_km'] = round(distance, 2)
-                    nearby_properties.append(property)
-            
-            # Sort by distance
-            nearby_properties.sort(key=lambda x: x.get('distance_km', float('inf')))
-            
-            return nearby_properties
+            return result["properties"]
             
         except Exception as e:
             print(f"[LOCATION] Error getting properties by pincode: {e}")
@@ -398,18 +413,20 @@ class LocationService:
         Update property coordinates based on pincode
         """
         try:
-            coordinates = LocationService.get_coordinates_from_pincode(pincode)
+            coordinates = await LocationService.get_coordinates_from_pincode(pincode)
             if not coordinates:
                 return {"success": False, "error": "Could not get coordinates for pincode"}
             
             lat, lon = coordinates
             
             # Update property with coordinates
-            await db.update(
+            updated = await db.update(
                 "properties", 
                 {"latitude": lat, "longitude": lon}, 
                 {"id": property_id}
             )
+            if updated:
+                property_spatial_index.sync_property(updated[0])
             
             return {
                 "success": True,
@@ -423,41 +440,18 @@ class LocationService:
             return {"success": False, "error": str(e)}
     
     @staticmethod
-    async def get_nearby_properties(latitude: float, longitude: float, radius_km: float = 10.0) -> List[Dict[str, Any]]:
+    async def get_nearby_properties(
+        latitude: float, longitude: float, radius_km: float = 10.0,
+        limit: Optional[int] = None, offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """
-        Get properties within a radius of given coordinates (optimized with pagination)
+        Get properties within a radius of given coordinates, nearest first
         """
         try:
-            # Get active properties with pagination (limit to 200 for performance)
-            properties = await db.select(
-                "properties", 
-                filters={"status": "active"},
-                limit=200  # Limit for performance
+            result = await LocationService.search_properties_in_radius(
+                latitude, longitude, radius_km, limit=limit, offset=offset
             )
-            
-            nearby_properties = []
-            for property in properties:
-                prop_lat = property.get('latitude')
-                prop_lon = property.get('longitude')
-                
-                # Skip properties without coordinates
-                if prop_lat is None or prop_lon is None:
-                    continue
-                
-                # Calculate distance
-                distance = LocationService.calculate_distance(
-                    latitude, longitude, prop_lat, prop_lon
-                )
-                
-                # Add to nearby properties if within radius
-                if distance <= radius_km:
-                    property['distance_km'] = round(distance, 2)
-                    nearby_properties.append(property)
-            
-            # Sort by distance
-            nearby_properties.sort(key=lambda x: x.get('distance_km', float('inf')))
-            
-            return nearby_properties
+            return result["properties"]
             
         except Exception as e:
             print(f"[LOCATION] Error getting nearby properties: {e}")
@@ -483,48 +477,95 @@ class LocationService:
         return ', '.join(location_parts) if location_parts else 'Location not specified'
     
     @staticmethod
-    async def get_properties_without_coordinates() -> List[Dict[str, Any]]:
+    async def get_properties_without_coordinates(
+        limit: int = 500, after_id: Optional[str] = None, columns: str = "id,zip_code,latitude,longitude"
+    ) -> List[Dict[str, Any]]:
         """
-        Get properties that don't have coordinates set
+        One page of properties missing latitude or longitude, ordered by id.
+        Pass the last id of the previous page as after_id (keyset paging stays correct
+        while earlier rows are being filled in). A failed read raises, so callers never
+        mistake it for the end of the scan.
         """
-        try:
-            properties = await db.select("properties", filters={"status": "active"})
-            return [p for p in properties if p.get('latitude') is None or p.get('longitude') is None]
-        except Exception as e:
-            print(f"[LOCATION] Error getting properties without coordinates: {e}")
-            return []
+        rows = []
+        for column in ("latitude", "longitude"):
+            filters = {column: {"is": "null"}}
+            if after_id:
+                filters["id"] = {"gt": after_id}
+            rows.extend(await db.select("properties", columns=columns, filters=filters, order_by="id",
+                                        limit=limit, raise_errors=True))
+        # A row missing both coordinates comes back from both queries
+        unique = {row["id"]: row for row in rows}
+        return [unique[property_id] for property_id in sorted(unique)][:limit]
     
     @staticmethod
     async def get_pincode_details(pincode: str) -> Dict[str, Any]:
         """Get detailed location information for a pincode"""
-        try:
-            response = requests.get(
-                f"https://api.postalpincode.in/pincode/{pincode}",
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0 and data[0].get('Status') == 'Success':
-                    post_office = data[0]['PostOffice'][0]
-                    return {
-                        "country": post_office.get('Country', 'India'),
-                        "state": post_office.get('State', ''),
-                        "district": post_office.get('District', ''),
-                        "mandal": post_office.get('Name', ''),  # Name field is actually mandal
-                        "city": post_office.get('Name', ''),  # For city field
-                        "region": post_office.get('Region', ''),
-                        "division": post_office.get('Division', ''),
-                        "circle": post_office.get('Circle', ''),
-                        "block": post_office.get('Block', ''),
-                        "branch_type": post_office.get('BranchType', ''),
-                        "delivery_status": post_office.get('DeliveryStatus', '')
-                    }
-        except Exception as e:
-            print(f"[LOCATION] Error fetching pincode details: {e}")
+        post_office = await LocationService._fetch_postal_data(pincode)
+        if post_office:
+            return {
+                "country": post_office.get('Country', 'India'),
+                "state": post_office.get('State', ''),
+                "district": post_office.get('District', ''),
+                "mandal": post_office.get('Name', ''),  # Name field is actually mandal
+                "city": post_office.get('Name', ''),  # For city field
+                "region": post_office.get('Region', ''),
+                "division": post_office.get('Division', ''),
+                "circle": post_office.get('Circle', ''),
+                "block": post_office.get('Block', ''),
+                "branch_type": post_office.get('BranchType', ''),
+                "delivery_status": post_office.get('DeliveryStatus', '')
+            }
         
         return {}
     
+    @staticmethod
+    def _build_location_data(pincode: str, post_office: Dict[str, Any], coordinates: Optional[Tuple[float, float]]) -> Dict[str, Any]:
+        """Form auto-population payload from a PostOffice-shaped record and coordinates"""
+        # Create a comprehensive address from the location data
+        address_parts = []
+        if post_office.get('Name'):
+            address_parts.append(post_office.get('Name'))
+        if post_office.get('Block'):
+            address_parts.append(post_office.get('Block'))
+        if post_office.get('District'):
+            address_parts.append(post_office.get('District'))
+        if post_office.get('State'):
+            address_parts.append(post_office.get('State'))
+        
+        suggested_address = ", ".join(address_parts) if address_parts else ""
+        
+        return {
+            "pincode": pincode,
+            "country": post_office.get('Country', 'India'),
+            "state": post_office.get('State', ''),
+            "district": post_office.get('District', ''),
+            "mandal": post_office.get('Name', ''),  # Name field is mandal
+            "city": post_office.get('Name', ''),  # For city field
+            "address": suggested_address,  # Auto-generated address
+            "region": post_office.get('Region', ''),
+            "division": post_office.get('Division', ''),
+            "circle": post_office.get('Circle', ''),
+            "block": post_office.get('Block', ''),
+            # PRIORITY: Use OpenStreetMap coordinates for map marker positioning
+            "latitude": coordinates[0] if coordinates else None,
+            "longitude": coordinates[1] if coordinates else None,
+            "coordinates": coordinates if coordinates else None,
+            "map_bounds": LocationService.calculate_pincode_bounds(coordinates[0], coordinates[1]) if coordinates else None,
+            "auto_populated": True,
+            "editable_fields": True,  # All fields can be edited
+            "suggested_fields": {
+                "country": post_office.get('Country', 'India'),
+                "state": post_office.get('State', ''),
+                "district": post_office.get('District', ''),
+                "mandal": post_office.get('Name', ''),
+                "city": post_office.get('Name', ''),
+                "address": suggested_address,
+                # PRIORITY: Use OpenStreetMap coordinates for form fields
+                "latitude": coordinates[0] if coordinates else None,
+                "longitude": coordinates[1] if coordinates else None
+            }
+        }
+    
     @staticmethod
     async def get_pincode_location_data(pincode: str) -> Dict[str, Any]:
         """Get complete location data for property form auto-population with parallel API calls"""
@@ -536,16 +577,26 @@ class LocationService:
         if fallback_data:
             print(f"[LOCATION] Using fallback data for pincode {pincode}")
             return fallback_data
+        
+        # Offline gazetteer first: no network round trips for known pincodes
+        record = pincode_gazetteer.lookup(pincode)
+        if record:
+            coordinates = pincode_gazetteer.coordinates(pincode)
+            if not coordinates:
+                # Some India Post entries have no coordinates; geocode just those
+                coordinates = await LocationService.get_coordinates_from_pincode(pincode)
+            print(f"[LOCATION] Gazetteer hit for pincode {pincode}")
+            return LocationService._build_location_data(pincode, pincode_gazetteer.as_post_office(record), coordinates)
             
         try:
             print(f"[LOCATION] Fetching location data and coordinates in parallel for pincode: {pincode}")
             
-            # Run both APIs in parallel for faster response
+            # Run both lookups in parallel for faster response (both go through geocode_cache)
             postal_task = LocationService._fetch_postal_data(pincode)
-            osm_task = LocationService._get_from_nominatim_async(pincode)
+            coordinates_task = LocationService.get_coordinates_from_pincode(pincode)
             
             # Wait for both APIs to complete
-            postal_data, osm_coordinates = await asyncio.gather(postal_task, osm_task, return_exceptions=True)
+            postal_data, coordinates = await asyncio.gather(postal_task, coordinates_task, return_exceptions=True)
             
             # Handle postal API results
             post_office = None
@@ -555,64 +606,16 @@ class LocationService:
             else:
                 print(f"[LOCATION] PostalPincode API: Failed for {pincode}")
             
-            # Handle OpenStreetMap results  
-            coordinates = None
-            if not isinstance(osm_coordinates, Exception) and osm_coordinates:
-                coordinates = osm_coordinates
-                print(f"[LOCATION] OpenStreetMap API: Found coordinates {coordinates} for {pincode}")
+            # Handle coordinate results (OpenStreetMap first, then fallback providers)
+            if isinstance(coordinates, Exception) or not coordinates:
+                print(f"[LOCATION] Coordinates: Failed for {pincode}")
+                coordinates = None
             else:
-                print(f"[LOCATION] OpenStreetMap API: Failed for {pincode}")
-                # Fallback to other coordinate methods if OSM fails
-                print(f"[LOCATION] Trying fallback coordinate methods...")
-                coordinates = await LocationService.get_coordinates_from_pincode(pincode)
+                print(f"[LOCATION] Coordinates: Found {coordinates} for {pincode}")
                     
             # If we have location data from postal API, create response
             if post_office:
-                # Create a comprehensive address from the location data
-                address_parts = []
-                if post_office.get('Name'):
-                    address_parts.append(post_office.get('Name'))
-                if post_office.get('Block'):
-                    address_parts.append(post_office.get('Block'))
-                if post_office.get('District'):
-                    address_parts.append(post_office.get('District'))
-                if post_office.get('State'):
-                    address_parts.append(post_office.get('State'))
-                
-                suggested_address = ", ".join(address_parts) if address_parts else ""
-                
-                location_data = {
-                    "pincode": pincode,
-                    "country": post_office.get('Country', 'India'),
-                    "state": post_office.get('State', ''),
-                    "district": post_office.get('District', ''),
-                    "mandal": post_office.get('Name', ''),  # Name field is mandal
-                    "city": post_office.get('Name', ''),  # For city field
-                    "address": suggested_address,  # Auto-generated address
-                    "region": post_office.get('Region', ''),
-                    "division": post_office.get('Division', ''),
-                    "circle": post_office.get('Circle', ''),
-                    "block": post_office.get('Block', ''),
-                    # PRIORITY: Use OpenStreetMap coordinates for map marker positioning
-                    "latitude": coordinates[0] if coordinates else None,
-                    "longitude": coordinates[1] if coordinates else None,
-                    "coordinates": coordinates if coordinates else None,
-                    "map_bounds": LocationService.calculate_pincode_bounds(coordinates[0], coordinates[1]) if coordinates else None,
-                    "auto_populated": True,
-                    "editable_fields": True,  # All fields can be edited
-                    "suggested_fields": {
-                        "country": post_office.get('Country', 'India'),
-                        "state": post_office.get('State', ''),
-                        "district": post_office.get('District', ''),
-                        "mandal": post_office.get('Name', ''),
-                        "city": post_office.get('Name', ''),
-                        "address": suggested_address,
-                        # PRIORITY: Use OpenStreetMap coordinates for form fields
-                        "latitude": coordinates[0] if coordinates else None,
-                        "longitude": coordinates[1] if coordinates else None
-                    }
-                }
-                
+                location_data = LocationService._build_location_data(pincode, post_office, coordinates)
                 print(f"[LOCATION] Successfully combined location data and coordinates for pincode {pincode}")
                 print(f"[LOCATION] Final coordinates: {coordinates}")
                 return location_data
@@ -680,35 +683,45 @@ class LocationService:
     
     @staticmethod
     async def _fetch_postal_data(pincode: str) -> Optional[Dict[str, Any]]:
-        """Fetch location data from PostalPincode API (async)"""
+        """Fetch location data from PostalPincode API (async, cached)"""
+        try:
+            return await geocode_cache.get_or_fetch(
+                "postal_pincode", pincode, lambda: LocationService._request_postal_data(pincode)
+            )
+        except GeocodeUnavailable:
+            return None
+    
+    @staticmethod
+    async def _request_postal_data(pincode: str) -> Optional[Dict[str, Any]]:
         try:
             print(f"[LOCATION] Fetching postal data for pincode: {pincode}")
             
-            # Use httpx for async HTTP requests
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"https://api.postalpincode.in/pincode/{pincode}",
-                    headers={'User-Agent': 'HomeAndOwn-PropertyPlatform/1.0 (contact@homeandown.com)'}
-                )
-                
-                print(f"[LOCATION] PostalPincode API response status: {response.status_code}")
+            response = await geocode_scheduler.submit(
+                "postalpincode", pincode,
+                lambda: get_geo_client().get(f"https://api.postalpincode.in/pincode/{pincode}")
+            )
+            
+            print(f"[LOCATION] PostalPincode API response status: {response.status_code}")
+            
+            if response.status_code == 200:
+                data = response.json()
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if data and len(data) > 0 and data[0].get('Status') == 'Success':
-                        post_office = data[0]['PostOffice'][0]
-                        print(f"[LOCATION] PostalPincode API success: {post_office.get('Name')}, {post_office.get('District')}, {post_office.get('State')}")
-                        return post_office
-                    else:
-                        print(f"[LOCATION] PostalPincode API returned unsuccessful status: {data}")
+                if data and len(data) > 0 and data[0].get('Status') == 'Success':
+                    post_office = data[0]['PostOffice'][0]
+                    print(f"[LOCATION] PostalPincode API success: {post_office.get('Name')}, {post_office.get('District')}, {post_office.get('State')}")
+                    return post_office
                 else:
-                    print(f"[LOCATION] PostalPincode API returned status {response.status_code}")
-                    
+                    print(f"[LOCATION] PostalPincode API returned unsuccessful status: {data}")
+                return None
+            else:
+                print(f"[LOCATION] PostalPincode API returned status {response.status_code}")
+            raise GeocodeUnavailable(f"PostalPincode HTTP {response.status_code}")
+                
+        except GeocodeUnavailable:
+            raise
         except Exception as e:
             print(f"[LOCATION] PostalPincode API error: {e}")
-        
-        return None
+            raise GeocodeUnavailable(str(e)) from e
     
     @staticmethod
     def _get_approximate_coordinates(district: str, state: str) -> Optional[Tuple[float, float]]:
@@ -716,25 +729,60 @@ class LocationService:
         # No hardcoded coordinates - rely on external APIs only
         return None
     
+    @staticmethod
+    def get_nearest_pincode(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """Pincode and locality nearest to a map pin, from the offline gazetteer (no web calls)"""
+        try:
+            record = pincode_kdtree.nearest_pincode(float(lat), float(lon))
+        except Exception as e:
+            print(f"[LOCATION] Nearest pincode lookup failed: {e}")
+            return None
+        if not record:
+            return None
+        address_parts = [record.get(field) for field in ('office', 'block', 'district', 'state') if record.get(field)]
+        return {
+            'country': 'India',
+            'state': record.get('state', ''),
+            'district': record.get('district', ''),
+            'mandal': record.get('office', ''),
+            'city': record.get('office', ''),
+            'address': ", ".join(address_parts),
+            'pincode': record.get('pincode'),
+            'distance_km': record.get('distance_km'),
+            'source': 'gazetteer'
+        }
+
     @staticmethod
     async def _reverse_geocode_coordinates(lat: float, lon: float) -> Optional[Dict[str, Any]]:
-        """Reverse geocode coordinates to get location details using OpenStreetMap"""
+        """Reverse geocode coordinates: nearest gazetteer pincode first, then OpenStreetMap (cached)"""
+        nearby = LocationService.get_nearest_pincode(lat, lon)
+        if nearby:
+            return nearby
+        try:
+            return await geocode_cache.get_or_fetch(
+                "osm_reverse", (float(lat), float(lon)),
+                lambda: LocationService._request_reverse_geocode(lat, lon)
+            )
+        except GeocodeUnavailable:
+            return None
+    
+    @staticmethod
+    async def _request_reverse_geocode(lat: float, lon: float) -> Optional[Dict[str, Any]]:
         try:
             # Use OpenStreetMap Nominatim for reverse geocoding
             print(f"[LOCATION] Reverse geocoding with OpenStreetMap: {lat}, {lon}")
-            response = requests.get(
-                f"https://nominatim.openstreetmap.org/reverse",
-                params={
-                    'format': 'json',
-                    'lat': lat,
-                    'lon': lon,
-                    'addressdetails': 1,
-                    'zoom': 18  # Get detailed address
-                },
-                timeout=10,
-                headers={
-                    'User-Agent': 'HomeAndOwn-PropertyPlatform/1.0 (contact@homeandown.com)'  # Required by OSM
-                }
+            response = await geocode_scheduler.submit(
+                "nominatim", f"reverse:{float(lat):.5f},{float(lon):.5f}",
+                lambda: get_geo_client().get(
+                    f"https://nominatim.openstreetmap.org/reverse",
+                    params={
+                        'format': 'json',
+                        'lat': lat,
+                        'lon': lon,
+                        'addressdetails': 1,
+                        'zoom': 18  # Get detailed address
+                    }
+                )
             )
             
             if response.status_code == 200:
@@ -751,14 +799,16 @@ class LocationService:
                     'address': data.get('display_name', '')
                 }
             elif response.status_code == 429:
-                print(f"[LOCATION] ⚠️ OpenStreetMap rate limit, waiting 1 second...")
-                time.sleep(1)  # Respect rate limits
-        except requests.exceptions.Timeout:
+                print(f"[LOCATION] ⚠️ OpenStreetMap rate limit reached")
+            raise GeocodeUnavailable(f"OpenStreetMap HTTP {response.status_code}")
+        except httpx.TimeoutException as e:
             print(f"[LOCATION] ⚠️ OpenStreetMap reverse geocoding timeout")
+            raise GeocodeUnavailable("OpenStreetMap timeout") from e
+        except GeocodeUnavailable:
+            raise
         except Exception as e:
             print(f"[LOCATION] ❌ OpenStreetMap reverse geocoding error: {e}")
-        
-        return None
+            raise GeocodeUnavailable(str(e)) from e
     
     @staticmethod
     def _get_fallback_pincode_data(pincode: str) -> Optional[Dict[str, Any]]:
@@ -1,21 +1,74 @@
+import asyncio
 import os
 import random
 import datetime as dt
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from ..core.config import settings
+from ..core.expiring_store import create_expiring_store
 
-# In-memory OTP storage for development (use Redis in production)
-_otp_storage: Dict[str, Any] = {}
+# Wrong guesses allowed per OTP before it is invalidated and a new one must be requested
+MAX_OTP_ATTEMPTS = 5
+# Pending signups are dropped if not completed within a day
+TEMP_SIGNUP_TTL = 24 * 3600
 
-# In-memory temporary signup storage (save to DB only after OTP verification)
-_temp_signup_storage: Dict[str, Any] = {}
+# OTPs and pending signups, shared by all workers on this host (see core/expiring_store).
+# Store calls run in a worker thread: a SQLite write can wait on another worker's lock.
+# Production must point OTP_STORE_PATH at an app-owned location
+otp_store = create_expiring_store("otp", require_path=True)
 
 def _gen_code(length: int = 6) -> str:
     """Generate random OTP code"""
     return ''.join(str(random.randint(0, 9)) for _ in range(length))
 
+async def _store_otp(otp_key: str, token: str, now: dt.datetime, expires: dt.datetime) -> None:
+    """Store a fresh OTP (replacing any earlier one for the same key)"""
+    await asyncio.to_thread(otp_store.set, otp_key, {
+        "token": token,
+        "expires_at": expires.isoformat(),
+        "used": False,
+        "attempts": 0,
+        "created_at": now.isoformat()
+    }, ttl=settings.OTP_EXP_MIN * 60)
+
+async def _consume_otp(otp_key: str, token: str) -> str:
+    """
+    Check token against the stored OTP and mark it used in one atomic step, so two
+    concurrent verifications (on any workers) cannot both succeed.
+    Returns "ok", "missing", "used", "locked" or "invalid".
+    """
+    def _check(record: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], str]:
+        if not record:
+            return None, "missing"
+        if record["used"]:
+            return record, "used"
+        if record["token"] != token:
+            record["attempts"] = record.get("attempts", 0) + 1
+            if record["attempts"] >= MAX_OTP_ATTEMPTS:
+                # Too many guesses: drop the OTP, a new one has to be requested
+                return None, "locked"
+            return record, "invalid"
+        record["used"] = True
+        return record, "ok"
+
+    return await asyncio.to_thread(otp_store.update, otp_key, _check)
+
+async def _otp_status(otp_key: str) -> dict:
+    otp_record = await asyncio.to_thread(otp_store.get, otp_key)
+
+    if not otp_record:
+        return {"exists": False}
+
+    return {
+        "exists": True,
+        "token": otp_record["token"],
+        "expires_at": otp_record["expires_at"],
+        "used": otp_record["used"],
+        "attempts": otp_record.get("attempts", 0),
+        "expired": False
+    }
+
 async def send_otp_simple(phone: str, action: str = "verification", code: Optional[str] = None) -> str:
-    """Create an OTP and send via Twilio if configured. Async so callers can await email backup."""
+    """Create an OTP and queue it for SMS via Twilio if configured (returns without waiting for delivery)."""
     
     token = code or _gen_code()
     now = dt.datetime.utcnow()
@@ -23,44 +76,16 @@ async def send_otp_simple(phone: str, action: str = "verification", code: Option
     
     print(f"[OTP] Generating OTP for {phone}, action: {action}")
     
-    # Store OTP in memory for development
     otp_key = f"{phone}:{action}"
-    _otp_storage[otp_key] = {
-        "token": token,
-        "expires_at": expires,
-        "used": False,
-        "created_at": now
-    }
+    await _store_otp(otp_key, token, now, expires)
     
     print(f"[OTP] Created OTP: {token} (expires: {expires.strftime('%H:%M:%S')})")
 
-    # Send via Twilio if configured
-    if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN and settings.TWILIO_FROM_NUMBER:
-        try:
-            from twilio.rest import Client
-            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-            
-            # Create action-specific message
-            action_messages = {
-                "verification": f"Your Home & Own verification code is: {token}. Valid for {settings.OTP_EXP_MIN} minutes.",
-                "bank_update": f"Your OTP for bank details update: {token}. Valid for {settings.OTP_EXP_MIN} minutes.",
-                "password_change": f"Your OTP for password change: {token}. Valid for {settings.OTP_EXP_MIN} minutes.",
-                "password_reset": f"Your OTP for password reset: {token}. Valid for {settings.OTP_EXP_MIN} minutes.",
-                "profile_update": f"Your OTP for profile update: {token}. Valid for {settings.OTP_EXP_MIN} minutes.",
-                "sensitive_action": f"Your Home & Own security code: {token}. Valid for {settings.OTP_EXP_MIN} minutes."
-            }
-            
-            message_body = action_messages.get(action, f"Your Home & Own verification code is: {token}")
-            
-            message = client.messages.create(
-                body=message_body,
-                from_=settings.TWILIO_FROM_NUMBER,
-                to=phone
-            )
-            print(f"[OTP] SMS sent via Twilio to {phone}, SID: {message.sid}")
-        except Exception as sms_error:
-            print(f"[OTP] Twilio SMS failed: {sms_error}")
-            # Continue without failing - OTP is still created for development
+    # Queue the SMS; delivery (with retries) happens in the background
+    from .sms_service import sms_configured, sms_sender, otp_message
+    if sms_configured():
+        message = sms_sender.enqueue(phone, otp_message(token, action), action=action)
+        print(f"[OTP] SMS {message['id']} {message['status']} for {phone}")
     else:
         print(f"[OTP] Development mode: OTP {token} for {phone} (action: {action})")
         print(f"[OTP] Add to Twilio credentials to enable SMS")
@@ -74,72 +99,46 @@ async def send_otp_simple(phone: str, action: str = "verification", code: Option
 
     return token
 
-def verify_phone_otp(phone: str, token: str, action: str = "verification") -> bool:
+async def verify_phone_otp(phone: str, token: str, action: str = "verification") -> bool:
     """Verify phone OTP - alias for verify_otp_simple"""
-    return verify_otp_simple(phone, token, action)
+    return await verify_otp_simple(phone, token, action)
 
-def verify_otp_simple(phone: str, token: str, action: str = "verification") -> bool:
+async def verify_otp_simple(phone: str, token: str, action: str = "verification") -> bool:
     """Verify OTP and mark as used"""
-    now = dt.datetime.utcnow()
-    
     print(f"[OTP] Verifying OTP: {token} for {phone}, action: {action}")
     
-    # Find valid OTP
     otp_key = f"{phone}:{action}"
-    otp_record = _otp_storage.get(otp_key)
+    result = await _consume_otp(otp_key, token)
     
-    if not otp_record:
-        print(f"[OTP] No OTP found for {phone}:{action}")
+    if result == "missing":
+        print(f"[OTP] No OTP found (or expired) for {phone}:{action}")
         return False
     
-    if otp_record["used"]:
+    if result == "used":
         print(f"[OTP] OTP already used for {phone}:{action}")
         return False
     
-    if otp_record["expires_at"] < now:
-        print(f"[OTP] OTP expired for {phone}:{action}")
+    if result == "locked":
+        print(f"[OTP] Too many attempts, OTP invalidated for {phone}:{action}")
         return False
     
-    if otp_record["token"] != token:
+    if result == "invalid":
         print(f"[OTP] Invalid OTP: {token} for {phone}")
         return False
     
-    # Mark as used
-    otp_record["used"] = True
-    
     print(f"[OTP] OTP verified successfully for {phone}")
     return True
 
-def cleanup_expired_otps():
-    """Clean up expired OTP tokens"""
-    now = dt.datetime.utcnow()
-    expired_keys = []
-    
-    for key, otp_data in _otp_storage.items():
-        if otp_data["expires_at"] < now:
-            expired_keys.append(key)
+async def cleanup_expired_otps():
+    """Clean up expired OTP tokens (the store also expires them on its own)"""
+    removed = await asyncio.to_thread(otp_store.purge_expired)
     
-    for key in expired_keys:
-        del _otp_storage[key]
-    
-    if expired_keys:
-        print(f"[OTP] Cleaned up {len(expired_keys)} expired OTPs")
+    if removed:
+        print(f"[OTP] Cleaned up {removed} expired OTPs")
 
-def get_otp_status(phone: str, action: str = "verification") -> dict:
+async def get_otp_status(phone: str, action: str = "verification") -> dict:
     """Get OTP status for debugging"""
-    otp_key = f"{phone}:{action}"
-    otp_record = _otp_storage.get(otp_key)
-    
-    if not otp_record:
-        return {"exists": False}
-    
-    return {
-        "exists": True,
-        "token": otp_record["token"],
-        "expires_at": otp_record["expires_at"].isoformat(),
-        "used": otp_record["used"],
-        "expired": otp_record["expires_at"] < dt.datetime.utcnow()
-    }
+    return await _otp_status(f"{phone}:{action}")
 
 # Email OTP functions
 async def send_email_otp(email: str, action: str = "email_verification", code: Optional[str] = None) -> str:
@@ -151,14 +150,8 @@ async def send_email_otp(email: str, action: str = "email_verification", code: O
     
     print(f"[EMAIL-OTP] Generating email OTP for {email}, action: {action}")
     
-    # Store OTP in memory for development
     otp_key = f"email:{email}:{action}"
-    _otp_storage[otp_key] = {
-        "token": token,
-        "expires_at": expires,
-        "used": False,
-        "created_at": now
-    }
+    await _store_otp(otp_key, token, now, expires)
     
     print(f"[EMAIL-OTP] Created email OTP: {token} (expires: {expires.strftime('%H:%M:%S')})")
 
@@ -173,66 +166,47 @@ async def send_email_otp(email: str, action: str = "email_verification", code: O
 
     return token
 
-def verify_email_otp(email: str, token: str, action: str = "email_verification") -> bool:
+async def verify_email_otp(email: str, token: str, action: str = "email_verification") -> bool:
     """Verify email OTP and mark as used"""
-    now = dt.datetime.utcnow()
-    
     print(f"[EMAIL-OTP] Verifying email OTP: {token} for {email}, action: {action}")
     
-    # Find valid OTP
     otp_key = f"email:{email}:{action}"
-    otp_record = _otp_storage.get(otp_key)
+    result = await _consume_otp(otp_key, token)
     
-    if not otp_record:
-        print(f"[EMAIL-OTP] No email OTP found for {email}:{action}")
+    if result == "missing":
+        print(f"[EMAIL-OTP] No email OTP found (or expired) for {email}:{action}")
         return False
     
-    if otp_record["used"]:
+    if result == "used":
         print(f"[EMAIL-OTP] Email OTP already used for {email}:{action}")
         return False
     
-    if otp_record["expires_at"] < now:
-        print(f"[EMAIL-OTP] Email OTP expired for {email}:{action}")
+    if result == "locked":
+        print(f"[EMAIL-OTP] Too many attempts, email OTP invalidated for {email}:{action}")
         return False
     
-    if otp_record["token"] != token:
+    if result == "invalid":
         print(f"[EMAIL-OTP] Invalid email OTP: {token} for {email}")
         return False
     
-    # Mark as used
-    otp_record["used"] = True
-    
     print(f"[EMAIL-OTP] Email OTP verified successfully for {email}")
     return True
 
 # Temporary signup storage functions
-def store_temp_signup(user_id: str, signup_data: Dict[str, Any]):
+async def store_temp_signup(user_id: str, signup_data: Dict[str, Any]):
     """Store signup data temporarily (until OTP verification)"""
-    _temp_signup_storage[user_id] = signup_data
+    await asyncio.to_thread(otp_store.set, f"signup:{user_id}", signup_data, ttl=TEMP_SIGNUP_TTL)
     print(f"[TEMP-SIGNUP] Stored temporary signup data for user {user_id}")
 
-def get_temp_signup(user_id: str) -> Optional[Dict[str, Any]]:
+async def get_temp_signup(user_id: str) -> Optional[Dict[str, Any]]:
     """Get temporary signup data"""
-    return _temp_signup_storage.get(user_id)
+    return await asyncio.to_thread(otp_store.get, f"signup:{user_id}")
 
-def delete_temp_signup(user_id: str):
+async def delete_temp_signup(user_id: str):
     """Delete temporary signup data after successful DB save"""
-    if user_id in _temp_signup_storage:
-        del _temp_signup_storage[user_id]
+    if await asyncio.to_thread(otp_store.delete, f"signup:{user_id}"):
         print(f"[TEMP-SIGNUP] Deleted temporary signup data for user {user_id}")
 
-def get_email_otp_status(email: str, action: str = "email_verification") -> dict:
+async def get_email_otp_status(email: str, action: str = "email_verification") -> dict:
     """Get email OTP status for debugging"""
-    otp_key = f"email:{email}:{action}"
-    otp_record = _otp_storage.get(otp_key)
-    
-    if not otp_record:
-        return {"exists": False}
-    
-    return {
-        "exists": True,
-        "token": otp_record["token"],
-        "expires_at": otp_record["expires_at"].isoformat(),
-        "used": otp_record["used"],
-        "expired": otp_record["expires_at"] < dt.datetime.utcnow()
-    }
\ No newline at end of file
+    return await _otp_status(f"email:{email}:{action}")
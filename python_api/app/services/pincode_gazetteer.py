@@ -0,0 +1,214 @@
+"""
+Pincode Gazetteer
+Offline pincode -> (state, district, office, block, region, division, circle, lat/lon)
+lookup backed by a compact binary file that is memory-mapped at startup.
+
+File layout (little-endian):
+    header   8s magic, I record count, I index offset, I records offset, I strings offset
+    index    one uint32 per pincode from 100000 to 999999 (record number + 1, 0 = absent)
+    records  RECORD_STRUCT per pincode: lat, lon (int32 microdegrees, NO_COORDINATE if unknown)
+             and string offsets
+    strings  deduplicated UTF-8 strings, each prefixed with a uint16 length
+
+Lookups are two fixed-offset reads, so they cost the same regardless of file size and
+pages are shared between worker processes. Build the file with
+scripts/build_pincode_gazetteer.py from a CSV dump of the India Post directory.
+"""
+
+import math
+import mmap
+import os
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+MAGIC = b"PINGAZ01"
+HEADER_STRUCT = struct.Struct("<8sIIII")
+INDEX_STRUCT = struct.Struct("<I")
+# lat, lon, then string offsets for office, block, district, state, region, division, circle
+RECORD_STRUCT = struct.Struct("<ii7I")
+NO_COORDINATE = -(2 ** 31)
+STRING_FIELDS = ("office", "block", "district", "state", "region", "division", "circle")
+
+MIN_PINCODE = 100000
+MAX_PINCODE = 999999
+
+DEFAULT_GAZETTEER_PATH = Path(__file__).resolve().parent.parent / "data" / "pincodes.gaz"
+
+
+def build_gazetteer(entries: Iterable[Dict[str, Any]], out_path: str) -> int:
+    """
+    Write a gazetteer file from dicts with a 6-digit ``pincode`` plus any of the
+    STRING_FIELDS and ``latitude``/``longitude``. The first entry per pincode wins.
+    Returns the number of pincodes written.
+    """
+    records: Dict[int, Dict[str, Any]] = {}
+    for entry in entries:
+        try:
+            pincode = int(str(entry.get("pincode", "")).strip())
+        except ValueError:
+            continue
+        if MIN_PINCODE <= pincode <= MAX_PINCODE and pincode not in records:
+            records[pincode] = entry
+
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def _string_offset(value: Any) -> int:
+        text = (str(value).strip() if value is not None else "")[:1000]
+        if text not in string_offsets:
+            encoded = text.encode("utf-8")[:65535]
+            string_offsets[text] = len(strings)
+            strings.extend(struct.pack("<H", len(encoded)))
+            strings.extend(encoded)
+        return string_offsets[text]
+
+    _string_offset("")  # offset 0 is the empty string
+    index = bytearray(INDEX_STRUCT.size * (MAX_PINCODE - MIN_PINCODE + 1))
+    record_bytes = bytearray()
+    for record_number, pincode in enumerate(sorted(records)):
+        entry = records[pincode]
+        INDEX_STRUCT.pack_into(index, (pincode - MIN_PINCODE) * INDEX_STRUCT.size, record_number + 1)
+        record_bytes.extend(RECORD_STRUCT.pack(
+            _coordinate(entry.get("latitude")),
+            _coordinate(entry.get("longitude")),
+            *(_string_offset(entry.get(field)) for field in STRING_FIELDS)
+        ))
+
+    index_offset = HEADER_STRUCT.size
+    records_offset = index_offset + len(index)
+    strings_offset = records_offset + len(record_bytes)
+    tmp_path = f"{out_path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER_STRUCT.pack(MAGIC, len(records), index_offset, records_offset, strings_offset))
+        f.write(index)
+        f.write(record_bytes)
+        f.write(strings)
+    # Atomic swap so a running server never maps a half-written file
+    os.replace(tmp_path, out_path)
+    return len(records)
+
+
+def _coordinate(value: Any) -> int:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return NO_COORDINATE
+    # The India Post dump uses 0 / "NA" for unknown coordinates
+    if not number or not math.isfinite(number) or abs(number) > 180:
+        return NO_COORDINATE
+    return round(number * 1_000_000)
+
+
+class PincodeGazetteer:
+    """Read-only, memory-mapped pincode lookup"""
+
+    def __init__(self):
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self.path: Optional[str] = None
+        self.record_count = 0
+        self._index_offset = 0
+        self._records_offset = 0
+        self._strings_offset = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._mmap is not None
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Map the gazetteer file; returns False (and stays disabled) if it is missing or invalid."""
+        path = path or os.getenv("PINCODE_GAZETTEER_PATH") or str(DEFAULT_GAZETTEER_PATH)
+        if not os.path.exists(path):
+            print(f"[GAZETTEER] No pincode gazetteer at {path} - using web APIs only")
+            return False
+        try:
+            f = open(path, "rb")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count, index_offset, records_offset, strings_offset = HEADER_STRUCT.unpack_from(mapped, 0)
+            if magic != MAGIC:
+                mapped.close()
+                f.close()
+                print(f"[GAZETTEER] {path} is not a pincode gazetteer file")
+                return False
+        except Exception as e:
+            print(f"[GAZETTEER] Failed to load {path}: {e}")
+            return False
+        self.close()
+        self._file, self._mmap, self.path = f, mapped, path
+        self.record_count = count
+        self._index_offset, self._records_offset, self._strings_offset = index_offset, records_offset, strings_offset
+        self._read_string.cache_clear()
+        print(f"[GAZETTEER] Loaded {count} pincodes from {path}")
+        return True
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._file = None
+        self.record_count = 0
+
+    @lru_cache(maxsize=8192)
+    def _read_string(self, offset: int) -> str:
+        start = self._strings_offset + offset
+        (length,) = struct.unpack_from("<H", self._mmap, start)
+        return self._mmap[start + 2:start + 2 + length].decode("utf-8")
+
+    def lookup(self, pincode: Any) -> Optional[Dict[str, Any]]:
+        """Location record for a pincode, or None if unknown or the gazetteer is not loaded."""
+        if self._mmap is None:
+            return None
+        try:
+            number = int(str(pincode).strip())
+        except (TypeError, ValueError):
+            return None
+        if not MIN_PINCODE <= number <= MAX_PINCODE:
+            return None
+        (slot,) = INDEX_STRUCT.unpack_from(self._mmap, self._index_offset + (number - MIN_PINCODE) * INDEX_STRUCT.size)
+        if not slot:
+            return None
+        lat, lon, *string_offsets = RECORD_STRUCT.unpack_from(self._mmap, self._records_offset + (slot - 1) * RECORD_STRUCT.size)
+        record = {field: self._read_string(offset) for field, offset in zip(STRING_FIELDS, string_offsets)}
+        record["pincode"] = str(number)
+        record["latitude"] = None if lat == NO_COORDINATE else lat / 1_000_000
+        record["longitude"] = None if lon == NO_COORDINATE else lon / 1_000_000
+        return record
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Every record in pincode order (used to build prefix/autocomplete indexes)."""
+        if self._mmap is None:
+            return
+        # The frombuffer view is temporary so no buffer export outlives this line (mmap.close needs that)
+        slots = np.flatnonzero(np.frombuffer(self._mmap, dtype="<u4", count=MAX_PINCODE - MIN_PINCODE + 1, offset=self._index_offset))
+        for slot in slots:
+            yield self.lookup(MIN_PINCODE + int(slot))
+
+    def coordinates(self, pincode: Any) -> Optional[tuple]:
+        record = self.lookup(pincode)
+        if record and record["latitude"] is not None and record["longitude"] is not None:
+            return (record["latitude"], record["longitude"])
+        return None
+
+    def as_post_office(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a record like an api.postalpincode.in PostOffice entry"""
+        return {
+            "Name": record.get("office", ""),
+            "Block": record.get("block", ""),
+            "District": record.get("district", ""),
+            "State": record.get("state", ""),
+            "Region": record.get("region", ""),
+            "Division": record.get("division", ""),
+            "Circle": record.get("circle", ""),
+            "Country": "India",
+            "Pincode": record.get("pincode", ""),
+        }
+
+
+# Global gazetteer instance, loaded on startup
+pincode_gazetteer = PincodeGazetteer()
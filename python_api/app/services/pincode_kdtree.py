@@ -0,0 +1,160 @@
+"""
+Pincode KD-Tree
+Nearest-pincode lookup for a latitude/longitude without calling a reverse geocoder.
+
+Gazetteer pincode centroids are converted to 3D unit vectors, where straight-line
+(chord) distance grows with great-circle distance, so a plain Euclidean KD-tree gives
+correct nearest neighbours anywhere on the globe. The tree is implicit: points are
+reordered so every range [lo, hi) has its splitting point at the middle, and a query
+walks index ranges instead of node objects.
+
+The tree is built from pincode_gazetteer records (a few hundred milliseconds for the
+full India Post directory) and rebuilt when a different gazetteer file is loaded.
+A query costs well under a millisecond.
+"""
+
+import heapq
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .geo_distance import EARTH_RADIUS_KM
+from .pincode_gazetteer import pincode_gazetteer
+
+# Ranges this small are scanned linearly instead of split further
+LEAF_SIZE = 8
+# A pin further than this from every pincode centroid (sea, outside India) is not matched
+MAX_MATCH_KM = 25.0
+
+
+def _unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    cos_lat = math.cos(lat_rad)
+    return (cos_lat * math.cos(lon_rad), cos_lat * math.sin(lon_rad), math.sin(lat_rad))
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class PincodeKDTree:
+    """Implicit 3D KD-tree over pincode centroids"""
+
+    def __init__(self, gazetteer=pincode_gazetteer):
+        self.gazetteer = gazetteer
+        self._records: List[Dict[str, Any]] = []
+        # Coordinates in tree order, kept as Python lists (faster than NumPy for scalar access)
+        self._axes: Tuple[List[float], List[float], List[float]] = ([], [], [])
+        self._source: Optional[Tuple[Optional[str], int]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def build(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Rebuild from gazetteer-shaped records; records without coordinates are skipped"""
+        located = [r for r in records if r and r.get("latitude") is not None and r.get("longitude") is not None]
+        if not located:
+            self._records, self._axes = [], ([], [], [])
+            return 0
+        lats = np.radians(np.array([r["latitude"] for r in located], dtype=np.float64))
+        lons = np.radians(np.array([r["longitude"] for r in located], dtype=np.float64))
+        points = np.column_stack((np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)))
+
+        order = np.arange(len(located))
+        # Explicit stack instead of recursion; each entry is (lo, hi, depth)
+        stack = [(0, len(located), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                continue
+            mid = (lo + hi) // 2
+            segment = order[lo:hi]
+            order[lo:hi] = segment[np.argpartition(points[segment, depth % 3], mid - lo)]
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+        ordered = points[order]
+        self._axes = (ordered[:, 0].tolist(), ordered[:, 1].tolist(), ordered[:, 2].tolist())
+        self._records = [located[i] for i in order.tolist()]
+        return len(self._records)
+
+    def build_from_gazetteer(self) -> int:
+        """(Re)build from the loaded gazetteer; returns the number of indexed pincodes"""
+        with self._lock:
+            start_time = time.time()
+            count = self.build(self.gazetteer.iter_records())
+            self._source = (self.gazetteer.path, self.gazetteer.record_count)
+            if count:
+                elapsed = (time.time() - start_time) * 1000
+                print(f"[PINCODE_KDTREE] Indexed {count} pincode centroids ({elapsed:.0f}ms)")
+            return count
+
+    def _ensure_built(self) -> None:
+        if self._source != (self.gazetteer.path, self.gazetteer.record_count):
+            self.build_from_gazetteer()
+
+    def _search(self, query: Tuple[float, float, float], k: int) -> List[Tuple[float, int]]:
+        """Up to k (squared chord, position) pairs, nearest first"""
+        xs, ys, zs = self._axes
+        axes = self._axes
+        qx, qy, qz = query
+        # Max-heap (negated) of the k best so far
+        best: List[Tuple[float, int]] = []
+
+        def _consider(i: int) -> None:
+            dx, dy, dz = xs[i] - qx, ys[i] - qy, zs[i] - qz
+            d2 = dx * dx + dy * dy + dz * dz
+            if len(best) < k:
+                heapq.heappush(best, (-d2, i))
+            elif d2 < -best[0][0]:
+                heapq.heapreplace(best, (-d2, i))
+
+        # Entries are (lo, hi, depth, squared distance from the query to the range's split plane)
+        stack = [(0, len(xs), 0, 0.0)]
+        while stack:
+            lo, hi, depth, plane_d2 = stack.pop()
+            if len(best) == k and plane_d2 >= -best[0][0]:
+                continue
+            if hi - lo <= LEAF_SIZE:
+                for i in range(lo, hi):
+                    _consider(i)
+                continue
+            mid = (lo + hi) // 2
+            _consider(mid)
+            axis = depth % 3
+            diff = query[axis] - axes[axis][mid]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # Far side first so the near side is searched first; the far side is skipped
+            # when popped if the best match by then is closer than the split plane
+            stack.append((far[0], far[1], depth + 1, max(plane_d2, diff * diff)))
+            stack.append((near[0], near[1], depth + 1, plane_d2))
+        return sorted((-neg_d2, i) for neg_d2, i in best)
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: float = MAX_MATCH_KM) -> List[Dict[str, Any]]:
+        """
+        Up to k gazetteer records nearest to (lat, lon), closest first, each with a
+        ``distance_km``. Pincodes further than max_km are left out.
+        """
+        self._ensure_built()
+        if not self._records:
+            return []
+        matches = []
+        for d2, i in self._search(_unit_vector(lat, lon), k):
+            distance_km = _chord_to_km(math.sqrt(d2))
+            if distance_km > max_km:
+                break
+            matches.append({**self._records[i], "distance_km": round(distance_km, 3)})
+        return matches
+
+    def nearest_pincode(self, lat: float, lon: float, max_km: float = MAX_MATCH_KM) -> Optional[Dict[str, Any]]:
+        """The nearest gazetteer record, or None if nothing is within max_km"""
+        matches = self.nearest(lat, lon, k=1, max_km=max_km)
+        return matches[0] if matches else None
+
+
+# Global tree over the pincode gazetteer, built on startup
+pincode_kdtree = PincodeKDTree()
@@ -1,84 +1,273 @@
 """
-SMS Service for sending OTP via Twilio
+SMS Service
+Async, non-blocking SMS delivery through Twilio's REST API.
+
+Messages are queued and sent by background workers over one pooled HTTP client, so
+an OTP request returns as soon as the code is stored instead of waiting on Twilio.
+Rate limits (429), Twilio 5xx responses and network errors are retried with
+exponential backoff; other 4xx responses (bad number, unverified sender) fail at once.
+
+Delivery progress is reported to callbacks registered with sms_sender.on_status():
+queued -> sent | failed | dropped, then delivered / undelivered when Twilio reports
+back through the status webhook (TWILIO_STATUS_CALLBACK_URL pointing at
+/api/auth/sms-status).
 """
-import os
-from typing import Dict, Any
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+import httpx
+
 from ..core.config import settings
 
+TWILIO_API_BASE = "https://api.twilio.com/2010-04-01"
+SMS_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+SMS_POOL_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60.0)
+SMS_WORKERS = 4
+SMS_QUEUE_SIZE = 1000
+SMS_MAX_ATTEMPTS = 3
+SMS_RETRY_BASE_DELAY = 1.0
+# Recent message statuses kept for get_status()
+SMS_STATUS_HISTORY = 1000
+
+StatusCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+OTP_MESSAGES = {
+    "verification": "Your Home & Own verification code is: {token}. Valid for {minutes} minutes.",
+    "bank_update": "Your OTP for bank details update: {token}. Valid for {minutes} minutes.",
+    "password_change": "Your OTP for password change: {token}. Valid for {minutes} minutes.",
+    "password_reset": "Your OTP for password reset: {token}. Valid for {minutes} minutes.",
+    "profile_update": "Your OTP for profile update: {token}. Valid for {minutes} minutes.",
+    "sensitive_action": "Your Home & Own security code: {token}. Valid for {minutes} minutes."
+}
+
+
+def otp_message(token: str, action: str = "verification") -> str:
+    """Action-specific OTP message text"""
+    template = OTP_MESSAGES.get(action, "Your Home & Own verification code is: {token}")
+    return template.format(token=token, minutes=settings.OTP_EXP_MIN)
+
+
+def sms_configured() -> bool:
+    return bool(settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN and settings.TWILIO_FROM_NUMBER)
+
+
+class SmsSendError(Exception):
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class SmsSender:
+    """Bounded delivery queue drained by background workers over a pooled client"""
+
+    def __init__(self, workers: int = SMS_WORKERS, queue_size: int = SMS_QUEUE_SIZE,
+                 max_attempts: int = SMS_MAX_ATTEMPTS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_lock: Optional[asyncio.Lock] = None
+        self._callbacks: List[StatusCallback] = []
+        self._ids = itertools.count(1)
+        self._statuses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Twilio SID -> our message id, for webhook updates
+        self._sids: Dict[str, str] = {}
+
+    def on_status(self, callback: StatusCallback) -> None:
+        """Call callback(status dict) on every status change (sync or async callables)"""
+        self._callbacks.append(callback)
+
+    def _start(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # First send on this loop (or the loop was replaced, e.g. in tests)
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._client, self._client_lock = None, asyncio.Lock()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+            self._loop = loop
+        return self._queue
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        async with self._client_lock:
+            if self._client is None or self._client.is_closed:
+                # Building the client loads CA certificates (~200ms); keep that off the event loop
+                self._client = await asyncio.to_thread(
+                    httpx.AsyncClient, timeout=SMS_TIMEOUT, limits=SMS_POOL_LIMITS
+                )
+        return self._client
+
+    def enqueue(self, to: str, body: str, **meta: Any) -> Dict[str, Any]:
+        """Queue an SMS and return its status record right away (never blocks)"""
+        message = {
+            "id": f"sms-{next(self._ids)}",
+            "to": to,
+            "status": "queued",
+            "attempts": 0,
+            "queued_at": time.time(),
+            **meta
+        }
+        try:
+            self._start().put_nowait((message, body))
+        except asyncio.QueueFull:
+            message["status"] = "dropped"
+            message["error"] = "SMS queue full"
+            print(f"[SMS] Queue full ({self.queue_size}), dropping SMS to {to}")
+        self._report(message)
+        return dict(message)
+
+    async def _worker(self) -> None:
+        while True:
+            message, body = await self._queue.get()
+            try:
+                await self._deliver(message, body)
+            except Exception as e:
+                print(f"[SMS] Unexpected delivery error for {message['id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: Dict[str, Any], body: str) -> None:
+        while True:
+            message["attempts"] += 1
+            try:
+                sid = await self._send(message["to"], body)
+                message.update(status="sent", sid=sid, sent_at=time.time())
+                self._sids[sid] = message["id"]
+                print(f"[SMS] Sent to {message['to']}, SID: {sid} (attempt {message['attempts']})")
+                self._report(message)
+                return
+            except SmsSendError as e:
+                message["error"] = str(e)
+                if not e.retryable or message["attempts"] >= self.max_attempts:
+                    message["status"] = "failed"
+                    print(f"[SMS] Giving up on SMS to {message['to']} after {message['attempts']} attempts: {e}")
+                    self._report(message)
+                    return
+                delay = SMS_RETRY_BASE_DELAY * 2 ** (message["attempts"] - 1)
+                print(f"[SMS] Send to {message['to']} failed ({e}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+    async def _send(self, to: str, body: str) -> str:
+        """One Twilio API call; returns the message SID"""
+        data = {"To": to, "From": settings.TWILIO_FROM_NUMBER, "Body": body}
+        if settings.TWILIO_STATUS_CALLBACK_URL:
+            data["StatusCallback"] = settings.TWILIO_STATUS_CALLBACK_URL
+        client = await self._get_client()
+        try:
+            response = await client.post(
+                f"{TWILIO_API_BASE}/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json",
+                data=data,
+                auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+            )
+        except httpx.HTTPError as e:
+            raise SmsSendError(f"{type(e).__name__}: {e}", retryable=True)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("message", response.text)
+            except ValueError:
+                detail = response.text
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise SmsSendError(f"Twilio {response.status_code}: {detail}", retryable=retryable)
+        return response.json().get("sid", "")
+
+    def _report(self, message: Dict[str, Any]) -> None:
+        snapshot = dict(message)
+        if snapshot.get("id"):
+            self._statuses[snapshot["id"]] = snapshot
+            self._statuses.move_to_end(snapshot["id"])
+            while len(self._statuses) > SMS_STATUS_HISTORY:
+                _, old = self._statuses.popitem(last=False)
+                self._sids.pop(old.get("sid", ""), None)
+        for callback in self._callbacks:
+            try:
+                result = callback(dict(snapshot))
+                if asyncio.iscoroutine(result):
+                    asyncio.get_running_loop().create_task(result)
+            except Exception as e:
+                print(f"[SMS] Status callback failed: {e}")
+
+    def handle_status_webhook(self, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Apply a Twilio status callback (MessageSid, MessageStatus, ErrorCode)"""
+        message_id = self._sids.get(params.get("MessageSid", ""))
+        message = self._statuses.get(message_id) if message_id else None
+        if message is None:
+            # Sent by another worker (or long ago); report what Twilio told us
+            message = {"id": None, "sid": params.get("MessageSid"), "to": params.get("To")}
+        message = dict(message, status=params.get("MessageStatus", "unknown"))
+        if params.get("ErrorCode"):
+            message["error"] = f"Twilio error {params['ErrorCode']}"
+        print(f"[SMS] Delivery status for {message.get('sid')}: {message['status']}")
+        self._report(message)
+        return message
+
+    def get_status(self, message_id: str) -> Optional[Dict[str, Any]]:
+        status = self._statuses.get(message_id)
+        return dict(status) if status else None
+
+    async def drain(self, timeout: float = 5.0) -> None:
+        """Wait (up to timeout) for queued messages to be sent"""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"[SMS] {self._queue.qsize()} SMS still queued at shutdown")
+
+    async def close(self) -> None:
+        """Stop the workers and close the HTTP client (application shutdown)"""
+        await self.drain()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client, self._queue, self._loop = None, None, None
+
+
+def validate_twilio_signature(url: str, params: Dict[str, str], signature: str) -> bool:
+    """X-Twilio-Signature check: base64 HMAC-SHA1 of the URL plus sorted POST params"""
+    if not settings.TWILIO_AUTH_TOKEN or not signature:
+        return False
+    payload = url + "".join(f"{key}{params[key]}" for key in sorted(params))
+    digest = hmac.new(settings.TWILIO_AUTH_TOKEN.encode(), payload.encode(), hashlib.sha1).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
+
+# Global SMS sender
+sms_sender = SmsSender()
+
+
 async def send_sms_otp(phone: str, otp: str, action: str = "verification") -> Dict[str, Any]:
     """
-    Send OTP via SMS using Twilio
-    
+    Queue an OTP SMS
+
     Args:
         phone: Phone number to send OTP to
         otp: The OTP code to send
         action: The action type (verification, password_reset, etc.)
-    
+
     Returns:
-        Dict with success status and message
+        Dict with success status and the queued message id
     """
-    try:
-        # Check if Twilio credentials are available
-        account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', None)
-        auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', None)
-        from_number = getattr(settings, 'TWILIO_PHONE_NUMBER', None)
-        
-        if not all([account_sid, auth_token, from_number]):
-            print(f"[SMS] Twilio credentials not configured - development mode")
-            return {
-                "success": True,
-                "message": f"OTP {otp} would be sent to {phone} (dev mode)",
-                "dev_mode": True
-            }
-        
-        # Try to send SMS via Twilio
-        try:
-            from twilio.rest import Client
-            
-            client = Client(account_sid, auth_token)
-            
-            # Format message based on action
-            if action == "verification":
-                message_body = f"Your Home & Own verification code is: {otp}. Valid for 10 minutes."
-            elif action == "password_reset":
-                message_body = f"Your Home & Own password reset code is: {otp}. Valid for 10 minutes."
-            else:
-                message_body = f"Your Home & Own code is: {otp}. Valid for 10 minutes."
-            
-            # Send SMS
-            message = client.messages.create(
-                body=message_body,
-                from_=from_number,
-                to=phone
-            )
-            
-            print(f"[SMS] OTP sent successfully to {phone}, SID: {message.sid}")
-            return {
-                "success": True,
-                "message": "OTP sent successfully",
-                "sid": message.sid
-            }
-            
-        except ImportError:
-            print(f"[SMS] Twilio package not installed - development fallback")
-            return {
-                "success": True,
-                "message": f"OTP {otp} would be sent to {phone} (twilio not installed)",
-                "dev_mode": True
-            }
-        except Exception as twilio_error:
-            print(f"[SMS] Twilio error: {twilio_error}")
-            return {
-                "success": False,
-                "error": f"Failed to send SMS: {str(twilio_error)}"
-            }
-            
-    except Exception as e:
-        print(f"[SMS] SMS service error: {e}")
+    if not sms_configured():
+        print(f"[SMS] Twilio credentials not configured - development mode")
         return {
-            "success": False,
-            "error": f"SMS service error: {str(e)}"
+            "success": True,
+            "message": f"OTP {otp} would be sent to {phone} (dev mode)",
+            "dev_mode": True
         }
+    message = sms_sender.enqueue(phone, otp_message(otp, action), action=action)
+    if message["status"] == "dropped":
+        return {"success": False, "error": "SMS service is busy, please try again shortly"}
+    return {"success": True, "message": "OTP queued for delivery", "message_id": message["id"]}
 
 def format_phone_number(phone: str) -> str:
     """
@@ -0,0 +1,293 @@
+"""
+Spatial Index
+In-memory lat/lon grid over active property coordinates for radius searches.
+
+A radius query only visits the grid cells overlapping the query's bounding box
+and refines those candidates with an exact (vectorized) haversine distance, so
+results cover the whole catalog instead of a fixed window of rows.
+
+Every insert/update/delete of properties made through db (any route or script in
+this process) re-reads the written rows and re-indexes them, which also bumps
+`version` and so retires cached map tiles.
+"""
+
+import asyncio
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..db.supabase_client import db
+from .geo_distance import haversine_km_many
+
+KM_PER_DEGREE_LAT = 111.0
+
+# Compact per-property attributes kept alongside coordinates so map tiles can be
+# filtered and summarized without loading rows
+INDEXED_PROPERTY_COLUMNS = [
+    'title', 'property_type', 'listing_type', 'price', 'monthly_rent', 'area_sqft',
+    'bedrooms', 'bathrooms', 'city', 'state', 'mandal', 'furnishing_status', 'facing',
+    'commercial_subtype', 'land_type', 'featured', 'verified', 'owner_id', 'added_by'
+]
+
+
+class PropertySpatialIndex:
+    """Fixed-size lat/lon grid cells mapping to property coordinates"""
+
+    def __init__(self, cell_size_deg: float = 0.05, ttl: int = 300, page_size: int = 1000):
+        # 0.05° ≈ 5.5 km of latitude; a 10 km radius touches roughly 5x5 cells
+        self.cell_size_deg = cell_size_deg
+        self.ttl = ttl
+        self.page_size = page_size
+        self._cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        self._locations: Dict[str, Tuple[float, float]] = {}
+        self._attributes: Dict[str, Dict[str, Any]] = {}
+        # Bumped on every change so callers can key caches on the index contents
+        self.version = 0
+        # Per-cell (ids, lats, lons) arrays, rebuilt lazily after a cell changes
+        self._cell_arrays: Dict[Tuple[int, int], Tuple[List[str], np.ndarray, np.ndarray]] = {}
+        self._built_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        # Strong references to pending refresh tasks (the loop only keeps weak ones)
+        self._refresh_tasks = set()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def upsert(self, property_id: str, lat: float, lon: float, attributes: Optional[Dict[str, Any]] = None) -> None:
+        """Add or move a property in the index"""
+        property_id = str(property_id)
+        self.remove(property_id)
+        lat, lon = float(lat), float(lon)
+        cell_key = self._cell(lat, lon)
+        self.version += 1
+        self._locations[property_id] = (lat, lon)
+        self._attributes[property_id] = attributes or {}
+        self._cells.setdefault(cell_key, {})[property_id] = (lat, lon)
+        self._cell_arrays.pop(cell_key, None)
+
+    def remove(self, property_id: str) -> None:
+        """Drop a property from the index if present"""
+        property_id = str(property_id)
+        previous = self._locations.pop(property_id, None)
+        self._attributes.pop(property_id, None)
+        if previous is None:
+            return
+        self.version += 1
+        cell_key = self._cell(*previous)
+        self._cell_arrays.pop(cell_key, None)
+        cell = self._cells.get(cell_key)
+        if cell is not None:
+            cell.pop(property_id, None)
+            if not cell:
+                del self._cells[cell_key]
+
+    def sync_property(self, property_data: Dict[str, Any]) -> None:
+        """Reflect a property write: only active properties with coordinates are indexed"""
+        property_id = property_data.get('id')
+        if not property_id:
+            return
+        lat, lon = property_data.get('latitude'), property_data.get('longitude')
+        if property_data.get('status') == 'active' and lat is not None and lon is not None:
+            self.upsert(property_id, lat, lon, {column: property_data.get(column) for column in INDEXED_PROPERTY_COLUMNS})
+        else:
+            self.remove(property_id)
+
+    def invalidate(self) -> None:
+        """Force a rebuild from the database on the next query"""
+        self._built_at = 0.0
+
+    async def refresh(self, property_ids: List[str]) -> None:
+        """Re-read properties and re-index them (deleted or inactive ones are dropped)"""
+        # A failed read raises (and _refresh_done rebuilds on the next query); rows missing
+        # from a successful read were deleted
+        rows = await db.select(
+            "properties",
+            columns=",".join(['id', 'latitude', 'longitude', 'status'] + INDEXED_PROPERTY_COLUMNS),
+            filters={"id": property_ids},
+            raise_errors=True
+        )
+        found = set()
+        for row in rows:
+            found.add(str(row.get('id')))
+            self.sync_property(row)
+        for property_id in property_ids:
+            if str(property_id) not in found:
+                self.remove(property_id)
+
+    def on_property_write(self, match: Dict[str, Any]) -> None:
+        """db.on_write hook for properties: re-sync the written rows after any write"""
+        if not self._built_at:
+            # Not loaded yet; the first query reads current data anyway
+            return
+        property_id = match.get('id')
+        if isinstance(property_id, list):
+            property_ids = [str(value) for value in property_id]
+        elif property_id:
+            property_ids = [str(property_id)]
+        else:
+            # Written by owner, status etc.: any row may have changed
+            self.invalidate()
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.refresh(property_ids))
+        except RuntimeError:
+            self.invalidate()
+            return
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[SPATIAL] Refresh after write failed, rebuilding on next query: {task.exception()}")
+            self.invalidate()
+
+    def is_fresh(self) -> bool:
+        return bool(self._built_at) and (time.time() - self._built_at) < self.ttl
+
+    async def ensure_loaded(self) -> None:
+        """Build the index from the database if it is missing or older than the TTL"""
+        if self.is_fresh():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have rebuilt it while we waited
+            if self.is_fresh():
+                return
+            try:
+                await self._load()
+            except Exception as e:
+                if not self._locations:
+                    raise
+                # Keep serving the previous index (still stale, so the next query retries)
+                print(f"[SPATIAL] Rebuild failed, keeping previous index: {e}")
+
+    async def _load(self) -> None:
+        start_time = time.time()
+        cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        locations: Dict[str, Tuple[float, float]] = {}
+        attributes: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        while True:
+            rows = await db.select(
+                "properties",
+                columns=",".join(['id', 'latitude', 'longitude'] + INDEXED_PROPERTY_COLUMNS),
+                filters={"status": "active"},
+                order_by="id",
+                limit=self.page_size,
+                offset=offset,
+                # A failed page must not look like the end of the catalog
+                raise_errors=True
+            )
+            for row in rows or []:
+                lat, lon = row.get('latitude'), row.get('longitude')
+                if lat is None or lon is None:
+                    continue
+                lat, lon = float(lat), float(lon)
+                property_id = str(row.get('id'))
+                locations[property_id] = (lat, lon)
+                attributes[property_id] = {column: row.get(column) for column in INDEXED_PROPERTY_COLUMNS}
+                cells.setdefault(self._cell(lat, lon), {})[property_id] = (lat, lon)
+            if not rows or len(rows) < self.page_size:
+                break
+            offset += self.page_size
+
+        self._cells, self._locations, self._cell_arrays = cells, locations, {}
+        self._attributes = attributes
+        self.version += 1
+        self._built_at = time.time()
+        elapsed = (time.time() - start_time) * 1000
+        print(f"[SPATIAL] Indexed {len(locations)} properties in {len(cells)} cells ({elapsed:.0f}ms)")
+
+    def _arrays_for_cell(self, cell_key: Tuple[int, int]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        arrays = self._cell_arrays.get(cell_key)
+        if arrays is None:
+            cell = self._cells[cell_key]
+            ids = list(cell.keys())
+            coords = np.array(list(cell.values()), dtype=np.float64).reshape(-1, 2)
+            arrays = (ids, coords[:, 0], coords[:, 1])
+            self._cell_arrays[cell_key] = arrays
+        return arrays
+
+    def _candidate_cells(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, int]]:
+        lat_delta = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = math.cos(math.radians(lat))
+        lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+        min_row, min_col = self._cell(max(-90.0, lat - lat_delta), lon - lon_delta)
+        max_row, max_col = self._cell(min(90.0, lat + lat_delta), lon + lon_delta)
+
+        # Very large radii cover more cells than exist (or the whole globe); scan occupied cells instead
+        cols_per_world = round(360.0 / self.cell_size_deg)
+        cell_span = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if cell_span > len(self._cells) or (max_col - min_col + 1) >= cols_per_world:
+            return list(self._cells.keys())
+
+        # Wrap longitude cells across the antimeridian
+        min_col_index = math.floor(-180.0 / self.cell_size_deg)
+        candidates = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                wrapped_col = (col - min_col_index) % cols_per_world + min_col_index
+                if (row, wrapped_col) in self._cells:
+                    candidates.append((row, wrapped_col))
+        return candidates
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[str, float]]:
+        """(property_id, distance_km) pairs within radius_km, nearest first"""
+        cell_keys = self._candidate_cells(lat, lon, radius_km)
+        if not cell_keys:
+            return []
+        ids: List[str] = []
+        lats, lons = [], []
+        for cell_key in cell_keys:
+            cell_ids, cell_lats, cell_lons = self._arrays_for_cell(cell_key)
+            ids.extend(cell_ids)
+            lats.append(cell_lats)
+            lons.append(cell_lons)
+        distances = haversine_km_many(lat, lon, np.concatenate(lats), np.concatenate(lons))
+        inside = np.nonzero(distances <= radius_km)[0]
+        order = inside[np.argsort(distances[inside], kind="stable")]
+        return [(ids[i], float(distances[i])) for i in order]
+
+    def within_bbox(self, south: float, west: float, north: float, east: float) -> List[Tuple[str, float, float, Dict[str, Any]]]:
+        """(property_id, lat, lon, attributes) for every indexed property inside the box"""
+        if west > east:
+            # Box crosses the antimeridian
+            return self.within_bbox(south, west, north, 180.0) + self.within_bbox(south, -180.0, north, east)
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            cell_keys = list(self._cells.keys())
+        else:
+            cell_keys = [
+                (row, col)
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if (row, col) in self._cells
+            ]
+        results = []
+        for cell_key in cell_keys:
+            for property_id, (lat, lon) in self._cells[cell_key].items():
+                if south <= lat <= north and west <= lon <= east:
+                    results.append((property_id, lat, lon, self._attributes.get(property_id, {})))
+        return results
+
+    async def query_radius(
+        self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None, offset: int = 0
+    ) -> Tuple[int, List[Tuple[str, float]]]:
+        """Return (total matches, page of (property_id, distance_km)) for a radius query"""
+        await self.ensure_loaded()
+        matches = self.within_radius(lat, lon, radius_km)
+        end = None if limit is None else offset + limit
+        return len(matches), matches[offset:end]
+
+
+# Global index instance
+property_spatial_index = PropertySpatialIndex()
+db.on_write("properties", property_spatial_index.on_property_write)
@@ -1,16 +1,80 @@
 """
 User Role Management Service
 Handles multiple roles per user and role-based access control
+
+A user's role rows are cached for ROLE_CACHE_TTL seconds (bounded LRU); every role write
+in this service invalidates that user's entry.
 """
 
 import datetime as dt
+import time
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from ..db.supabase_client import db
 
+ROLE_CACHE_TTL = 30
+ROLE_CACHE_SIZE = 5000
+# Users per user_roles query when loading roles for a page of users
+ROLE_BATCH_SIZE = 200
+
+
+class RoleCache:
+    """user_id -> role rows, with TTL and an LRU bound"""
+
+    def __init__(self, ttl: int = ROLE_CACHE_TTL, max_entries: int = ROLE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped on invalidation so a load that started before a write is not cached
+        self._generations: Dict[str, int] = {}
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, 0)
+
+    def get(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        rows, expires_at = entry
+        if time.time() > expires_at:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return rows
+
+    def set(self, user_id: str, rows: List[Dict[str, Any]], generation: int) -> None:
+        if generation != self.generation(user_id):
+            return
+        self._entries[user_id] = (rows, time.time() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._generations.pop(evicted, None)
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._generations[user_id] = self.generation(user_id) + 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+
+
+role_cache = RoleCache()
+
+
+def _active_roles(rows: List[Dict[str, Any]]) -> List[str]:
+    return [row.get("role") for row in rows if row.get("status") == "active" and row.get("verified") is True]
+
 
 class UserRoleService:
     """Service for managing user roles and permissions"""
     
+    @staticmethod
+    def invalidate_roles(user_id: str) -> None:
+        """Drop a user's cached roles (call after any user_roles write)"""
+        role_cache.invalidate(str(user_id))
+    
     @staticmethod
     async def create_user_role(user_id: str, role: str, status: str = "active", verified: bool = False) -> Dict[str, Any]:
         """Create a new user role"""
@@ -28,6 +92,7 @@ class UserRoleService:
             }
             
             result = await db.insert("user_roles", role_data)
+            UserRoleService.invalidate_roles(user_id)
             print(f"[USER_ROLE] Role '{role}' created successfully for user {user_id}")
             return result
             
@@ -36,44 +101,75 @@ class UserRoleService:
             raise e
     
     @staticmethod
-    async def get_user_roles(user_id: str) -> List[Dict[str, Any]]:
-        """Get all roles for a user"""
+    async def get_user_roles(user_id: str, raise_errors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get all roles for a user. A failed read is never cached; it returns [] (or
+        raises with raise_errors, for callers that must not mistake it for "no roles").
+        """
+        user_id = str(user_id)
+        cached = role_cache.get(user_id)
+        if cached is not None:
+            return [dict(row) for row in cached]
+        generation = role_cache.generation(user_id)
         try:
-            roles = await db.select("user_roles", filters={"user_id": user_id})
-            return roles or []
+            roles = await db.select("user_roles", filters={"user_id": user_id}, raise_errors=True)
         except Exception as e:
             print(f"[USER_ROLE] Failed to get roles for user {user_id}: {e}")
+            if raise_errors:
+                raise
             return []
+        role_cache.set(user_id, [dict(row) for row in roles or []], generation)
+        return roles or []
     
     @staticmethod
-    async def get_active_user_roles(user_id: str) -> List[str]:
+    async def get_active_user_roles(user_id: str, raise_errors: bool = False) -> List[str]:
         """Get all active and verified roles for a user"""
         try:
-            roles = await db.select("user_roles", filters={
-                "user_id": user_id,
-                "status": "active",
-                "verified": True
-            })
-            return [role.get("role") for role in roles] if roles else []
+            return _active_roles(await UserRoleService.get_user_roles(user_id, raise_errors=raise_errors))
         except Exception as e:
             print(f"[USER_ROLE] Failed to get active roles for user {user_id}: {e}")
+            if raise_errors:
+                raise
             return []
     
     @staticmethod
     async def has_role(user_id: str, role: str) -> bool:
         """Check if user has a specific active and verified role"""
         try:
-            roles = await db.select("user_roles", filters={
-                "user_id": user_id,
-                "role": role.lower(),
-                "status": "active",
-                "verified": True
-            })
-            return len(roles) > 0
+            return role.lower() in await UserRoleService.get_active_user_roles(user_id)
         except Exception as e:
             print(f"[USER_ROLE] Failed to check role '{role}' for user {user_id}: {e}")
             return False
     
+    @staticmethod
+    async def get_active_roles_for_users(user_ids: List[str]) -> Dict[str, List[str]]:
+        """Active roles for many users: cached entries plus one user_roles query per batch"""
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids if user_id))
+        rows_by_user: Dict[str, List[Dict[str, Any]]] = {}
+        missing = []
+        for user_id in user_ids:
+            cached = role_cache.get(user_id)
+            if cached is None:
+                missing.append(user_id)
+            else:
+                rows_by_user[user_id] = cached
+        for start in range(0, len(missing), ROLE_BATCH_SIZE):
+            batch = missing[start:start + ROLE_BATCH_SIZE]
+            generations = {user_id: role_cache.generation(user_id) for user_id in batch}
+            try:
+                rows = await db.select("user_roles", filters={"user_id": {"in": batch}}, raise_errors=True)
+            except Exception as e:
+                # Not cached: these users show no roles on this page only
+                print(f"[USER_ROLE] Failed to get roles for {len(batch)} users: {e}")
+                continue
+            fetched: Dict[str, List[Dict[str, Any]]] = {user_id: [] for user_id in batch}
+            for row in rows or []:
+                fetched.setdefault(str(row.get("user_id")), []).append(dict(row))
+            for user_id in batch:
+                role_cache.set(user_id, fetched[user_id], generations[user_id])
+                rows_by_user[user_id] = fetched[user_id]
+        return {user_id: _active_roles(rows_by_user.get(user_id, [])) for user_id in user_ids}
+    
     @staticmethod
     async def verify_role(user_id: str, role: str) -> bool:
         """Verify a user's role (admin action)"""
@@ -89,6 +185,7 @@ class UserRoleService:
                 "role": role.lower()
             })
             
+            UserRoleService.invalidate_roles(user_id)
             print(f"[USER_ROLE] Role '{role}' verified successfully for user {user_id}")
             return True
             
@@ -110,6 +207,7 @@ class UserRoleService:
                 "role": role.lower()
             })
             
+            UserRoleService.invalidate_roles(user_id)
             print(f"[USER_ROLE] Role '{role}' suspended successfully for user {user_id}")
             return True
             
@@ -131,6 +229,7 @@ class UserRoleService:
                 "role": role.lower()
             })
             
+            UserRoleService.invalidate_roles(user_id)
             print(f"[USER_ROLE] Role '{role}' activated successfully for user {user_id}")
             return True
             
@@ -149,6 +248,7 @@ class UserRoleService:
                 "role": role.lower()
             })
             
+            UserRoleService.invalidate_roles(user_id)
             print(f"[USER_ROLE] Role '{role}' deleted successfully for user {user_id}")
             return True
             
@@ -183,7 +283,8 @@ class UserRoleService:
         try:
             print(f"[USER_ROLE] Adding additional role '{role}' for user {user_id}")
             
-            # Check if role already exists
+            # Check if role already exists (fresh read: another worker may have just added it)
+            UserRoleService.invalidate_roles(user_id)
             existing_roles = await UserRoleService.get_user_roles(user_id)
             if any(r.get("role") == role.lower() for r in existing_roles):
                 print(f"[USER_ROLE] Role '{role}' already exists for user {user_id}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Property Coordinates Backfill
+Fills latitude/longitude for properties that have none, so map and radius queries
+work on real positions. Each page of properties is grouped by pincode, every pincode
+is geocoded once (gazetteer, geocode cache, then web providers at backfill priority),
+and each pincode group is written with a single UPDATE.
+
+Progress is saved after every page, so an interrupted or failed run continues where
+it stopped; the saved state is only cleared once the scan reaches the last property:
+
+    python scripts/backfill_property_coordinates.py [--dry-run] [--restart] [--page-size N]
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+PAGE_SIZE = 500
+# Pincodes geocoded at once; provider pacing itself is done by the geocode scheduler
+GEOCODE_CONCURRENCY = 8
+STATE_FILE = current_dir / ".backfill_property_coordinates.json"
+
+
+def load_state(restart: bool) -> dict:
+    if not restart and STATE_FILE.exists():
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"after_id": None, "scanned": 0, "updated": 0, "no_pincode": 0, "not_found": 0, "failed": 0}
+
+
+def save_state(state: dict) -> None:
+    tmp_path = STATE_FILE.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    tmp_path.replace(STATE_FILE)
+
+
+def group_by_pincode(rows: List[dict]) -> Dict[str, List[str]]:
+    """Property ids keyed by cleaned 6-digit pincode (rows without one are left out)"""
+    groups: Dict[str, List[str]] = {}
+    for row in rows:
+        pincode = str(row.get("zip_code") or "").strip().replace(" ", "")
+        if len(pincode) == 6 and pincode.isdigit():
+            groups.setdefault(pincode, []).append(row["id"])
+    return groups
+
+
+async def backfill_page(db, rows: List[dict], state: dict, dry_run: bool) -> None:
+    from app.services.location_service import LocationService
+
+    groups = group_by_pincode(rows)
+    state["no_pincode"] += len(rows) - sum(len(ids) for ids in groups.values())
+    semaphore = asyncio.Semaphore(GEOCODE_CONCURRENCY)
+
+    async def geocode(pincode: str):
+        async with semaphore:
+            return pincode, await LocationService.get_coordinates_from_pincode(pincode)
+
+    for pincode, coordinates in await asyncio.gather(*(geocode(pincode) for pincode in groups)):
+        property_ids = groups[pincode]
+        if not coordinates:
+            state["not_found"] += len(property_ids)
+            print(f"  ⚠️  {pincode}: no coordinates ({len(property_ids)} properties)")
+            continue
+        if dry_run:
+            print(f"  🔎 {pincode}: would set {coordinates} on {len(property_ids)} properties")
+            state["updated"] += len(property_ids)
+            continue
+        try:
+            # One statement per pincode group
+            await db.update("properties", {"latitude": coordinates[0], "longitude": coordinates[1]}, {"id": property_ids})
+            state["updated"] += len(property_ids)
+        except Exception as e:
+            state["failed"] += len(property_ids)
+            print(f"  ❌ {pincode}: {e}")
+
+
+async def backfill_property_coordinates(db, dry_run: bool = False, restart: bool = False, page_size: int = PAGE_SIZE) -> dict:
+    """Page through properties without coordinates (keyset on id) and fill them by pincode."""
+    from app.services.location_service import LocationService
+    from app.services.geocode_scheduler import geocode_priority, BACKFILL
+
+    state = load_state(restart)
+    if state["after_id"]:
+        print(f"↪️  Resuming after property {state['after_id']} ({state['scanned']} already scanned)")
+    start_time = time.time()
+    with geocode_priority(BACKFILL):
+        while True:
+            # Raises on a failed read: only an empty or short page means the scan is done
+            rows = await LocationService.get_properties_without_coordinates(limit=page_size, after_id=state["after_id"])
+            if not rows:
+                break
+            await backfill_page(db, rows, state, dry_run)
+            state["scanned"] += len(rows)
+            state["after_id"] = rows[-1]["id"]
+            if not dry_run:
+                save_state(state)
+            elapsed = time.time() - start_time
+            print(f"  📦 Scanned {state['scanned']} properties: {state['updated']} filled, "
+                  f"{state['not_found']} not found, {state['no_pincode']} without pincode ({elapsed:.0f}s)")
+            if len(rows) < page_size:
+                break
+    if not dry_run and STATE_FILE.exists():
+        # Finished: the next run starts from the beginning again
+        STATE_FILE.unlink()
+    return state
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv
+    restart = "--restart" in sys.argv
+    page_size = PAGE_SIZE
+    if "--page-size" in sys.argv:
+        page_size = int(sys.argv[sys.argv.index("--page-size") + 1])
+    print("📍 Property coordinates backfill" + (" (dry run)" if dry_run else ""))
+    try:
+        from app.db.supabase_client import db
+        from app.services.pincode_gazetteer import pincode_gazetteer
+        pincode_gazetteer.load()
+        state = await backfill_property_coordinates(db, dry_run=dry_run, restart=restart, page_size=page_size)
+        print(f"\n✅ Done: scanned={state['scanned']}, filled={state['updated']}, not found={state['not_found']}, "
+              f"without pincode={state['no_pincode']}, failed={state['failed']}")
+    except Exception as e:
+        print(f"\n❌ Backfill failed: {e}")
+        print(f"   Progress is kept in {STATE_FILE.name}; run again to resume")
+        import traceback
+        traceback.print_exc()
+    finally:
+        from app.services.geocode_cache import geocode_cache
+        from app.services.geo_http import close_geo_client
+        # Geocode answers are written to the cache table in the background
+        await geocode_cache.flush()
+        await close_geo_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
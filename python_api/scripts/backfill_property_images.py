@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Property Images Backfill
+Fills properties.images from the documents table for properties that still rely
+on the documents fallback (uploaded before images were persisted at upload time).
+Public URLs are resolved once here so listings can read properties.images directly.
+
+    python scripts/backfill_property_images.py [--dry-run]
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+PAGE_SIZE = 200
+
+
+async def backfill_property_images(db, dry_run: bool = False) -> dict:
+    """Page through properties and fill empty images from their image documents."""
+    from app.services.image_urls import group_document_images
+
+    stats = {"scanned": 0, "missing": 0, "updated": 0, "failed": 0}
+    offset = 0
+    while True:
+        rows = await db.select("properties", columns="id,images", order_by="created_at", limit=PAGE_SIZE, offset=offset)
+        if not rows:
+            break
+        stats["scanned"] += len(rows)
+        missing_ids = [row.get("id") for row in rows if not row.get("images") or row.get("images") in ("[]", "{}")]
+        stats["missing"] += len(missing_ids)
+        if missing_ids:
+            # One documents query per page instead of one per property
+            docs = await db.select("documents", filters={
+                "entity_type": "property",
+                "entity_id": {"in": missing_ids}
+            })
+            for property_id, image_urls in group_document_images(docs).items():
+                if dry_run:
+                    print(f"  🔎 {property_id}: would set {len(image_urls)} images")
+                    stats["updated"] += 1
+                    continue
+                try:
+                    await db.update("properties", {"images": image_urls}, {"id": property_id})
+                    stats["updated"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"  ❌ {property_id}: {e}")
+        print(f"  📦 Processed {stats['scanned']} properties ({stats['updated']} filled)")
+        if len(rows) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return stats
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv
+    print("🖼️  Property images backfill" + (" (dry run)" if dry_run else ""))
+    try:
+        from app.db.supabase_client import db
+        stats = await backfill_property_images(db, dry_run=dry_run)
+        print(f"\n✅ Done: scanned={stats['scanned']}, without images={stats['missing']}, "
+              f"filled={stats['updated']}, failed={stats['failed']}")
+    except Exception as e:
+        print(f"\n❌ Backfill failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Distance Kernel Microbenchmark
+Compares the scalar haversine loop against the NumPy kernel used by nearby search,
+agent proximity and map clustering.
+
+    python scripts/benchmark_distance.py [--repeat 5] [--sizes 10000,50000,100000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+import numpy as np
+
+from app.services.geo_distance import haversine_km, haversine_km_many
+
+# Hyderabad, with points scattered over roughly a 200 km box around it
+CENTER = (17.3850, 78.4867)
+
+
+def _best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(sizes, repeat: int) -> None:
+    random.seed(42)
+    print(f"{'points':>8}  {'scalar ms':>10}  {'numpy ms':>9}  {'speedup':>7}")
+    for size in sizes:
+        lats = [CENTER[0] + random.uniform(-1, 1) for _ in range(size)]
+        lons = [CENTER[1] + random.uniform(-1, 1) for _ in range(size)]
+        lats_array, lons_array = np.array(lats), np.array(lons)
+
+        scalar = [haversine_km(CENTER[0], CENTER[1], la, lo) for la, lo in zip(lats, lons)]
+        vectorized = haversine_km_many(CENTER[0], CENTER[1], lats_array, lons_array)
+        assert np.allclose(scalar, vectorized, atol=1e-9), "kernels disagree"
+
+        scalar_ms = _best_of(repeat, lambda: [haversine_km(CENTER[0], CENTER[1], la, lo) for la, lo in zip(lats, lons)])
+        numpy_ms = _best_of(repeat, lambda: haversine_km_many(CENTER[0], CENTER[1], lats_array, lons_array))
+        print(f"{size:>8}  {scalar_ms:>10.2f}  {numpy_ms:>9.2f}  {scalar_ms / numpy_ms:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scalar vs vectorized haversine")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", default="10000,50000,100000")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
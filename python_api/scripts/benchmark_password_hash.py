@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Password Hash Benchmark
+Measures what each candidate hashing setting costs on this machine, so BCRYPT_ROUNDS
+(or the argon2 parameters) can be chosen against a login CPU budget instead of
+guessed. Run it on the production host:
+
+    python scripts/benchmark_password_hash.py [--rounds 10,11,12,13] [--iterations 5] [--target-ms 250]
+    python scripts/benchmark_password_hash.py --scheme argon2 --memory-kb 19456,65536 --time-cost 2,3
+
+For every setting it prints the median/max hash and verify time and how many logins
+per second one core sustains, and marks the slowest setting still within --target-ms
+(a single verification). The currently configured policy is marked with "*".
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+PASSWORD = "benchmark-Password-123"
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def _time_ms(func, iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def benchmark(policy: dict, iterations: int) -> dict:
+    from app.core.crypto import build_password_context
+
+    context = build_password_context(policy)
+    password_hash = context.hash(PASSWORD)
+    hash_ms = _time_ms(lambda: context.hash(PASSWORD), iterations)
+    verify_ms = _time_ms(lambda: context.verify(PASSWORD, password_hash), iterations)
+    return {
+        "hash_ms": statistics.median(hash_ms),
+        "verify_ms": statistics.median(verify_ms),
+        "verify_max_ms": max(verify_ms),
+        "prefix": password_hash[:30],
+    }
+
+
+def main():
+    from app.core.crypto import password_policy
+
+    current = password_policy()
+    parser = argparse.ArgumentParser(description="Benchmark password hashing settings on this machine")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--rounds", type=_int_list, default=[10, 11, 12, 13], help="bcrypt cost factors")
+    parser.add_argument("--memory-kb", type=_int_list, default=[19456, 65536], help="argon2 memory (KiB)")
+    parser.add_argument("--time-cost", type=_int_list, default=[2, 3], help="argon2 iterations")
+    parser.add_argument("--parallelism", type=int, default=current["argon2_parallelism"])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=250, help="Budget for one verification")
+    args = parser.parse_args()
+
+    if args.scheme == "argon2":
+        from passlib.hash import argon2
+        if not argon2.has_backend():
+            print("❌ argon2 needs argon2-cffi: pip install argon2-cffi")
+            sys.exit(1)
+        candidates = [
+            {"scheme": "argon2", "argon2_memory_kb": memory_kb, "argon2_time_cost": time_cost,
+             "argon2_parallelism": args.parallelism}
+            for memory_kb in args.memory_kb for time_cost in args.time_cost
+        ]
+    else:
+        candidates = [{"scheme": "bcrypt", "bcrypt_rounds": rounds} for rounds in args.rounds]
+
+    cores = os.cpu_count() or 1
+    print(f"🔐 Password hash benchmark: {args.iterations} iterations per setting, {cores} cores")
+    print(f"   Current policy: {current}\n")
+    print(f"  {'setting':<34} {'hash':>9} {'verify':>9} {'max':>9} {'logins/s/core':>14}")
+
+    best = None
+    for policy in candidates:
+        result = benchmark(policy, args.iterations)
+        if policy["scheme"] == "argon2":
+            label = f"argon2id m={policy['argon2_memory_kb']}KiB t={policy['argon2_time_cost']} p={policy['argon2_parallelism']}"
+        else:
+            label = f"bcrypt rounds={policy['bcrypt_rounds']}"
+        is_current = all(current.get(key) == value for key, value in policy.items())
+        print(f"{'*' if is_current else ' '} {label:<34} {result['hash_ms']:8.1f}ms {result['verify_ms']:8.1f}ms "
+              f"{result['verify_max_ms']:8.1f}ms {1000 / result['verify_ms']:14.1f}")
+        if result["verify_ms"] <= args.target_ms:
+            best = (label, policy, result)
+
+    print()
+    if best:
+        label, policy, result = best
+        print(f"✅ Strongest setting within {args.target_ms:.0f}ms: {label} "
+              f"(~{1000 / result['verify_ms'] * cores:.0f} logins/s on {cores} cores)")
+        env = {key: value for key, value in policy.items() if key != "scheme"}
+        print(f"   PASSWORD_HASH_SCHEME={policy['scheme']} " + " ".join(f"{key.upper()}={value}" for key, value in env.items()))
+    else:
+        print(f"⚠️  No setting verifies within {args.target_ms:.0f}ms on this machine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pincode Gazetteer Builder
+Builds the memory-mapped pincode gazetteer (app/data/pincodes.gaz) from a CSV dump of
+the India Post "All India Pincode Directory" (data.gov.in) or a compatible file.
+
+    python scripts/build_pincode_gazetteer.py pincodes.csv [--out app/data/pincodes.gaz]
+
+Recognised columns (case-insensitive): pincode, officename, officetype, taluk/block,
+district/districtname, statename/state, regionname, divisionname, circlename,
+latitude, longitude. A pincode usually has several post offices; the head/sub
+office with coordinates is preferred.
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+COLUMN_ALIASES = {
+    "pincode": ["pincode", "pin", "pin_code"],
+    "office": ["officename", "office_name", "office", "name"],
+    "office_type": ["officetype", "office_type"],
+    "block": ["taluk", "block", "mandal", "tehsil"],
+    "district": ["district", "districtname", "district_name"],
+    "state": ["statename", "state", "state_name"],
+    "region": ["regionname", "region", "region_name"],
+    "division": ["divisionname", "division", "division_name"],
+    "circle": ["circlename", "circle", "circle_name"],
+    "latitude": ["latitude", "lat"],
+    "longitude": ["longitude", "lon", "lng"],
+}
+
+# Lower is better: head office, sub office, then branch office
+OFFICE_TYPE_RANK = {"H.O": 0, "HO": 0, "S.O": 1, "SO": 1, "B.O": 2, "BO": 2}
+
+
+def _clean(value):
+    value = (value or "").strip()
+    return "" if value.upper() in ("NA", "N/A", "NULL") else value
+
+
+def _has_coordinates(entry) -> bool:
+    try:
+        return bool(float(entry.get("latitude") or 0)) and bool(float(entry.get("longitude") or 0))
+    except ValueError:
+        return False
+
+
+def read_entries(csv_path: str):
+    """Best entry per pincode from the CSV dump."""
+    best = {}
+    with open(csv_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.DictReader(f)
+        headers = {h.strip().lower(): h for h in reader.fieldnames or []}
+        columns = {
+            field: next((headers[a] for a in aliases if a in headers), None)
+            for field, aliases in COLUMN_ALIASES.items()
+        }
+        if not columns["pincode"]:
+            raise ValueError(f"No pincode column in {csv_path} (found: {list(headers)})")
+        for row in reader:
+            entry = {field: _clean(row.get(column)) for field, column in columns.items() if column}
+            pincode = entry.get("pincode", "")
+            if len(pincode) != 6 or not pincode.isdigit():
+                continue
+            # Office names in the dump carry a type suffix, e.g. "Ameerpet S.O"
+            office = entry.get("office", "")
+            for suffix in (" H.O", " S.O", " B.O"):
+                if office.endswith(suffix):
+                    entry["office"] = office[: -len(suffix)]
+            rank = (0 if _has_coordinates(entry) else 1, OFFICE_TYPE_RANK.get(entry.get("office_type", "").upper(), 3))
+            if pincode not in best or rank < best[pincode][0]:
+                best[pincode] = (rank, entry)
+    return [entry for _, entry in best.values()]
+
+
+def main():
+    from app.services.pincode_gazetteer import DEFAULT_GAZETTEER_PATH, build_gazetteer
+
+    parser = argparse.ArgumentParser(description="Build the binary pincode gazetteer from a CSV dump")
+    parser.add_argument("csv_path")
+    parser.add_argument("--out", default=str(DEFAULT_GAZETTEER_PATH))
+    args = parser.parse_args()
+
+    start = time.time()
+    print(f"📖 Reading {args.csv_path}...")
+    entries = read_entries(args.csv_path)
+    count = build_gazetteer(entries, args.out)
+    size_kb = Path(args.out).stat().st_size / 1024
+    print(f"✅ Wrote {count} pincodes to {args.out} ({size_kb:.0f} KB) in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
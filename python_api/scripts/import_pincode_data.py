@@ -7,8 +7,6 @@ Imports comprehensive Indian pincode data from reliable sources and stores in da
 import asyncio
 import sys
 import os
-import requests
-import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import csv
@@ -24,40 +22,56 @@ async def import_pincode_from_api(pincode: str, db) -> Optional[Dict]:
     Import pincode data from api.postalpincode.in (free, reliable Indian postal API)
     """
     try:
+        # Offline gazetteer first - no network call when it has the pincode
+        from app.services.pincode_gazetteer import pincode_gazetteer
+        if not pincode_gazetteer.loaded:
+            pincode_gazetteer.load()
+        record = pincode_gazetteer.lookup(pincode)
+        if record:
+            post_office = pincode_gazetteer.as_post_office(record)
+            coordinates = pincode_gazetteer.coordinates(pincode) or await get_coordinates_for_pincode(pincode, post_office)
+            print(f"  📚 Gazetteer hit for pincode: {pincode}")
+            return {
+                'pincode': pincode,
+                'city': post_office.get('Name', ''),
+                'district': post_office.get('District', ''),
+                'state': post_office.get('State', ''),
+                'country': post_office.get('Country', 'India'),
+                'region': post_office.get('Region', ''),
+                'division': post_office.get('Division', ''),
+                'circle': post_office.get('Circle', ''),
+                'block': post_office.get('Block', ''),
+                'latitude': coordinates[0] if coordinates else None,
+                'longitude': coordinates[1] if coordinates else None
+            }
+        
         print(f"  📍 Fetching data for pincode: {pincode}")
         
-        response = requests.get(
-            f"https://api.postalpincode.in/pincode/{pincode}",
-            timeout=15,
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        )
+        # Shared postal lookup: cached, and paced by the geocode scheduler
+        from app.services.location_service import LocationService
+        post_office = await LocationService._fetch_postal_data(pincode)
         
-        if response.status_code == 200:
-            data = response.json()
+        if post_office:
+            # Get coordinates using Google Maps or fallback
+            coordinates = await get_coordinates_for_pincode(pincode, post_office)
             
-            if data and len(data) > 0 and data[0].get('Status') == 'Success':
-                post_office = data[0]['PostOffice'][0]
-                
-                # Get coordinates using Google Maps or fallback
-                coordinates = await get_coordinates_for_pincode(pincode, post_office)
-                
-                pincode_data = {
-                    'pincode': pincode,
-                    'city': post_office.get('Name', ''),
-                    'district': post_office.get('District', ''),
-                    'state': post_office.get('State', ''),
-                    'country': post_office.get('Country', 'India'),
-                    'region': post_office.get('Region', ''),
-                    'division': post_office.get('Division', ''),
-                    'circle': post_office.get('Circle', ''),
-                    'block': post_office.get('Block', ''),
-                    'latitude': coordinates[0] if coordinates else None,
-                    'longitude': coordinates[1] if coordinates else None
-                }
-                
-                return pincode_data
+            pincode_data = {
+                'pincode': pincode,
+                'city': post_office.get('Name', ''),
+                'district': post_office.get('District', ''),
+                'state': post_office.get('State', ''),
+                'country': post_office.get('Country', 'India'),
+                'region': post_office.get('Region', ''),
+                'division': post_office.get('Division', ''),
+                'circle': post_office.get('Circle', ''),
+                'block': post_office.get('Block', ''),
+                'latitude': coordinates[0] if coordinates else None,
+                'longitude': coordinates[1] if coordinates else None
+            }
+            
+            return pincode_data
         else:
-            print(f"  ⚠️ API returned status {response.status_code} for pincode {pincode}")
+            print(f"  ⚠️ No postal data for pincode {pincode}")
             return None
             
     except Exception as e:
@@ -72,7 +86,7 @@ async def get_coordinates_for_pincode(pincode: str, post_office: Dict) -> Option
         # Try Google Maps first if available
         from app.services.google_maps_service import GoogleMapsService
         
-        google_data = GoogleMapsService.geocode_from_pincode(pincode)
+        google_data = await GoogleMapsService.geocode_from_pincode(pincode)
         if google_data and google_data.get("latitude") and google_data.get("longitude"):
             return (float(google_data["latitude"]), float(google_data["longitude"]))
     except Exception as e:
@@ -84,22 +98,9 @@ async def get_coordinates_for_pincode(pincode: str, post_office: Dict) -> Option
         state = post_office.get('State', '')
         
         if city and state:
-            query = f"{city}, {state}, India"
-            response = requests.get(
-                f"https://nominatim.openstreetmap.org/search",
-                params={
-                    'q': query,
-                    'format': 'json',
-                    'limit': 1
-                },
-                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    return (float(data[0]['lat']), float(data[0]['lon']))
+            # Nominatim allows 1 request/second; the shared lookup is cached and rate limited
+            from app.services.location_service import LocationService
+            return await LocationService._get_coordinates_from_city_state(city, state)
     except Exception as e:
         print(f"    ⚠️ Fallback geocoding failed: {e}")
     
@@ -107,8 +108,15 @@ async def get_coordinates_for_pincode(pincode: str, post_office: Dict) -> Option
 
 async def import_pincodes_from_list(pincodes: List[str], db, batch_size: int = 50):
     """
-    Import multiple pincodes from a list
+    Import multiple pincodes from a list.
+    Provider pacing is left to the geocode scheduler; this runs at backfill priority so
+    interactive lookups served by the same process are never starved.
     """
+    from app.services.geocode_scheduler import geocode_priority, BACKFILL
+    with geocode_priority(BACKFILL):
+        await _import_pincodes(pincodes, db, batch_size)
+
+async def _import_pincodes(pincodes: List[str], db, batch_size: int):
     total = len(pincodes)
     imported = 0
     failed = 0
@@ -138,12 +146,8 @@ async def import_pincodes_from_list(pincodes: List[str], db, batch_size: int = 5
                 failed += 1
                 print(f"  ❌ [{i}/{total}] Failed to import pincode {pincode}")
             
-            # Rate limiting - be nice to the API
             if i % batch_size == 0:
-                print(f"\n⏸️  Pausing for 2 seconds after {i} pincodes...\n")
-                await asyncio.sleep(2)
-            else:
-                await asyncio.sleep(0.5)  # Small delay between requests
+                print(f"\n📦 Processed {i}/{total} pincodes\n")
                 
         except Exception as e:
             failed += 1
@@ -335,6 +339,10 @@ async def main():
         print(f"\n❌ Import failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Geocode answers are written to the cache table in the background
+        from app.services.geocode_cache import geocode_cache
+        await geocode_cache.flush()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Login Load Test
+Measures login throughput and how a login burst affects the latency of an unrelated
+endpoint served by the same worker.
+
+Against a running server (run it with a single worker to see the per-worker effect):
+
+    python scripts/load_test_login.py --base-url http://localhost:8000 \\
+        --email buyer@example.com --password secret [--concurrency 20] [--duration 20] [--probe-path /api]
+
+The probe endpoint is first timed alone, then again while `concurrency` clients log in
+back to back. Without the CPU pool every login blocks the event loop for two bcrypt
+rounds (~0.5s), so probe latency climbs with the login rate.
+
+Without a server, --local runs the same comparison in-process: bcrypt verifications
+inline on the event loop versus through app.core.cpu_pool, with a probe coroutine
+measuring event-loop delay:
+
+    python scripts/load_test_login.py --local [--concurrency 8] [--requests 32]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+PROBE_INTERVAL = 0.05
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def _summary(label: str, samples: List[float]) -> str:
+    if not samples:
+        return f"{label:<28} no samples"
+    return (f"{label:<28} n={len(samples):<5} p50={_percentile(samples, 50):7.1f}ms  "
+            f"p95={_percentile(samples, 95):7.1f}ms  p99={_percentile(samples, 99):7.1f}ms  "
+            f"max={max(samples):7.1f}ms")
+
+
+# ---- against a running server ----
+
+async def _probe(client, path: str, stop: asyncio.Event, samples: List[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(path)
+            samples.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"  ⚠️  Probe failed: {e}")
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def _login_loop(client, email: str, password: str, stop: asyncio.Event, samples: List[float], statuses: dict) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/auth/login", json={"email": email, "password": password})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            samples.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+
+
+async def run_remote(args) -> None:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30, limits=limits) as client:
+        print(f"🔍 Baseline: probing {args.probe_path} alone for {args.duration}s")
+        stop = asyncio.Event()
+        baseline: List[float] = []
+        probe = asyncio.create_task(_probe(client, args.probe_path, stop, baseline))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await probe
+
+        print(f"🔐 Load: {args.concurrency} clients logging in for {args.duration}s while probing")
+        stop = asyncio.Event()
+        under_load: List[float] = []
+        login_ms: List[float] = []
+        statuses: dict = {}
+        tasks = [asyncio.create_task(_probe(client, args.probe_path, stop, under_load))]
+        tasks += [asyncio.create_task(_login_loop(client, args.email, args.password, stop, login_ms, statuses))
+                  for _ in range(args.concurrency)]
+        start = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    print()
+    print(f"Logins: {len(login_ms)} in {elapsed:.1f}s = {len(login_ms) / elapsed:.1f}/s, status codes {statuses}")
+    print(_summary("login latency", login_ms))
+    print(_summary(f"{args.probe_path} baseline", baseline))
+    print(_summary(f"{args.probe_path} during logins", under_load))
+
+
+# ---- in-process comparison ----
+
+async def _loop_lag(stop: asyncio.Event, samples: List[float]) -> None:
+    """How late a short sleep wakes up: time the event loop was busy with something else"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, (time.perf_counter() - start - PROBE_INTERVAL) * 1000))
+
+
+async def _run_local_case(label: str, verify, concurrency: int, requests: int) -> None:
+    stop = asyncio.Event()
+    lag: List[float] = []
+    probe = asyncio.create_task(_loop_lag(stop, lag))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            await verify()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    print(f"{label}: {requests} verifications in {elapsed:.2f}s = {requests / elapsed:.1f}/s")
+    print("  " + _summary("event loop delay", lag))
+
+
+async def run_local(args) -> None:
+    from app.core.crypto import get_password_hash, verify_password, verify_password_async
+    from app.core.cpu_pool import cpu_executor
+
+    password_hash = get_password_hash("load-test-password")
+    await cpu_executor.warm_up()
+    # First call in each worker loads the bcrypt backend
+    await asyncio.gather(*(verify_password_async("load-test-password", password_hash) for _ in range(cpu_executor.workers)))
+
+    async def inline():
+        verify_password("load-test-password", password_hash)
+
+    async def pooled():
+        await verify_password_async("load-test-password", password_hash)
+
+    print(f"⚙️  {args.requests} bcrypt verifications, {args.concurrency} at a time\n")
+    await _run_local_case("Inline on the event loop", inline, args.concurrency, args.requests)
+    await _run_local_case(f"CPU pool ({cpu_executor.workers} workers)", pooled, args.concurrency, args.requests)
+    cpu_executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput and event-loop latency load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--probe-path", default="/api")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--local", action="store_true", help="Compare inline vs pooled bcrypt without a server")
+    parser.add_argument("--requests", type=int, default=32, help="Verifications per case with --local")
+    args = parser.parse_args()
+
+    if args.local:
+        asyncio.run(run_local(args))
+    elif not args.email or not args.password:
+        parser.error("--email and --password are required (or use --local)")
+    else:
+        asyncio.run(run_remote(args))
+
+
+if __name__ == "__main__":
+    main()
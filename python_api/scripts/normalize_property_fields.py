@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Property Normalization Migration
+One-time backfill that rewrites array fields (images, amenities, room_images,
+gated_community_features) in canonical list form and stores formatted_pricing
+for properties written before write-time normalization.
+
+Run after applying supabase/migrations/20261018_add_property_formatted_pricing.sql:
+    python scripts/normalize_property_fields.py [--dry-run]
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the app directory to Python path
+current_dir = Path(__file__).resolve().parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+PAGE_SIZE = 200
+
+
+async def normalize_properties(db, dry_run: bool = False) -> dict:
+    """Normalize every property row page by page; only changed rows are written."""
+    from app.routes.properties import PROPERTY_ARRAY_FIELDS, _normalize_property_fields, _format_property_pricing
+
+    stats = {"scanned": 0, "updated": 0, "failed": 0}
+    offset = 0
+    while True:
+        rows = await db.select("properties", order_by="created_at", limit=PAGE_SIZE, offset=offset)
+        if not rows:
+            break
+        for row in rows:
+            stats["scanned"] += 1
+            original = dict(row)
+            normalized = _normalize_property_fields(dict(row), set(PROPERTY_ARRAY_FIELDS), fill_missing=True)
+            changes = {field: normalized[field] for field in PROPERTY_ARRAY_FIELDS if original.get(field) != normalized[field]}
+            pricing = _format_property_pricing(normalized)
+            if original.get("formatted_pricing") != pricing:
+                changes["formatted_pricing"] = pricing
+            if not changes:
+                continue
+            if dry_run:
+                print(f"  🔎 {row.get('id')}: would update {sorted(changes)}")
+                stats["updated"] += 1
+                continue
+            try:
+                await db.update("properties", changes, {"id": row.get("id")})
+                stats["updated"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"  ❌ {row.get('id')}: {e}")
+        print(f"  📦 Processed {stats['scanned']} properties ({stats['updated']} updated)")
+        if len(rows) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return stats
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv
+    print("🏠 Property normalization migration" + (" (dry run)" if dry_run else ""))
+    try:
+        from app.db.supabase_client import db
+        stats = await normalize_properties(db, dry_run=dry_run)
+        print(f"\n✅ Done: scanned={stats['scanned']}, updated={stats['updated']}, failed={stats['failed']}")
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,3 +5,26 @@ import pytest
 def api_key_header():
     key = os.getenv("PYTHON_API_KEY", "test")
     return {"X-API-Key": key}
+
+
+@pytest.fixture
+def postgrest_requests(monkeypatch):
+    """
+    Run db.select through the real PostgREST query builder without a network call.
+    Records (table, params) for every executed select; set .respond(table, params) to
+    return rows (default: none).
+    """
+    from types import SimpleNamespace
+    from postgrest._sync.request_builder import SyncQueryRequestBuilder
+
+    recorder = SimpleNamespace(calls=[], respond=lambda table, params: [])
+
+    def execute(self):
+        table = str(self.request.path).rstrip("/").rsplit("/", 1)[-1]
+        params = dict(self.request.params)
+        recorder.calls.append((table, params))
+        rows = recorder.respond(table, params)
+        return SimpleNamespace(data=rows, count=len(rows))
+
+    monkeypatch.setattr(SyncQueryRequestBuilder, "execute", execute)
+    return recorder
@@ -0,0 +1,29 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_nearby_agents_are_ranked_by_pincode_distance(postgrest_requests):
+    """Test that agents come back nearest first, using one IN query for the pincode centroids."""
+    from app.services.agent_assignment import AgentAssignmentService
+
+    agents = [
+        {"id": "far", "zip_code": "560001"},      # Bengaluru
+        {"id": "near", "zip_code": "500016"},     # Begumpet
+        {"id": "nearest", "zip_code": "500001"},  # Hyderabad GPO
+    ]
+    centroids = {"500001": (17.3850, 78.4867), "500016": (17.4440, 78.4630), "560001": (12.9716, 77.5946)}
+
+    def respond(table, params):
+        if table == "users":
+            return agents
+        if table == "pincodes":
+            pincodes = params["pincode"][4:-1].split(",")
+            return [{"pincode": p, "latitude": centroids[p][0], "longitude": centroids[p][1]}
+                    for p in pincodes if p in centroids]
+        return []
+
+    postgrest_requests.respond = respond
+    ranked = await AgentAssignmentService._get_agents_by_nearby_pincodes("500001", limit=2)
+    assert [agent["id"] for agent in ranked] == ["nearest", "near"]
+    assert ranked[0]["distance_km"] == 0.0
+    assert ranked[1]["distance_km"] > 0
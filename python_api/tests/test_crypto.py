@@ -0,0 +1,61 @@
+import pytest
+
+
+def test_password_rehash_when_policy_changes():
+    """Test that hashes from an older work factor verify and are flagged for replacement."""
+    from app.core.crypto import build_password_context
+
+    old_context = build_password_context({"scheme": "bcrypt", "bcrypt_rounds": 4})
+    new_context = build_password_context({"scheme": "bcrypt", "bcrypt_rounds": 5})
+    old_hash = old_context.hash("secret")
+
+    ok, new_hash = new_context.verify_and_update("secret", old_hash)
+    assert ok and new_hash.startswith("$2b$05$")
+    # Wrong password: no replacement hash
+    assert new_context.verify_and_update("wrong", old_hash) == (False, None)
+    # Up to date: nothing to replace
+    assert new_context.verify_and_update("secret", new_hash) == (True, None)
+
+
+def test_revoked_access_token_is_rejected(monkeypatch):
+    """Test that a token whose jti is revoked fails verification, even from the verified cache."""
+    from app.core import crypto
+    from app.core.token_revocation import TokenRevocationList
+
+    revocations = TokenRevocationList()
+    monkeypatch.setattr(crypto, "revocation_list", revocations)
+    token = crypto.issue_user_token("user-1", "buyer")
+    other = crypto.issue_user_token("user-1", "buyer")
+    claims = crypto.verify_user_token(token)
+    assert claims and claims["jti"] and crypto.verify_user_token(other)
+
+    revocations.add_local(claims["jti"], claims["exp"])
+    assert crypto.verify_user_token(token) is None
+    # Other sessions of the same user stay valid
+    assert crypto.verify_user_token(other)["sub"] == "user-1"
+
+
+@pytest.mark.asyncio
+async def test_revocation_first_load_is_retried_after_a_failed_read(postgrest_requests):
+    """Test that a failed first sync leaves the cursor unset, so existing revocations still load."""
+    import datetime as dt
+    from app.core.token_revocation import TokenRevocationList
+
+    revocations = TokenRevocationList()
+    now = dt.datetime.now(dt.timezone.utc)
+
+    def fail(table, params):
+        raise RuntimeError("statement timeout")
+
+    postgrest_requests.respond = fail
+    with pytest.raises(RuntimeError):
+        await revocations.sync()
+    assert revocations._cursor is None
+
+    postgrest_requests.respond = lambda table, params: [{
+        "jti": "revoked-jti",
+        "expires_at": (now + dt.timedelta(minutes=10)).isoformat(),
+        "revoked_at": (now - dt.timedelta(minutes=5)).isoformat(),
+    }] if "expires_at" in params else []
+    assert await revocations.sync() == 1
+    assert revocations.is_revoked("revoked-jti")
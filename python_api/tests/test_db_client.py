@@ -0,0 +1,55 @@
+import pytest
+
+
+def _in_values(param):
+    """Values of a PostgREST in.(a,b) filter"""
+    assert param.startswith("in.(") and param.endswith(")"), param
+    return param[4:-1].split(",")
+
+
+@pytest.mark.asyncio
+async def test_select_in_filter_uses_postgrest_list_syntax(postgrest_requests):
+    """Test that list and {"in": [...]} filters render as in.(a,b), not a Python list repr."""
+    from app.db.supabase_client import db
+
+    await db.select("users", filters={"id": ["u1", "u2"]})
+    await db.select("users", filters={"id": {"in": ["u3", "u4"]}, "status": "active"})
+    await db.select("users", filters={"or": [{"agent_id": "a1"}], "id": {"in": ["u5"]}})
+    params = [params for _, params in postgrest_requests.calls]
+    assert _in_values(params[0]["id"]) == ["u1", "u2"]
+    assert _in_values(params[1]["id"]) == ["u3", "u4"]
+    assert params[1]["status"] == "eq.active"
+    assert _in_values(params[2]["id"]) == ["u5"]
+
+
+@pytest.mark.asyncio
+async def test_property_enrichment_batches_return_rows(postgrest_requests):
+    """Test that owner/agent and document-image enrichment get rows back for several ids."""
+    from app.routes.properties import _fetch_users_by_ids, _fetch_document_images
+
+    def respond(table, params):
+        ids = _in_values(params.get("id") or params.get("entity_id"))
+        if table == "users":
+            return [{"id": user_id, "first_name": user_id.upper()} for user_id in ids]
+        return [{"entity_id": property_id, "file_type": "image/jpeg", "url": f"https://cdn/{property_id}.jpg"}
+                for property_id in ids]
+
+    postgrest_requests.respond = respond
+    users = await _fetch_users_by_ids(["u1", "u2", "u1"])
+    assert sorted(users) == ["u1", "u2"]
+    images = await _fetch_document_images(["p1", "p2"])
+    assert images == {"p1": ["https://cdn/p1.jpg"], "p2": ["https://cdn/p2.jpg"]}
+
+
+@pytest.mark.asyncio
+async def test_select_raise_errors_distinguishes_failures(postgrest_requests):
+    """Test that a failed read is [] by default and raises when the caller asks to know."""
+    from app.db.supabase_client import db
+
+    def fail(table, params):
+        raise RuntimeError("connection reset")
+
+    postgrest_requests.respond = fail
+    assert await db.select("users", filters={"id": "u1"}) == []
+    with pytest.raises(RuntimeError):
+        await db.select("users", filters={"id": "u1"}, raise_errors=True)
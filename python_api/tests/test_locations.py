@@ -0,0 +1,434 @@
+"""
+Tests for location search functionality (nearby properties).
+"""
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.spatial_index import PropertySpatialIndex
+
+
+def test_spatial_index_radius_query_is_distance_sorted():
+    """Test that the grid index returns only properties inside the radius, nearest first."""
+    index = PropertySpatialIndex()
+    index.upsert("near", 17.3850, 78.4867)
+    index.upsert("farther", 17.4400, 78.3489)
+    index.upsert("outside", 18.5204, 73.8567)
+
+    matches = index.within_radius(17.3850, 78.4867, 20.0)
+    assert [property_id for property_id, _ in matches] == ["near", "farther"]
+
+    index.sync_property({"id": "near", "status": "inactive", "latitude": 17.3850, "longitude": 78.4867})
+    assert [property_id for property_id, _ in index.within_radius(17.3850, 78.4867, 20.0)] == ["farther"]
+
+
+@pytest.mark.asyncio
+async def test_spatial_index_follows_property_writes(monkeypatch):
+    """Test that any write to a property re-reads it, updating attributes and the tile version."""
+    import asyncio
+    from app.services import spatial_index
+
+    row = {"id": "p1", "status": "active", "latitude": 17.385, "longitude": 78.4867, "price": 5000000, "featured": False}
+
+    async def fake_select(table, columns="*", filters=None, **kwargs):
+        return [dict(row)]
+
+    monkeypatch.setattr(spatial_index.db, "select", fake_select)
+    index = PropertySpatialIndex()
+    index.sync_property(row)
+    index._built_at = spatial_index.time.time()
+    version = index.version
+
+    row.update(price=4500000, featured=True)
+    index.on_property_write({"id": "p1"})
+    await asyncio.gather(*index._refresh_tasks)
+    attributes = index.within_bbox(17.0, 78.0, 18.0, 79.0)[0][3]
+    assert (attributes["price"], attributes["featured"]) == (4500000, True)
+    assert index.version > version
+
+    # Writes not keyed by id may touch any row
+    index.on_property_write({"owner_id": "u1"})
+    assert not index.is_fresh()
+
+
+@pytest.mark.asyncio
+async def test_nearby_properties_requires_center():
+    """Test that nearby search needs coordinates or a pincode."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/locations/nearby-properties")
+        assert response.status_code == 400
+
+
+def test_pincode_gazetteer_lookup(tmp_path):
+    """Test that a built gazetteer maps pincodes to location records without network access."""
+    from app.services.pincode_gazetteer import PincodeGazetteer, build_gazetteer
+
+    path = tmp_path / "pincodes.gaz"
+    count = build_gazetteer([
+        {"pincode": "500016", "office": "Begumpet", "district": "Hyderabad", "state": "Telangana",
+         "latitude": "17.4399", "longitude": "78.4983"},
+        {"pincode": "500016", "office": "Duplicate", "district": "Ignored", "state": "Ignored"},
+        {"pincode": "110001", "office": "Connaught Place", "district": "New Delhi", "state": "Delhi",
+         "latitude": "NA", "longitude": "NA"},
+    ], str(path))
+    assert count == 2
+
+    gazetteer = PincodeGazetteer()
+    assert gazetteer.load(str(path))
+    record = gazetteer.lookup("500016")
+    assert record["office"] == "Begumpet"
+    assert record["state"] == "Telangana"
+    assert gazetteer.coordinates("500016") == (17.4399, 78.4983)
+    assert gazetteer.lookup("110001")["latitude"] is None
+    assert gazetteer.coordinates("110001") is None
+    assert gazetteer.lookup("999999") is None
+    assert gazetteer.lookup("abc") is None
+    gazetteer.close()
+
+
+def test_pincode_kdtree_nearest(tmp_path):
+    """Test that a map pin resolves to the nearest gazetteer pincode, and far pins to nothing."""
+    from app.services.pincode_gazetteer import PincodeGazetteer, build_gazetteer
+    from app.services.pincode_kdtree import PincodeKDTree
+
+    path = tmp_path / "pincodes.gaz"
+    build_gazetteer([
+        {"pincode": "500016", "office": "Begumpet", "district": "Hyderabad", "state": "Telangana",
+         "latitude": "17.4399", "longitude": "78.4983"},
+        {"pincode": "500034", "office": "Banjara Hills", "district": "Hyderabad", "state": "Telangana",
+         "latitude": "17.4156", "longitude": "78.4347"},
+        {"pincode": "560001", "office": "Bangalore GPO", "district": "Bangalore", "state": "Karnataka",
+         "latitude": "12.9767", "longitude": "77.5713"},
+        {"pincode": "110001", "office": "Connaught Place", "district": "New Delhi", "state": "Delhi"},
+    ] + [
+        # Enough points to split the tree a few levels deep
+        {"pincode": str(600000 + i), "office": f"Office {i}", "district": "Chennai", "state": "Tamil Nadu",
+         "latitude": 13.0 + i * 0.01, "longitude": 80.2 + (i % 7) * 0.01}
+        for i in range(40)
+    ], str(path))
+    gazetteer = PincodeGazetteer()
+    assert gazetteer.load(str(path))
+
+    tree = PincodeKDTree(gazetteer)
+    match = tree.nearest_pincode(17.42, 78.44)
+    assert match["pincode"] == "500034"
+    assert match["office"] == "Banjara Hills"
+    assert match["distance_km"] < 1
+    assert [m["pincode"] for m in tree.nearest(17.43, 78.48, k=2)] == ["500016", "500034"]
+    # Pincodes without coordinates are not indexed; the Arabian Sea is too far from any pincode
+    assert len(tree) == 43
+    assert tree.nearest_pincode(15.0, 65.0) is None
+    gazetteer.close()
+
+
+def test_locality_index_prefix_search_ranks_by_listings():
+    """Test that locality autocomplete matches name/word/pincode prefixes, most listings first."""
+    from app.services.locality_index import LocalityIndex
+
+    index = LocalityIndex()
+    index.build(
+        listing_rows=[
+            {"city": "Hyderabad", "mandal": "Banjara Hills", "district": "Hyderabad", "state": "Telangana", "zip_code": "500034"},
+            {"city": "Hyderabad", "mandal": "Begumpet", "district": "Hyderabad", "state": "Telangana", "zip_code": "500016"},
+            {"city": "Hyderabad", "mandal": "Begumpet", "district": "Hyderabad", "state": "Telangana", "zip_code": "500016"},
+        ],
+        gazetteer_records=[
+            {"pincode": "500001", "office": "Hyderabad GPO", "district": "Hyderabad", "state": "Telangana"},
+            {"pincode": "500016", "office": "Begumpet", "district": "Hyderabad", "state": "Telangana"},
+        ],
+    )
+
+    assert [m["name"] for m in index.search("be", types=["mandal"])] == ["Begumpet"]
+    assert index.search("hills")[0]["name"] == "Banjara Hills"
+    assert [m["name"] for m in index.search("5000")] == ["500016", "500034", "500001"]
+    assert index.search("xyz") == []
+
+
+def test_locality_index_ranks_listed_matches_beyond_the_scan_bound():
+    """Test that a short prefix still puts a well-listed place first when thousands of places match."""
+    from app.services.locality_index import LocalityIndex, MAX_SCAN
+
+    index = LocalityIndex()
+    index.build(
+        listing_rows=[{"city": "Bengaluru", "state": "Karnataka", "zip_code": "560001"}] * 5,
+        gazetteer_records=[
+            {"pincode": str(500000 + i), "office": f"Office {i}", "district": "Hyderabad", "state": "Telangana"}
+            for i in range(MAX_SCAN + 500)
+        ],
+    )
+
+    results = index.search("5", limit=3)
+    assert results[0]["name"] == "560001"
+    assert results[0]["listings"] == 5
+    assert [m["name"] for m in results[1:]] == ["500000", "500001"]
+
+
+@pytest.mark.asyncio
+async def test_geocode_cache_caches_not_found_but_not_failures():
+    """Test that a definitive miss is served from cache while provider failures are retried."""
+    from app.services.geocode_cache import GeocodeCache, GeocodeUnavailable
+
+    geocache = GeocodeCache(max_entries=2)
+    geocache._store_enabled = False
+    calls = []
+
+    async def not_found():
+        calls.append("not_found")
+        return None
+
+    async def unavailable():
+        calls.append("unavailable")
+        raise GeocodeUnavailable("timeout")
+
+    assert await geocache.get_or_fetch("pincode", "999998", not_found) is None
+    assert await geocache.get_or_fetch("pincode", " 999998 ", not_found) is None
+    assert calls == ["not_found"]
+
+    for _ in range(2):
+        with pytest.raises(GeocodeUnavailable):
+            await geocache.get_or_fetch("pincode", "500016", unavailable)
+    assert calls.count("unavailable") == 2
+
+    geocache.store("osm_reverse", (17.4399001, 78.4983), {"city": "Hyderabad"})
+    assert geocache.lookup("osm_reverse", (17.43990, 78.4983)) == (True, {"city": "Hyderabad"})
+    stats = geocache.stats()
+    assert stats["totals"]["negative_hits"] == 1
+    assert stats["totals"]["fetch_errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_geocode_cache_answers_before_the_table_write():
+    """Test that get_or_fetch returns a fresh answer while its table write is still running."""
+    import asyncio
+    import threading
+    from app.services.geocode_cache import GeocodeCache, _MISSING
+
+    geocache = GeocodeCache()
+    release, written = threading.Event(), []
+
+    def slow_store_set(kind, key, value, expires_at):
+        release.wait(5)
+        written.append(key)
+
+    geocache._store_get = lambda key: (_MISSING, 0.0)
+    geocache._store_set = slow_store_set
+
+    async def fetch():
+        return [17.4399, 78.4983]
+
+    value = await asyncio.wait_for(geocache.get_or_fetch("pincode", "500016", fetch), timeout=1)
+    assert value == [17.4399, 78.4983]
+    assert written == [] and len(geocache._persist_tasks) == 1
+    assert geocache.lookup("pincode", "500016") == (True, [17.4399, 78.4983])
+    release.set()
+    await geocache.flush()
+    assert written == ["pincode:500016"] and not geocache._persist_tasks
+
+
+@pytest.mark.asyncio
+async def test_hedged_provider_coordinates_takes_first_good_answer(monkeypatch):
+    """Test that a slow primary provider is hedged and the first provider with coordinates wins."""
+    import asyncio
+    from app.services.location_service import LocationService
+
+    async def slow_osm(pincode):
+        await asyncio.sleep(5)
+        return (1.0, 1.0)
+
+    async def postal(pincode):
+        return (17.4399, 78.4983)
+
+    async def never_called(pincode):
+        raise AssertionError("third provider should not be needed")
+
+    monkeypatch.setattr(LocationService, "HEDGE_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(LocationService, "_get_from_nominatim_async", staticmethod(slow_osm))
+    monkeypatch.setattr(LocationService, "_get_from_postalpincode", staticmethod(postal))
+    monkeypatch.setattr(LocationService, "_get_from_geocoding_api", staticmethod(never_called))
+
+    coordinates = await asyncio.wait_for(LocationService._hedged_provider_coordinates("500016"), timeout=1)
+    assert coordinates == (17.4399, 78.4983)
+
+
+@pytest.mark.asyncio
+async def test_geocode_scheduler_coalesces_and_serves_interactive_first():
+    """Test that identical requests share one call and interactive work jumps queued backfill."""
+    import asyncio
+    from app.services.geocode_scheduler import GeocodeScheduler, geocode_priority, BACKFILL
+
+    scheduler = GeocodeScheduler({"test": (20.0, 1, 1, 10)})
+    calls = []
+
+    def request(tag):
+        async def call():
+            calls.append(tag)
+            return tag
+        return call
+
+    results = await asyncio.gather(*[scheduler.submit("test", "500016", request("same")) for _ in range(3)])
+    assert results == ["same"] * 3
+    assert calls == ["same"]
+
+    async def backfill(i):
+        with geocode_priority(BACKFILL):
+            return await scheduler.submit("test", f"backfill-{i}", request(f"backfill-{i}"))
+
+    backfills = [asyncio.create_task(backfill(i)) for i in range(3)]
+    await asyncio.sleep(0)
+    await asyncio.gather(scheduler.submit("test", "form", request("form")), *backfills)
+    assert calls.index("form") < calls.index("backfill-1")
+    assert scheduler.stats()["test"]["coalesced"] == 2
+
+
+def test_geocode_buckets_are_shared_through_the_store(tmp_path):
+    """Test that schedulers sharing a store (one per worker) draw from a single provider bucket."""
+    from app.core.expiring_store import SqliteExpiringStore
+    from app.services.geocode_scheduler import TokenBucket
+
+    path = str(tmp_path / "geocode.sqlite3")
+    worker_a = TokenBucket(1.0, 2, store=SqliteExpiringStore(path), key="nominatim")
+    worker_b = TokenBucket(1.0, 2, store=SqliteExpiringStore(path), key="nominatim")
+    assert worker_a.try_acquire() == 0
+    assert worker_b.try_acquire() == 0
+    # The burst of 2 is spent across both workers
+    assert worker_a.try_acquire() > 0
+    assert worker_b.try_acquire() > 0
+
+
+@pytest.mark.asyncio
+async def test_radius_search_returns_rows_for_the_page(postgrest_requests, monkeypatch):
+    """Test that radius search loads the index and then the page rows through IN queries."""
+    from app.services import location_service
+    from app.services.location_service import LocationService
+
+    rows = {
+        "p-near": {"id": "p-near", "status": "active", "latitude": 17.3850, "longitude": 78.4867, "title": "Near"},
+        "p-far": {"id": "p-far", "status": "active", "latitude": 17.4400, "longitude": 78.3489, "title": "Far"},
+    }
+
+    def respond(table, params):
+        if table != "properties":
+            return []
+        if params.get("id", "").startswith("in."):
+            return [rows[property_id] for property_id in params["id"][4:-1].split(",") if property_id in rows]
+        return list(rows.values()) if params.get("status") == "eq.active" else []
+
+    postgrest_requests.respond = respond
+    monkeypatch.setattr(location_service, "property_spatial_index", PropertySpatialIndex())
+    result = await LocationService.search_properties_in_radius(17.3850, 78.4867, 20.0, limit=10)
+    assert result["total"] == 2
+    assert [p["id"] for p in result["properties"]] == ["p-near", "p-far"]
+
+
+@pytest.mark.asyncio
+async def test_spatial_index_failed_page_is_not_a_fresh_partial_index(postgrest_requests):
+    """Test that a page read failing mid-load keeps the previous index and retries on the next query."""
+    index = PropertySpatialIndex(page_size=1)
+    pages = {"0": [{"id": "p1", "latitude": 17.385, "longitude": 78.4867}],
+             "1": [{"id": "p2", "latitude": 17.44, "longitude": 78.3489}], "2": []}
+
+    def respond(table, params):
+        return pages[params.get("offset", "0")]
+
+    postgrest_requests.respond = respond
+    await index.ensure_loaded()
+    assert len(index) == 2
+
+    def fail_second_page(table, params):
+        if params.get("offset") == "1":
+            raise RuntimeError("statement timeout")
+        return respond(table, params)
+
+    postgrest_requests.respond = fail_second_page
+    index.invalidate()
+    await index.ensure_loaded()
+    assert len(index) == 2
+    assert not index.is_fresh()
+
+    # With no previous index a failed load raises instead of serving a partial one
+    with pytest.raises(RuntimeError):
+        await PropertySpatialIndex(page_size=1).ensure_loaded()
+
+
+@pytest.mark.asyncio
+async def test_spatial_index_write_refresh_is_incremental(postgrest_requests):
+    """Test that a property write re-reads just that row (IN query) and keeps the index fresh."""
+    import asyncio
+    from app.services import spatial_index
+
+    index = PropertySpatialIndex()
+    index.sync_property({"id": "p1", "status": "active", "latitude": 17.385, "longitude": 78.4867, "price": 100})
+    index.sync_property({"id": "p2", "status": "active", "latitude": 17.44, "longitude": 78.3489, "price": 200})
+    index._built_at = spatial_index.time.time()
+
+    postgrest_requests.respond = lambda table, params: [
+        {"id": "p1", "status": "active", "latitude": 17.385, "longitude": 78.4867, "price": 150}
+    ]
+    index.on_property_write({"id": ["p1", "p2"]})
+    await asyncio.gather(*index._refresh_tasks)
+    assert postgrest_requests.calls[-1][1]["id"] == "in.(p1,p2)"
+    assert index.is_fresh()
+    assert [entry[0] for entry in index.within_bbox(17.0, 78.0, 18.0, 79.0)] == ["p1"]
+    assert index.within_bbox(17.0, 78.0, 18.0, 79.0)[0][3]["price"] == 150
+
+    def fail(table, params):
+        raise RuntimeError("statement timeout")
+
+    postgrest_requests.respond = fail
+    index.on_property_write({"id": "p1"})
+    await asyncio.gather(*index._refresh_tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert not index.is_fresh()
+    assert len(index) == 1
+
+
+@pytest.mark.asyncio
+async def test_properties_without_coordinates_page_raises_and_stays_in_order(postgrest_requests):
+    """Test that the backfill page fetch merges both null queries in id order and raises on a failed read."""
+    from app.services.location_service import LocationService
+
+    missing = {"latitude": ["p1", "p3", "p5"], "longitude": ["p2", "p3", "p4"]}
+
+    def respond(table, params):
+        column = "latitude" if "latitude" in params else "longitude"
+        ids = [i for i in missing[column] if i > params.get("id", "gt.")[3:]]
+        return [{"id": i} for i in ids[:int(params["limit"])]]
+
+    postgrest_requests.respond = respond
+    page = await LocationService.get_properties_without_coordinates(limit=2)
+    assert [row["id"] for row in page] == ["p1", "p2"]
+    page = await LocationService.get_properties_without_coordinates(limit=2, after_id="p2")
+    assert [row["id"] for row in page] == ["p3", "p4"]
+
+    def fail(table, params):
+        raise RuntimeError("statement timeout")
+
+    postgrest_requests.respond = fail
+    with pytest.raises(RuntimeError):
+        await LocationService.get_properties_without_coordinates(limit=2, after_id="p4")
+
+
+@pytest.mark.asyncio
+async def test_place_autocomplete_uses_the_async_geo_client(monkeypatch):
+    """Test that /places/autocomplete awaits Google Places through the shared async client."""
+    import asyncio
+    import httpx
+    from app.services import geo_http
+    from app.services.google_maps_service import settings
+
+    def handler(request):
+        assert request.url.path == "/maps/api/place/autocomplete/json"
+        assert request.url.params["input"] == "Madhapur"
+        return httpx.Response(200, json={"status": "OK", "predictions": [
+            {"place_id": "place-1", "description": "Madhapur, Hyderabad", "structured_formatting": {}}
+        ]})
+
+    monkeypatch.setattr(settings, "GOOGLE_MAPS_API_KEY", "test-key", raising=False)
+    geo_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(geo_http, "_client", geo_client)
+    monkeypatch.setattr(geo_http, "_client_loop", asyncio.get_running_loop())
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/properties/places/autocomplete", params={"input_text": "Madhapur"})
+    assert response.status_code == 200
+    assert response.json()["suggestions"][0]["place_id"] == "place-1"
+    await geo_client.aclose()
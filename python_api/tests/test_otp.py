@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_otp_store_verify_and_consume(tmp_path, monkeypatch):
+    """Test that OTPs verify once across store instances, lock after repeated guesses, and expire."""
+    from app.core.expiring_store import MemoryExpiringStore, SqliteExpiringStore
+    from app.services import otp_service
+
+    path = str(tmp_path / "otp.sqlite3")
+    # Two stores on one file stand in for two gunicorn workers
+    worker_a, worker_b = SqliteExpiringStore(path), SqliteExpiringStore(path)
+    monkeypatch.setattr(otp_service, "otp_store", worker_a)
+    now = otp_service.dt.datetime.utcnow()
+    await otp_service._store_otp("+911234567890:verification", "123456", now, now)
+    monkeypatch.setattr(otp_service, "otp_store", worker_b)
+    assert not await otp_service.verify_otp_simple("+911234567890", "000000")
+    assert await otp_service.verify_otp_simple("+911234567890", "123456")
+    # Consumed: a replay fails on either worker
+    assert not await otp_service.verify_otp_simple("+911234567890", "123456")
+    monkeypatch.setattr(otp_service, "otp_store", worker_a)
+    assert not await otp_service.verify_otp_simple("+911234567890", "123456")
+
+    await otp_service._store_otp("email:user@example.com:login", "654321", now, now)
+    for _ in range(otp_service.MAX_OTP_ATTEMPTS):
+        assert await otp_service._consume_otp("email:user@example.com:login", "111111") in ("invalid", "locked")
+    # Locked out: even the right code no longer works
+    assert await otp_service._consume_otp("email:user@example.com:login", "654321") == "missing"
+
+    store = MemoryExpiringStore(max_entries=2, tick=0.01, slots=8)
+    store.set("a", {"v": 1}, ttl=0.02)
+    store.set("b", {"v": 2}, ttl=60)
+    store.set("c", {"v": 3}, ttl=60)
+    # Bounded: the oldest entry made room for the newest
+    assert store.get("a") is None and store.get("c") == {"v": 3}
+    store.delete("b")
+    store.set("d", {"v": 4}, ttl=0.02)
+    time.sleep(0.05)
+    # The timer wheel drops the expired entry without it being read
+    assert store.purge_expired() == 1
+    assert len(store) == 1
+
+
+def test_sqlite_store_file_is_private_and_required_in_production(tmp_path, monkeypatch):
+    """Test that store files are created 0600 and production refuses the temp-dir default."""
+    import os
+    import stat
+    from app.core.expiring_store import SqliteExpiringStore, create_expiring_store
+
+    path = tmp_path / "data" / "otp.sqlite3"
+    store = create_expiring_store("otp", backend="sqlite", path=str(path))
+    assert isinstance(store, SqliteExpiringStore)
+    store.set("k", {"v": 1}, ttl=60)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    monkeypatch.setenv("ENVIRONMENT", "production")
+    monkeypatch.delenv("OTP_STORE_PATH", raising=False)
+    monkeypatch.delenv("OTP_STORE_BACKEND", raising=False)
+    with pytest.raises(RuntimeError):
+        create_expiring_store("otp", require_path=True)
+    monkeypatch.setenv("OTP_STORE_PATH", str(path))
+    assert isinstance(create_expiring_store("otp", require_path=True), SqliteExpiringStore)
@@ -233,3 +233,71 @@ async def test_toggle_featured_property():
         data = response.json()
         assert data["success"] is True
         assert data["featured"] is False
+
+
+@pytest.mark.asyncio
+async def test_batch_properties_requires_ids():
+    """Test that the batch endpoint rejects missing or oversized id lists."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/properties/batch", json={"ids": []})
+        assert response.status_code == 400
+
+        too_many = [str(uuid.uuid4()) for _ in range(51)]
+        response = await client.post("/api/properties/batch", json={"ids": too_many})
+        assert response.status_code == 400
+
+        response = await client.post("/api/properties/batch", json={"ids": [123, {"id": "x"}]})
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_properties_returns_rows_by_id(postgrest_requests):
+    """Test that UUID keys are loaded with one IN query and returned in the requested order."""
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+
+    def respond(table, params):
+        if table == "properties" and params.get("id", "").startswith("in."):
+            ids = params["id"][4:-1].split(",")
+            return [{"id": property_id, "title": f"Home {property_id[:4]}", "status": "active"} for property_id in ids]
+        return []
+
+    postgrest_requests.respond = respond
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/properties/batch", json={"ids": [second, first.upper()]})
+        assert response.status_code == 200
+        data = response.json()
+        assert [p["id"] for p in data["properties"]] == [second, first]
+        assert data["errors"] == []
+
+
+@pytest.mark.asyncio
+async def test_batch_properties_reports_missing():
+    """Test that unknown ids are reported as errors without failing the batch."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        missing_id = str(uuid.uuid4())
+        response = await client.post("/api/properties/batch", json={"ids": [missing_id]})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["properties"] == []
+        assert data["errors"][0]["id"] == missing_id
+        assert data["errors"][0]["status"] == 404
+
+
+@pytest.mark.asyncio
+async def test_properties_rejects_unknown_fields():
+    """Test that ?fields= only accepts known property fields and presets."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/properties", params={"fields": "title,bogus"})
+        assert response.status_code == 400
+        assert "bogus" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_properties_map_validates_viewport():
+    """Test that the map endpoint rejects malformed or oversized viewports."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/properties/map", params={"bbox": "not-a-bbox", "zoom": 10})
+        assert response.status_code == 400
+
+        response = await client.get("/api/properties/map", params={"bbox": "-180,-80,180,80", "zoom": 18})
+        assert response.status_code == 400
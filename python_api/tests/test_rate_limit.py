@@ -0,0 +1,63 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_per_identifier(tmp_path):
+    """Test that an identifier's bucket empties, others are unaffected, and tokens refill."""
+    from app.core.expiring_store import SqliteExpiringStore
+    from app.core.rate_limit import RateLimiter
+
+    limiter = RateLimiter(SqliteExpiringStore(str(tmp_path / "buckets.sqlite3")),
+                          limits={"login": {"identifier": (3, 0.3), "global": (100, 1)}}, enabled=True)
+    for _ in range(3):
+        await limiter.check("login", identifier="Someone@Example.com")
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check("login", identifier="someone@example.com")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "1"
+    # Other identifiers have their own bucket
+    await limiter.check("login", identifier="other@example.com")
+    # One token comes back every 0.1s
+    time.sleep(0.15)
+    await limiter.check("login", identifier="someone@example.com")
+
+
+@pytest.mark.asyncio
+async def test_login_failures_only_limit_the_failing_client(tmp_path):
+    """Test that failed logins throttle that IP for that account, not the account owner elsewhere."""
+    from starlette.requests import Request
+    from app.core.expiring_store import SqliteExpiringStore
+    from app.core.rate_limit import RateLimiter
+
+    def request_from(ip):
+        return Request({"type": "http", "headers": [], "client": (ip, 40000)})
+
+    limiter = RateLimiter(SqliteExpiringStore(str(tmp_path / "buckets.sqlite3")),
+                          limits={"login": {"failure": (3, 900)}}, enabled=True)
+    attacker, owner = request_from("203.0.113.7"), request_from("198.51.100.2")
+    # Successful logins never drain the failure bucket
+    for _ in range(5):
+        await limiter.check("login", owner, "someone@example.com")
+    for _ in range(3):
+        await limiter.check("login", attacker, "someone@example.com")
+        await limiter.record_failure("login", attacker, "someone@example.com")
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check("login", attacker, "someone@example.com")
+    assert exc_info.value.status_code == 429
+    await limiter.check("login", owner, "someone@example.com")
+
+
+def test_client_ip_only_trusts_forwarded_for_behind_configured_proxies(monkeypatch):
+    """Test that X-Forwarded-For is ignored by default and read from the last hop when enabled."""
+    from starlette.requests import Request
+    from app.core.rate_limit import client_ip
+
+    request = Request({"type": "http", "client": ("10.0.0.5", 40000),
+                       "headers": [(b"x-forwarded-for", b"1.2.3.4, 203.0.113.7")]})
+    monkeypatch.delenv("RATE_LIMIT_PROXY_HOPS", raising=False)
+    assert client_ip(request) == "10.0.0.5"
+    monkeypatch.setenv("RATE_LIMIT_PROXY_HOPS", "1")
+    assert client_ip(request) == "203.0.113.7"
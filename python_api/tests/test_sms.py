@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+
+
+def test_sms_sender_retries_and_reports_status(monkeypatch):
+    """Test that queued SMS are retried on Twilio 5xx, fail fast on 4xx, and report each status."""
+    from app.services import sms_service
+
+    monkeypatch.setattr(sms_service, "SMS_RETRY_BASE_DELAY", 0.01)
+    responses = {"+15550000001": [httpx.Response(503, json={"message": "busy"}),
+                                  httpx.Response(201, json={"sid": "SM1"})],
+                 "+15550000002": [httpx.Response(400, json={"message": "invalid number"})]}
+
+    def handler(request):
+        to = dict(httpx.QueryParams(request.content.decode()))["To"]
+        return responses[to].pop(0)
+
+    async def run():
+        sender = sms_service.SmsSender(workers=2)
+        statuses = []
+        sender.on_status(lambda message: statuses.append((message["to"], message["status"])))
+        first = sender.enqueue("+15550000001", "code 1")
+        sender.enqueue("+15550000002", "code 2")
+        sender._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await sender.drain()
+        sender.handle_status_webhook({"MessageSid": "SM1", "MessageStatus": "delivered"})
+        await sender.close()
+        return first, sender.get_status(first["id"]), statuses
+
+    first, final, statuses = asyncio.run(run())
+    assert first["status"] == "queued"
+    assert final["status"] == "delivered" and final["attempts"] == 2
+    assert ("+15550000002", "failed") in statuses
+    assert statuses[-1] == ("+15550000001", "delivered")
@@ -0,0 +1,48 @@
+import pytest
+
+
+@pytest.fixture
+def fresh_role_cache(monkeypatch):
+    from app.services import user_role_service
+    cache = user_role_service.RoleCache()
+    monkeypatch.setattr(user_role_service, "role_cache", cache)
+    return cache
+
+
+def _role(user_id, role):
+    return {"user_id": user_id, "role": role, "status": "active", "verified": True}
+
+
+@pytest.mark.asyncio
+async def test_active_roles_for_users_batches_through_in_query(postgrest_requests, fresh_role_cache):
+    """Test that a page of users gets its roles from one IN query and they are cached."""
+    from app.services.user_role_service import UserRoleService
+
+    def respond(table, params):
+        user_ids = params["user_id"][4:-1].split(",")
+        return [_role(user_id, "admin" if user_id == "u1" else "buyer") for user_id in user_ids]
+
+    postgrest_requests.respond = respond
+    roles = await UserRoleService.get_active_roles_for_users(["u1", "u2"])
+    assert roles == {"u1": ["admin"], "u2": ["buyer"]}
+    assert len(postgrest_requests.calls) == 1
+    assert await UserRoleService.has_role("u1", "admin")
+    assert len(postgrest_requests.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_role_read_is_not_cached(postgrest_requests, fresh_role_cache):
+    """Test that a timed-out role lookup neither caches 'no roles' nor hides the failure when asked."""
+    from app.services.user_role_service import UserRoleService
+
+    def fail(table, params):
+        raise RuntimeError("statement timeout")
+
+    postgrest_requests.respond = fail
+    assert await UserRoleService.get_active_user_roles("u1") == []
+    with pytest.raises(RuntimeError):
+        await UserRoleService.get_active_user_roles("u1", raise_errors=True)
+    assert await UserRoleService.get_active_roles_for_users(["u1"]) == {"u1": []}
+
+    postgrest_requests.respond = lambda table, params: [_role("u1", "admin")]
+    assert await UserRoleService.get_active_user_roles("u1") == ["admin"]
@@ -0,0 +1,8 @@
+-- Store the pricing display computed at write time
+-- create_property/update_property fill this column so list and detail reads no longer
+-- format prices per request. Existing rows are backfilled with
+-- python_api/scripts/normalize_property_fields.py
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS formatted_pricing JSONB;
+
+COMMENT ON COLUMN properties.formatted_pricing IS 'Pricing display (display_text, calculation_info) precomputed from the pricing columns on write.';
@@ -0,0 +1,25 @@
+-- Append an uploaded image URL to properties.images in a single statement
+-- Called by python_api/app/services/image_urls.attach_image_to_property so concurrent
+-- uploads for the same property cannot overwrite each other's URLs (the row lock taken
+-- by UPDATE serializes them). Returns false when the property does not exist.
+
+CREATE OR REPLACE FUNCTION public.append_property_image(
+  property_id_param uuid,
+  image_url_param text
+)
+RETURNS boolean
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.properties
+  SET images = CASE
+      WHEN image_url_param = ANY(COALESCE(images, '{}')) THEN images
+      ELSE array_append(COALESCE(images, '{}'), image_url_param)
+    END
+  WHERE id = property_id_param;
+
+  RETURN FOUND;
+END;
+$$;
@@ -0,0 +1,14 @@
+-- Durable store behind the in-memory geocode cache (python_api/app/services/geocode_cache.py)
+-- One row per (kind, normalized query). found = false rows are cached "no result" answers,
+-- kept for a shorter TTL than positive results.
+
+create table if not exists geocode_cache (
+  cache_key text primary key,
+  kind text not null,
+  result jsonb,
+  found boolean not null default true,
+  expires_at timestamptz not null,
+  created_at timestamptz default now(),
+  updated_at timestamptz default now()
+);
+create index if not exists geocode_cache_expires_idx on geocode_cache(expires_at);
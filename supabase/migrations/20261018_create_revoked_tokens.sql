@@ -0,0 +1,16 @@
+-- Revoked access tokens (python_api/app/core/token_revocation.py)
+-- Logout stores the JWT id (jti) of the access token until the token's own expiry.
+-- Every API worker loads the unexpired rows on startup and then polls for rows newer
+-- than the last revoked_at it has seen, keeping them in a Bloom-filtered in-memory set.
+
+create table if not exists revoked_tokens (
+  jti text primary key,
+  user_id uuid,
+  expires_at timestamptz not null,
+  revoked_at timestamptz not null default now()
+);
+create index if not exists revoked_tokens_revoked_at_idx on revoked_tokens(revoked_at);
+create index if not exists revoked_tokens_expires_at_idx on revoked_tokens(expires_at);
+
+-- Rows are useless once the token has expired; clean up with e.g. a daily job:
+-- delete from revoked_tokens where expires_at < now();
@@ -0,0 +1,17 @@
+-- Selector/verifier refresh tokens (python_api/app/routes/auth.py)
+-- Cookie value is "<selector>.<verifier>"; selector is stored as-is and indexed, the
+-- verifier only as a SHA-256 digest, so validating a refresh token is one indexed lookup.
+--
+-- Existing rows keep their bcrypt token_hash and a null selector. They are still accepted
+-- on /api/auth/refresh (checked against the few rows of the user named by the access
+-- token) and replaced by a selector row on first use; the rest run out with expires_at.
+
+alter table refresh_tokens add column if not exists selector text;
+alter table refresh_tokens add column if not exists verifier_hash text;
+alter table refresh_tokens add column if not exists revoked_at timestamptz;
+alter table refresh_tokens alter column token_hash drop not null;
+
+create unique index if not exists refresh_tokens_selector_idx on refresh_tokens(selector);
+
+-- Legacy rows can only be reached through the user; drop the ones already unusable
+delete from refresh_tokens where selector is null and (revoked or expires_at < now());